@@ -0,0 +1,12 @@
+"""
+Entry point for `python -m desktop_admin` (see cli.py).
+"""
+import os
+import sys
+
+# The admin modules use flat imports (import db_init), as under `streamlit run app.py`.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import cli
+
+sys.exit(cli.main())
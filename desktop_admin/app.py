@@ -1,30 +1,39 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
+import copy
 import os
 import tempfile
 from st_aggrid import AgGrid, GridOptionsBuilder, DataReturnMode, JsCode
 import db_init
-import llm_helper
+import grid_data
+import instrumentation
+import lemma_merge
+import mobile_copy
+import pipelines
+import quiz_options
+import scheduler
+import search
 
 DB_NAME = "vocab_master.db"
 STATUS_OPTIONS = ['New', 'On Deck', 'Learning', 'Proficient', 'Adept', 'Mastered', 'Ignored', 'Pau(S)ed']
-DATE_COLUMNS = {"bucket_date", "next_review_date"}
 
 st.set_page_config(page_title="Kindle Vocab Master", layout="wide")
+if "metrics_session" not in st.session_state:
+    st.session_state["metrics_session"] = instrumentation.Session()
+instrumentation.start_run(st.session_state["metrics_session"])
 
 # JavaScript to suppress default editing for specific keys
-suppress_keyboard_js = JsCode("""
+SUPPRESS_KEYBOARD_JS = """
 function(params) {
     const key = params.event.key.toUpperCase();
     const keysToSuppress = ['N', 'O', 'L', 'P', 'A', 'M', 'I', 'S'];
     return keysToSuppress.includes(key);
 }
-""")
+"""
 
 # JavaScript for keyboard shortcuts
 # When a key is pressed, if the status column is active, update the value
-on_cell_key_down = JsCode("""
+ON_CELL_KEY_DOWN_JS = """
 function(params) {
     const key = params.event.key.toUpperCase();
     const mappings = {
@@ -43,10 +52,10 @@ function(params) {
         params.api.flashCells({ rowNodes: [params.node], columns: ['status'] });
     }
 }
-""")
+"""
 
 def get_db_connection():
-    conn = sqlite3.connect(DB_NAME)
+    conn = instrumentation.connect(DB_NAME)
     return conn
 
 def ensure_db_schema():
@@ -60,214 +69,97 @@ def ensure_db_schema():
 
     db_init.ensure_words_columns(conn)
     db_init.ensure_on_deck_status(conn)
+    db_init.ensure_search_index(conn)
+    db_init.ensure_change_feed(conn)
+    version = db_init.schema_version(conn)
 
     conn.close()
+    return version
+
+# Built once per schema version (and column dtypes) instead of on every rerun.
+# Callers get the shared object, so copy it before AgGrid rewrites it in place.
+@st.cache_resource(show_spinner=False)
+def build_grid_options(schema_version, column_types, _df):
+    gb = GridOptionsBuilder.from_dataframe(_df)
+    gb.configure_pagination(paginationAutoPageSize=True)
+    gb.configure_side_bar()
+    gb.configure_default_column(editable=True, groupable=True)
+    
+    # Configure specific columns
+    gb.configure_column("id", hide=True)
+    gb.configure_column("word_stem", editable=False, pinned="left")
+    # Preview column in grid_data's frame; select a row to read the full context.
+    gb.configure_column("original_context", editable=False)
+    gb.configure_selection("single")
+    gb.configure_column("priority_tier", header_name="Tier (1=High)", width=100, type=["numericColumn", "numberColumnFilter"])
+    gb.configure_column(
+        "status", 
+        cellEditor='agSelectCellEditor', 
+        cellEditorParams={'values': STATUS_OPTIONS},
+        suppressKeyboardEvent=JsCode(SUPPRESS_KEYBOARD_JS)
+    )
+    
+    # Add keydown event handler
+    gb.configure_grid_options(onCellKeyDown=JsCode(ON_CELL_KEY_DOWN_JS))
+    gb.configure_grid_options(enableCellChangeFlash=True)
+    
+    return gb.build()
 
 def load_data():
+    # Kept across reruns and patched from the change feed, so an unchanged
+    # word list costs one MAX(seq) query instead of a full table load.
     conn = get_db_connection()
-    df = pd.read_sql_query("SELECT * FROM words", conn)
+    df, seq = grid_data.refresh_data(conn, st.session_state.get("grid_df"), st.session_state.get("grid_seq", 0))
     conn.close()
-    
-    # NORMALIZE IMMEDIATELY
-    # 1. Ensure priority_tier is Int64 (nullable int)
-    if 'priority_tier' in df.columns:
-        df['priority_tier'] = pd.to_numeric(df['priority_tier'], errors='coerce').astype('Int64')
-        
-    # 2. Normalize text columns: DB NULL -> "" (Empty String)
-    # This matches what AgGrid returns for empty cells
-    for col in df.select_dtypes(include=['object']).columns:
-        df[col] = df[col].fillna("").astype(str)
-        
+    st.session_state["grid_df"] = df
+    st.session_state["grid_seq"] = seq
     return df
 
-def import_kindle_db(uploaded_file):
-    if uploaded_file is None:
-        st.warning("Please upload a Kindle vocab.db file to import.")
+def import_kindle_dbs(uploaded_files):
+    if not uploaded_files:
+        st.warning("Please upload one or more Kindle vocab.db files to import.")
         return
 
-    temp_path = None
+    temp_paths = []
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".db") as tmp_file:
-            tmp_file.write(uploaded_file.getbuffer())
-            temp_path = tmp_file.name
-
-        k_conn = sqlite3.connect(temp_path)
-        query = """
-            SELECT 
-                w.stem as word_stem,
-                l.usage as original_context,
-                b.title as book_title
-            FROM WORDS w
-            JOIN LOOKUPS l ON w.id = l.word_key
-            JOIN BOOK_INFO b ON l.book_key = b.id
-            GROUP BY w.stem
-        """
-        df_new = pd.read_sql_query(query, k_conn)
-        k_conn.close()
-
-        if df_new.empty:
-            st.warning("No words found in the uploaded file.")
-            return
+        for uploaded_file in uploaded_files:
+            with tempfile.NamedTemporaryFile(delete=False, suffix=".db") as tmp_file:
+                tmp_file.write(uploaded_file.getbuffer())
+                temp_paths.append(tmp_file.name)
 
         m_conn = get_db_connection()
-        cursor = m_conn.cursor()
-
-        added_count = 0
-        for _, row in df_new.iterrows():
-            cursor.execute(
-                """
-                    INSERT OR IGNORE INTO words (word_stem, original_context, book_title)
-                    VALUES (?, ?, ?)
-                """,
-                (row['word_stem'], row['original_context'], row['book_title'])
-            )
-            added_count += cursor.rowcount
-
-        m_conn.commit()
-        m_conn.close()
+        progress_bar = st.progress(0)
+        try:
+            result = pipelines.import_kindle_dbs(m_conn, temp_paths, progress=_progress_callback(progress_bar))
+        finally:
+            m_conn.close()
+
+        if result["found"] == 0:
+            st.warning("No words found in the uploaded files.")
+            return
 
-        st.success(f"Import complete! Added {added_count} new words.")
+        st.success(
+            f"Import complete! Read {result['found']} words ({result['unique']} distinct) from "
+            f"{result['files']} file(s) at {result['words_per_s']} words/s. Added {result['added']} new words, "
+            f"merged {result['merged']} inflected variants. Use 'Review Merge Proposals' for the ambiguous ones."
+        )
 
     except Exception as e:
         st.error(f"Error importing database: {e}")
     finally:
-        if temp_path and os.path.exists(temp_path):
-            os.remove(temp_path)
-
-def _normalize_date(value):
-    if value is None or pd.isna(value):
-        return None
-
-    if isinstance(value, str):
-        stripped = value.strip()
-        if stripped == "":
-            return None
-        parsed = pd.to_datetime(stripped, errors="coerce")
-        if pd.isna(parsed):
-            return stripped
-        return parsed.date().isoformat()
-
-    parsed = pd.to_datetime(value, errors="coerce")
-    if pd.isna(parsed):
-        return str(value)
-    return parsed.date().isoformat()
-
-def _normalize_for_compare(value, is_numeric, is_date):
-    if is_date:
-        return _normalize_date(value)
-
-    if value is None or pd.isna(value):
-        return None if is_numeric else ""
-
-    if isinstance(value, str):
-        stripped = value.strip()
-        if stripped == "":
-            return None if is_numeric else ""
-        if is_numeric:
-            parsed = pd.to_numeric(stripped, errors="coerce")
-            return None if pd.isna(parsed) else parsed
-        return value
-
-    if is_numeric:
-        return value
-
-    return str(value)
-
-def _normalize_for_db(value, is_numeric, is_date):
-    if is_date:
-        return _normalize_date(value)
-
-    if value is None or pd.isna(value):
-        return None
-
-    if isinstance(value, str):
-        stripped = value.strip()
-        if stripped == "":
-            return None
-        if is_numeric:
-            parsed = pd.to_numeric(stripped, errors="coerce")
-            if pd.isna(parsed):
-                return None
-            if float(parsed).is_integer():
-                return int(parsed)
-            return float(parsed)
-        return value
-
-    if is_numeric and isinstance(value, float) and value.is_integer():
-        return int(value)
-
-    return value
-
-def find_changes(original_df, grid_data):
-    if grid_data is None:
-        return []
-
-    original_rows = original_df.to_dict(orient="records")
-    original_by_id = {row["id"]: row for row in original_rows if row.get("id") is not None} if "id" in original_df.columns else {}
-    original_by_stem = {row["word_stem"]: row for row in original_rows if row.get("word_stem")} if "word_stem" in original_df.columns else {}
-    numeric_cols = {
-        col for col in original_df.columns if pd.api.types.is_numeric_dtype(original_df[col])
-    }
-    read_only_cols = {"id", "word_stem"}
-
-    changed_records = []
-    for row in grid_data:
-        row_keys = set(row.keys())
-        key_field = "id"
-        key_value = row.get("id")
-        original_row = original_by_id.get(key_value) if key_value is not None else None
-        if original_row is None and "word_stem" in row:
-            key_field = "word_stem"
-            key_value = row.get("word_stem")
-            original_row = original_by_stem.get(key_value)
-
-        if original_row is None:
-            continue
-
-        updates = {}
-        for col in original_df.columns:
-            if col in read_only_cols or col not in row_keys:
-                continue
-            old_val = original_row.get(col)
-            new_val = row.get(col)
-            is_numeric = col in numeric_cols
-            is_date = col in DATE_COLUMNS
-            if _normalize_for_compare(old_val, is_numeric, is_date) != _normalize_for_compare(new_val, is_numeric, is_date):
-                updates[col] = _normalize_for_db(new_val, is_numeric, is_date)
-
-        if updates:
-            updates[key_field] = key_value
-            changed_records.append(updates)
-
-    return changed_records
+        for temp_path in temp_paths:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
 
 def save_changes_from_records(changed_records):
     if not changed_records:
         return 0
 
     conn = get_db_connection()
-    cursor = conn.cursor()
-    updated_rows = 0
-
-    for record in changed_records:
-        record_id = record.get("id")
-        key_field = "id" if record_id is not None else "word_stem"
-        key_value = record_id if record_id is not None else record.get("word_stem")
-        if key_value is None:
-            continue
-
-        updates = {k: v for k, v in record.items() if k not in ("id", "word_stem")}
-        if not updates:
-            continue
-
-        set_clause = ", ".join(f"{col} = ?" for col in updates)
-        values = list(updates.values()) + [key_value]
-        cursor.execute(f"UPDATE words SET {set_clause} WHERE {key_field} = ?", values)
-        updated_rows += cursor.rowcount
-
-    conn.commit()
-    conn.close()
-    return updated_rows
+    try:
+        return grid_data.save_changes_from_records(conn, changed_records)
+    finally:
+        conn.close()
 
 # Initialize session state for Grid Key if not present
 if 'grid_key' not in st.session_state:
@@ -280,200 +172,246 @@ if 'grid_state' not in st.session_state:
 def force_grid_refresh():
     st.session_state['grid_key'] += 1
 
+def _progress_callback(progress_bar):
+    def report(done, total, message):
+        progress_bar.progress(min(done / total, 1.0) if total else 1.0, text=message)
+    return report
+
 def run_pedestrian_check():
     conn = get_db_connection()
-    # Get New words that haven't been scored yet (or re-score all New)
-    df_new = pd.read_sql_query("SELECT id, word_stem FROM words WHERE status = 'New'", conn)
-    
-    if df_new.empty:
+    with st.spinner("Analyzing New words..."):
+        result = pipelines.run_pedestrian_check(conn)
+    conn.close()
+
+    if result["total"] == 0:
         st.info("No 'New' words to check.")
-        conn.close()
         return
 
-    words_to_check = df_new['word_stem'].tolist()
-    
-    with st.spinner(f"Analyzing {len(words_to_check)} words..."):
-        scores = llm_helper.assess_difficulty(words_to_check)
-    
-    cursor = conn.cursor()
-    updated_count = 0
-    ignored_count = 0
-    
-    for word, score in scores.items():
-        # Auto-ignore logic: Score < 4 implies pedestrian
-        new_status = 'New'
-        if score < 4:
-            new_status = 'Ignored'
-            ignored_count += 1
-            
-        cursor.execute("""
-            UPDATE words 
-            SET difficulty_score = ?, status = ?
-            WHERE word_stem = ? AND status = 'New'
-        """, (score, new_status, word))
-        updated_count += 1
-        
-    conn.commit()
-    conn.close()
-    st.success(f"Analyzed {updated_count} words. Auto-ignored {ignored_count} pedestrian words.")
+    st.success(f"Analyzed {result['checked']} words. Auto-ignored {result['ignored']} pedestrian words.")
     force_grid_refresh()
 
-def run_enrichment(status_filter):
+def run_enrichment(status_filter, max_usd=None):
     conn = get_db_connection()
-    df_ready = pd.read_sql_query(
-        "SELECT id, word_stem FROM words WHERE status = ?",
-        conn,
-        params=[status_filter],
-    )
-    
-    if df_ready.empty:
+    progress_bar = st.progress(0)
+    with st.spinner(f"Enriching '{status_filter}' words..."):
+        summary = pipelines.run_enrichment(
+            conn, status_filter, max_usd=max_usd, progress=_progress_callback(progress_bar),
+        )
+    conn.close()
+
+    total = summary["total"]
+    if total == 0:
         st.info(f"No '{status_filter}' words found to enrich.")
-        conn.close()
         return
 
-    words_to_enrich = df_ready['word_stem'].tolist()
-    
-    cursor = conn.cursor()
-    enriched_count = 0
-    batch_size = 5
-    progress_bar = st.progress(0)
-    total = len(words_to_enrich)
-    per_word_counts = []
-    with_examples = 0
-    with_distractors = 0
-    
-    for i in range(0, total, batch_size):
-        batch = words_to_enrich[i:i + batch_size]
-        with st.spinner(f"Enriching batch {i + 1}-{min(i + batch_size, total)}..."):
-            enrichment_data = llm_helper.enrich_words(batch)
-
-        for word, data in enrichment_data.items():
-            if status_filter == 'New':
-                cursor.execute("""
-                    UPDATE words 
-                    SET definition = ?, status = 'On Deck', bucket_date = DATE('now')
-                    WHERE word_stem = ? AND status = ?
-                """, (data['definition'], word, status_filter))
-            else:
-                cursor.execute("""
-                    UPDATE words 
-                    SET definition = ?
-                    WHERE word_stem = ? AND status = ?
-                """, (data['definition'], word, status_filter))
-            
-            if cursor.rowcount > 0:
-                cursor.execute("SELECT id FROM words WHERE word_stem = ?", (word,))
-                row = cursor.fetchone()
-                if row:
-                    word_id = row[0]
-                    
-                    cursor.execute("DELETE FROM distractors WHERE word_id = ?", (word_id,))
-                    cursor.execute("DELETE FROM examples WHERE word_id = ?", (word_id,))
-
-                    examples = data.get('examples') or []
-                    if isinstance(examples, str):
-                        examples = [examples]
-                    examples = [ex.strip() for ex in examples if isinstance(ex, str) and ex.strip()]
-
-                    distractors = data.get('distractors') or []
-                    if isinstance(distractors, str):
-                        distractors = [distractors]
-                    distractors = [dist.strip() for dist in distractors if isinstance(dist, str) and dist.strip()]
-
-                    for dist in distractors:
-                        cursor.execute("INSERT INTO distractors (word_id, text) VALUES (?, ?)", (word_id, dist))
-                        
-                    for ex in examples:
-                        cursor.execute("INSERT INTO examples (word_id, sentence) VALUES (?, ?)", (word_id, ex))
-                    
-                    if examples:
-                        with_examples += 1
-                    if distractors:
-                        with_distractors += 1
-                    per_word_counts.append({
-                        "word": word,
-                        "examples": len(examples),
-                        "distractors": len(distractors),
-                    })
-                    enriched_count += 1
-        
-        conn.commit()
-
-        progress_bar.progress(min((i + batch_size) / total, 1.0))
-        
-    conn.close()
+    enriched_count = summary["enriched"]
+    per_word_counts = summary["per_word_counts"]
     if status_filter == 'New':
         st.success(f"Enriched {enriched_count} words! Moved to 'On Deck'.")
     else:
         st.success(f"Enriched {enriched_count} words in status '{status_filter}'.")
 
-    if total > 0:
-        avg_examples = round(sum(row["examples"] for row in per_word_counts) / max(len(per_word_counts), 1), 2)
-        avg_distractors = round(sum(row["distractors"] for row in per_word_counts) / max(len(per_word_counts), 1), 2)
-        st.info(
-            f"Enrichment summary: {enriched_count}/{total} updated • "
-            f"examples present for {with_examples} • distractors present for {with_distractors} • "
-            f"avg examples {avg_examples} • avg distractors {avg_distractors}"
-        )
-        if per_word_counts:
-            with st.expander("Enrichment details"):
-                st.dataframe(pd.DataFrame(per_word_counts))
+    avg_examples = round(sum(row["examples"] for row in per_word_counts) / max(len(per_word_counts), 1), 2)
+    avg_distractors = round(sum(row["distractors"] for row in per_word_counts) / max(len(per_word_counts), 1), 2)
+    st.info(
+        f"Enrichment summary: {enriched_count}/{total} updated • "
+        f"examples present for {summary['with_examples']} • distractors present for {summary['with_distractors']} • "
+        f"avg examples {avg_examples} • avg distractors {avg_distractors} • "
+        f"{summary['tokens']} tokens (${summary['cost_usd']:.4f})"
+    )
+    if summary["stopped_by_budget"]:
+        st.warning(f"Stopped at the budget; {summary['remaining']} words stay queued for the next run.")
+    if per_word_counts:
+        with st.expander("Enrichment details"):
+            st.dataframe(pd.DataFrame(per_word_counts))
     force_grid_refresh()
 
 def run_ranking():
     conn = get_db_connection()
-    # Rank words that have no tier yet (NULL), excluding Ignored words
-    df_rank = pd.read_sql_query("SELECT word_stem FROM words WHERE priority_tier IS NULL AND status != 'Ignored'", conn)
-    
-    if df_rank.empty:
+    progress_bar = st.progress(0)
+    with st.spinner("Ranking words..."):
+        result = pipelines.run_ranking(conn, progress=_progress_callback(progress_bar))
+    conn.close()
+
+    if result["total"] == 0:
         st.info("No unranked active words found.")
-        conn.close()
         return
 
-    words_to_rank = df_rank['word_stem'].tolist()
-    
-    # Process in batches of 50 to respect context window and logic
-    batch_size = 50
-    cursor = conn.cursor()
-    total_ranked = 0
-    
-    progress_bar = st.progress(0)
-    
-    for i in range(0, len(words_to_rank), batch_size):
-        batch = words_to_rank[i:i + batch_size]
-        with st.spinner(f"Ranking batch {i}-{i+len(batch)}..."):
-            tiers = llm_helper.rank_words_tier(batch)
-            
-        for word, tier in tiers.items():
-            cursor.execute("UPDATE words SET priority_tier = ? WHERE word_stem = ?", (tier, word))
-            total_ranked += 1
-        
-        conn.commit()
-        progress_bar.progress(min((i + batch_size) / len(words_to_rank), 1.0))
-        
+    st.success(f"Ranked {result['ranked']} words into 5 Tiers!")
+    force_grid_refresh()
+
+def run_rescheduling(max_per_day):
+    conn = get_db_connection()
+    with st.spinner("Rescheduling reviews..."):
+        summary = scheduler.reschedule_reviews(conn, max_per_day=max_per_day)
     conn.close()
-    st.success(f"Ranked {total_ranked} words into 5 Tiers!")
+
+    if summary["scheduled"] == 0:
+        st.info("No review words to schedule.")
+        return
+
+    st.success(
+        f"Scheduled {summary['scheduled']} review words over {summary['days']} days "
+        f"(updated {summary['updated']}, busiest day {summary['busiest_day']})."
+    )
     force_grid_refresh()
 
+def run_mobile_copy():
+    conn = get_db_connection()
+    with st.spinner("Writing the mobile copy..."):
+        summary = mobile_copy.write_mobile_copy(conn, mobile_copy.default_mobile_path(DB_NAME))
+    conn.close()
+    st.success(f"Wrote {summary['path']} ({summary['bytes'] / 1e6:.1f} MB). Copy this file to the phone.")
+
+def run_options_refresh():
+    conn = get_db_connection()
+    progress_bar = st.progress(0)
+    with st.spinner("Building quiz options..."):
+        summary = quiz_options.refresh_options(conn, progress=_progress_callback(progress_bar))
+    conn.close()
+
+    how = "rebuilt" if summary["rebuilt"] else f"{summary['changed_words']} changed words updated"
+    st.success(f"Quiz options ready for {summary['options']} words ({how}).")
+
+def find_merge_proposals():
+    conn = get_db_connection()
+    with st.spinner("Looking for variant stems..."):
+        clusters = lemma_merge.find_duplicates(conn, lemma_merge.PROPOSAL_KINDS)
+    conn.close()
+    st.session_state["merge_proposals"] = clusters
+
+def render_merge_review():
+    clusters = st.session_state.get("merge_proposals")
+    if clusters is None:
+        return
+    st.subheader("Merge Proposals")
+    if not clusters:
+        st.info("No merge proposals.")
+        if st.button("Close merge review"):
+            st.session_state.pop("merge_proposals")
+            st.rerun()
+        return
+
+    st.caption("Tick the variants that really are forms of the kept word; everything else stays a separate word.")
+    proposals = pd.DataFrame([
+        {
+            "merge": False,
+            "keep": cluster["survivor"]["word_stem"],
+            "variant": variant["word_stem"],
+            "match": cluster["reasons"][variant["word_stem"]],
+            "keep_status": cluster["survivor"]["status"],
+            "variant_status": variant["status"],
+        }
+        for cluster in clusters
+        for variant in cluster["variants"]
+    ])
+    edited = st.data_editor(
+        proposals,
+        disabled=[column for column in proposals.columns if column != "merge"],
+        hide_index=True,
+        key="merge_review",
+    )
+    merge_col, close_col = st.columns(2)
+    if merge_col.button("Merge selected"):
+        selected = edited[edited["merge"]]
+        chosen = set(zip(selected["keep"], selected["variant"]))
+        reviewed = []
+        for cluster in clusters:
+            keep = cluster["survivor"]["word_stem"]
+            variants = [variant for variant in cluster["variants"] if (keep, variant["word_stem"]) in chosen]
+            if variants:
+                reasons = {variant["word_stem"]: cluster["reasons"][variant["word_stem"]] for variant in variants}
+                reviewed.append({"survivor": cluster["survivor"], "variants": variants, "reasons": reasons})
+        conn = get_db_connection()
+        summary = lemma_merge.merge_clusters(conn, reviewed)
+        conn.close()
+        st.session_state.pop("merge_proposals")
+        st.success(f"Merged {summary['merged']} variants into {summary['clusters']} words.")
+        force_grid_refresh()
+        st.rerun()
+    if close_col.button("Close merge review"):
+        st.session_state.pop("merge_proposals")
+        st.rerun()
+
+def render_search_results(search_text):
+    conn = get_db_connection()
+    results = search.search_words(conn, search_text)
+    conn.close()
+
+    if results.empty:
+        st.info(f"No words match '{search_text}'.")
+        return
+
+    st.caption(f"Top {len(results)} matches (best first)")
+    st.dataframe(
+        results[["word_stem", "status", "matched_in", "snippet"]],
+        hide_index=True,
+    )
+
+def render_full_context(selected_rows):
+    if selected_rows is None or selected_rows.empty:
+        return
+    conn = get_db_connection()
+    contexts = grid_data.load_full_text(conn, "original_context", selected_rows["id"].tolist())
+    conn.close()
+    for word_id, word_stem in zip(selected_rows["id"], selected_rows["word_stem"]):
+        st.caption(f"Context for '{word_stem}'")
+        st.write(contexts.get(int(word_id), ""))
+
+def render_profiling_panel():
+    with st.sidebar:
+        st.markdown("---")
+        st.subheader("Profiling")
+        breakdown = instrumentation.run_breakdown()
+        st.caption(f"Rerun #{instrumentation.current_run()} time breakdown (ms)")
+        st.dataframe(
+            pd.DataFrame(list(breakdown.items()), columns=["section", "ms"]).sort_values("ms", ascending=False),
+            hide_index=True,
+        )
+
+        include_history = st.checkbox("Include saved history", value=False)
+        entries = instrumentation.load_history() if include_history else None
+
+        slow_queries = instrumentation.slow_queries(entries)
+        st.caption("Top slow queries")
+        if slow_queries:
+            st.dataframe(pd.DataFrame(slow_queries), hide_index=True)
+        else:
+            st.write("No queries recorded yet.")
+
+        llm_calls = instrumentation.llm_calls(entries)
+        if llm_calls:
+            st.caption("Recent LLM calls")
+            llm_columns = ["ms", "model", "prompt_tokens", "completion_tokens", "request_bytes", "response_bytes", "ok"]
+            st.dataframe(pd.DataFrame(llm_calls).reindex(columns=llm_columns), hide_index=True)
+
 st.title("📚 Kindle Vocab Master - Admin Console")
-ensure_db_schema()
+schema_version = ensure_db_schema()
+instrumentation.lap("schema")
 
 # Sidebar for Actions
 with st.sidebar:
     st.header("Actions")
-    uploaded_file = st.file_uploader("Import Kindle vocab.db", type="db")
-    if uploaded_file is not None:
+    uploaded_files = st.file_uploader("Import Kindle vocab.db (one per device)", type="db", accept_multiple_files=True)
+    if uploaded_files:
         if st.button("Process Import"):
-            import_kindle_db(uploaded_file)
+            with instrumentation.phase("import_kindle_db"):
+                import_kindle_dbs(uploaded_files)
             st.rerun()
         
+    if st.button("Review Merge Proposals"):
+        with instrumentation.phase("find_merge_proposals"):
+            find_merge_proposals()
+
     st.markdown("---")
     if st.button("Run Pedestrian Check (LLM)"):
-        run_pedestrian_check()
+        with instrumentation.phase("run_pedestrian_check"):
+            run_pedestrian_check()
         st.rerun()
         
     if st.button("Run Priority Ranking (Tier 1-5)"):
-        run_ranking()
+        with instrumentation.phase("run_ranking"):
+            run_ranking()
         st.rerun()
 
     if st.button("Reset All Tiers (Set NULL)"):
@@ -486,44 +424,65 @@ with st.sidebar:
         force_grid_refresh()
         st.rerun()
 
+    max_reviews = st.number_input(
+        "Max reviews per day",
+        min_value=1,
+        value=scheduler.DEFAULT_MAX_REVIEWS_PER_DAY,
+        step=5,
+    )
+    if st.button("Rebalance Review Schedule"):
+        with instrumentation.phase("run_rescheduling"):
+            run_rescheduling(int(max_reviews))
+        st.rerun()
+
+    if st.button("Refresh Mobile Quiz Options"):
+        with instrumentation.phase("run_options_refresh"):
+            run_options_refresh()
+        st.rerun()
+
+    if st.button("Write Mobile DB Copy"):
+        with instrumentation.phase("run_mobile_copy"):
+            run_mobile_copy()
+
     enrich_status = st.selectbox("Select status to enrich", STATUS_OPTIONS, index=STATUS_OPTIONS.index('New'))
+    enrich_budget = st.number_input("Budget per run (USD, 0 = no limit)", min_value=0.0, value=0.0, step=0.25)
     if st.button("Enrich Words (LLM)"):
-        run_enrichment(enrich_status)
+        with instrumentation.phase("run_enrichment"):
+            run_enrichment(enrich_status, max_usd=enrich_budget or None)
         st.rerun()
         
     st.markdown("---")
     if st.button("Reload Data (Hard Refresh)"):
+        st.session_state.pop("grid_df", None)
         force_grid_refresh()
         st.cache_data.clear()
         st.rerun()
 
+    metrics_session = st.session_state["metrics_session"]
+    metrics_session.enabled = st.checkbox(
+        "Record metrics", value=metrics_session.enabled, help="Time SQL, LLM calls and script phases (adds overhead).",
+    )
+    show_profiler = st.checkbox("Show profiling panel", value=False, disabled=not metrics_session.enabled)
+instrumentation.lap("sidebar")
+
 # Main Grid View
 st.subheader("Word Bank")
 
+search_text = st.text_input("Search words, contexts, definitions and examples", key="search_text")
+if search_text.strip():
+    render_search_results(search_text)
+instrumentation.lap("search")
+
+render_merge_review()
+
 df = load_data()
+instrumentation.lap("load_data")
 
 if not df.empty:
-    gb = GridOptionsBuilder.from_dataframe(df)
-    gb.configure_pagination(paginationAutoPageSize=True)
-    gb.configure_side_bar()
-    gb.configure_default_column(editable=True, groupable=True)
-    
-    # Configure specific columns
-    gb.configure_column("id", hide=True)
-    gb.configure_column("word_stem", editable=False, pinned="left")
-    gb.configure_column("priority_tier", header_name="Tier (1=High)", width=100, type=["numericColumn", "numberColumnFilter"])
-    gb.configure_column(
-        "status", 
-        cellEditor='agSelectCellEditor', 
-        cellEditorParams={'values': STATUS_OPTIONS},
-        suppressKeyboardEvent=suppress_keyboard_js
-    )
-    
-    # Add keydown event handler
-    gb.configure_grid_options(onCellKeyDown=on_cell_key_down)
-    gb.configure_grid_options(enableCellChangeFlash=True)
-    
-    gridOptions = gb.build()
+    grid_df = grid_data.grid_frame(df)
+    column_types = tuple((col, str(dtype)) for col, dtype in grid_df.dtypes.items())
+    gridOptions = copy.deepcopy(build_grid_options(schema_version, column_types, grid_df.head(0)))
+    instrumentation.lap("grid_options")
     stored_grid_state = st.session_state.get("grid_state")
     columns_state = st.session_state.get("grid_columns_state")
     if stored_grid_state:
@@ -531,10 +490,10 @@ if not df.empty:
         columns_state = None
 
     grid_response = AgGrid(
-        df,
+        grid_df,
         gridOptions=gridOptions,
         data_return_mode=DataReturnMode.AS_INPUT, 
-        update_on=["cellValueChanged"],
+        update_on=["cellValueChanged", "selectionChanged"],
         columns_state=columns_state,
         fit_columns_on_grid_load=False,
         theme='streamlit',
@@ -543,27 +502,30 @@ if not df.empty:
         allow_unsafe_jscode=True,
         key=f"grid_{st.session_state['grid_key']}" 
     )
+    instrumentation.lap("aggrid")
     if grid_response.grid_state is not None:
         st.session_state["grid_state"] = grid_response.grid_state
     if grid_response.columns_state is not None:
         st.session_state["grid_columns_state"] = grid_response.columns_state
+    render_full_context(grid_response.selected_data)
 
     # Check for updates and save
-    grid_data = grid_response['data'] 
+    grid_rows = grid_response['data'] 
     
-    if grid_data is not None:
-        # Check if grid_data is a DataFrame (some versions of AgGrid return DF)
-        if isinstance(grid_data, pd.DataFrame):
-            grid_data = grid_data.to_dict(orient='records')
+    if grid_rows is not None:
+        # Check if grid_rows is a DataFrame (some versions of AgGrid return DF)
+        if isinstance(grid_rows, pd.DataFrame):
+            grid_rows = grid_rows.to_dict(orient='records')
             
         # Detect changes using Pure Python Record Comparison (No Pandas Crashes)
-        changed_records = find_changes(df, grid_data)
+        changed_records = grid_data.find_changes(df, grid_rows)
         
         if changed_records:
             try:
                 save_changes_from_records(changed_records)
             except Exception as exc:
                 st.error(f"Auto-save failed: {exc}")
+    instrumentation.lap("diff_save")
 
 else:
     st.info("Database is empty. Import a Kindle vocab.db file to get started.")
@@ -577,3 +539,8 @@ with col2:
     st.metric("New Words", len(df[df['status'] == 'New']))
 with col3:
     st.metric("Mastered", len(df[df['status'] == 'Mastered']))
+instrumentation.lap("footer")
+instrumentation.flush()
+
+if show_profiler:
+    render_profiling_panel()
@@ -0,0 +1,447 @@
+"""
+Headless benchmark suite for the admin pipelines.
+
+Runs import, grid load/diff/save, search and the LLM pipelines (against a
+fake, offline LLM) on generated corpora at several sizes, plus the console's
+cold start (app.py's imports under -X importtime, failing if LLM/network
+modules load eagerly) and a warm Streamlit rerun. Each case records wall
+time, peak Python memory and the number of SQL statements executed; results
+are written as JSON and compared against a stored baseline.
+
+`--prompt-tokens` instead estimates the tokens each LLM task sends and gets
+back per call under every prompt version (prompt_templates), with the system
+prompt counted separately. These are character-based estimates.
+
+Usage:
+    python benchmark.py --sizes 1000,10000 --save-baseline
+    python benchmark.py --sizes 1000,10000            # compare with the baseline
+    python benchmark.py --prompt-tokens
+"""
+import argparse
+import ast
+import contextlib
+import datetime
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+import zlib
+
+import pandas as pd
+
+import corpus_generator
+import db_init
+import grid_data
+import instrumentation
+import pipelines
+import prompt_templates
+import search
+
+BENCH_DATA_DIR = "bench_data"
+RESULTS_DIR = "bench_results"
+BASELINE_PATH = os.path.join(RESULTS_DIR, "baseline.json")
+DEFAULT_SIZES = (1000, 10000)
+DEFAULT_REPEAT = 3
+# A case regresses when it is this much slower (or hungrier) than the baseline...
+DEFAULT_THRESHOLD = 1.25
+# ...and at least this many seconds slower, so tiny cases don't flap.
+MIN_REGRESSION_SECONDS = 0.01
+SEED = 0
+# Typed-as-you-go prefixes plus full words from the generated templates.
+SEARCH_QUERIES = ("ma", "mar", "seasonal", "weather pat", "smile", "the")
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(APP_DIR, "app.py")
+# Words per call in the token benchmark: the CLI defaults for check/rank/enrich.
+PROMPT_BATCH_SIZES = {"difficulty": 100, "rank": 50, "enrich": 5, "distractors": 5}
+# Must not be imported when the console starts; only LLM actions need them.
+LAZY_MODULES = ("llm_helper", "requests", "dotenv")
+
+
+def _crc(word):
+    return zlib.crc32(word.encode("utf-8"))
+
+
+def _fake_enrich_words(words, latency=0.0, distractor_count=15):
+    if latency:
+        time.sleep(latency)
+    results = {}
+    for word in words:
+        seed = _crc(word)
+        results[word] = {
+            "definition": corpus_generator._definition(seed),
+            "distractors": [corpus_generator._definition(seed + k + 1) + f" ({k})" for k in range(distractor_count)],
+            "examples": [template.format(w=word) for template in corpus_generator.EXAMPLE_TEMPLATES],
+        }
+    return results
+
+
+def make_fake_llm(latency=0.0):
+    """
+    Deterministic, offline stand-in for llm_helper (optionally sleeping per call).
+    """
+    def _sleep():
+        if latency:
+            time.sleep(latency)
+
+    def assess_difficulty(words):
+        _sleep()
+        return {word: _crc(word) % 10 + 1 for word in words}
+
+    def rank_words_tier(words):
+        _sleep()
+        return {word: _crc(word) % 5 + 1 for word in words}
+
+    return types.SimpleNamespace(
+        assess_difficulty=assess_difficulty,
+        rank_words_tier=rank_words_tier,
+        enrich_words=lambda words, distractor_count=15: _fake_enrich_words(words, latency, distractor_count),
+    )
+
+
+def corpus_paths(size, data_dir=BENCH_DATA_DIR):
+    """
+    Returns (kindle_path, master_path) for a size, generating them on first use.
+    """
+    version = corpus_generator.CORPUS_VERSION
+    kindle_path = os.path.join(data_dir, f"kindle_{size}_s{SEED}_v{version}.db")
+    master_path = os.path.join(data_dir, f"master_{size}_s{SEED}_v{version}.db")
+    if not os.path.exists(kindle_path):
+        corpus_generator.generate_kindle_db(kindle_path, lookups=size * 3, words=size, books=max(size // 100, 5), seed=SEED)
+    if not os.path.exists(master_path):
+        corpus_generator.generate_master_db(master_path, words=size, books=max(size // 100, 5), seed=SEED)
+    return kindle_path, master_path
+
+
+def _working_copy(path, workdir):
+    target = os.path.join(workdir, "vocab_master.db")
+    shutil.copyfile(path, target)
+    return target
+
+
+def _empty_master(workdir):
+    target = os.path.join(workdir, "vocab_master.db")
+    conn = sqlite3.connect(target)
+    db_init.create_tables(conn)
+    conn.close()
+    return target
+
+
+def _grid_rows_with_edits(df, share=0.01):
+    rows = df.to_dict(orient="records")
+    step = max(int(1 / share), 1)
+    for row in rows[::step]:
+        row["status"] = "Ignored" if row.get("status") != "Ignored" else "New"
+    return rows
+
+
+def app_imports(app_path=APP_PATH):
+    """
+    Top-level modules app.py imports at module level.
+    """
+    with open(app_path) as handle:
+        tree = ast.parse(handle.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def import_profile(modules):
+    """
+    Imports `modules` in a fresh interpreter under -X importtime.
+    Returns {module: cumulative microseconds} for every module loaded.
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+        cwd=APP_DIR, capture_output=True, text=True, check=True,
+    )
+    profile = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            profile[name.strip()] = int(cumulative)
+    return profile
+
+
+def _check_startup_imports():
+    profile = import_profile(app_imports())
+    eager = [module for module in LAZY_MODULES if module in profile]
+    if eager:
+        raise RuntimeError(f"app.py imports {', '.join(eager)} at startup; import them lazily.")
+    return profile
+
+
+@contextlib.contextmanager
+def _working_directory(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+# Each case: setup(size, workdir, options) -> (db_path or None, args); run(conn, args) -> anything.
+def _setup_import(size, workdir, options):
+    kindle_path, _ = corpus_paths(size)
+    return _empty_master(workdir), kindle_path
+
+
+def _setup_master(size, workdir, options):
+    _, master_path = corpus_paths(size)
+    return _working_copy(master_path, workdir), None
+
+
+def _setup_diff(size, workdir, options):
+    db_path, _ = _setup_master(size, workdir, options)
+    conn = sqlite3.connect(db_path)
+    df = grid_data.load_data(conn)
+    conn.close()
+    return db_path, (df, _grid_rows_with_edits(df))
+
+
+def _setup_save(size, workdir, options):
+    db_path, (df, rows) = _setup_diff(size, workdir, options)
+    return db_path, grid_data.find_changes(df, rows)
+
+
+def _setup_none(size, workdir, options):
+    return ":memory:", None
+
+
+def _setup_app(size, workdir, options):
+    from streamlit.testing.v1 import AppTest
+
+    db_path, _ = _setup_master(size, workdir, options)
+    app = AppTest.from_file(APP_PATH, default_timeout=600)
+    # app.py starts every rerun with this session, so its instrumentation.connect
+    # connections count their statements from the first run on.
+    session = instrumentation.Session(enabled=True)
+    app.session_state["metrics_session"] = session
+    # The first (cold) run fills Streamlit's caches; the case times the next rerun.
+    with _working_directory(workdir):
+        app.run()
+    return db_path, (app, workdir, session)
+
+
+def _rerun_app(args):
+    app, workdir, _ = args
+    with _working_directory(workdir):
+        app.run()
+    if app.exception:
+        raise RuntimeError(app.exception[0].message)
+
+
+def _app_statements(args):
+    """
+    SQL statements the last app rerun ran, from its metrics session.
+    """
+    _, _, session = args
+    return sum(entry.get("statements", 0) for entry in session.recent if entry["kind"] == "sql" and entry["run"] == session.run_id)
+
+
+CASES = {
+    "import_kindle_db": (_setup_import, lambda conn, kindle_path, options: pipelines.import_kindle_db(conn, kindle_path)),
+    "load_data": (_setup_master, lambda conn, _, options: grid_data.load_data(conn)),
+    "find_changes": (_setup_diff, lambda conn, args, options: grid_data.find_changes(*args)),
+    "save_changes_from_records": (_setup_save, lambda conn, records, options: grid_data.save_changes_from_records(conn, records)),
+    "run_pedestrian_check": (_setup_master, lambda conn, _, options: pipelines.run_pedestrian_check(conn, llm=options["llm"])),
+    "run_ranking": (_setup_master, lambda conn, _, options: pipelines.run_ranking(conn, llm=options["llm"])),
+    "run_enrichment": (_setup_master, lambda conn, _, options: pipelines.run_enrichment(conn, "New", llm=options["llm"])),
+    "search_words": (_setup_master, lambda conn, _, options: [search.search_words(conn, query) for query in SEARCH_QUERIES]),
+    "startup_imports": (_setup_none, lambda conn, _, options: _check_startup_imports()),
+    "app_rerun": (_setup_app, lambda conn, args, options: _rerun_app(args)),
+}
+# Cases whose SQL runs on connections of their own rather than the benchmark's.
+EXTERNAL_STATEMENTS = {
+    "app_rerun": _app_statements,
+}
+
+
+def _measure_once(case, size, options, trace_memory):
+    setup, run = CASES[case]
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path, args = setup(size, workdir, options)
+        conn = sqlite3.connect(db_path)
+        statements = [0]
+
+        def count_statement(_):
+            statements[0] += 1
+
+        conn.set_trace_callback(count_statement)
+        if trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            run(conn, args, options)
+            elapsed = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        finally:
+            if trace_memory:
+                tracemalloc.stop()
+            conn.close()
+        if case in EXTERNAL_STATEMENTS:
+            statements[0] += EXTERNAL_STATEMENTS[case](args)
+    return elapsed, peak, statements[0]
+
+
+def run_case(case, size, repeat=DEFAULT_REPEAT, options=None):
+    """
+    Times `repeat` runs of a case (best time wins), then one traced run for peak memory.
+    """
+    options = options or {"llm": make_fake_llm()}
+    timings = []
+    statements = 0
+    for _ in range(max(repeat, 1)):
+        elapsed, _, statements = _measure_once(case, size, options, trace_memory=False)
+        timings.append(elapsed)
+    _, peak, _ = _measure_once(case, size, options, trace_memory=True)
+    return {
+        "case": case,
+        "size": size,
+        "wall_s": round(min(timings), 6),
+        "wall_s_median": round(statistics.median(timings), 6),
+        "peak_mb": round(peak / (1024 * 1024), 3),
+        "sql_statements": statements,
+    }
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+    }
+
+
+def compare_to_baseline(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Returns a list of human-readable regression descriptions.
+    """
+    previous = {(row["case"], row["size"]): row for row in baseline.get("results", [])}
+    regressions = []
+    for row in results:
+        base = previous.get((row["case"], row["size"]))
+        if base is None:
+            continue
+        label = f"{row['case']}@{row['size']}"
+        if row["wall_s"] > base["wall_s"] * threshold and row["wall_s"] - base["wall_s"] > MIN_REGRESSION_SECONDS:
+            regressions.append(f"{label}: wall {base['wall_s']:.4f}s -> {row['wall_s']:.4f}s")
+        if row["peak_mb"] > base["peak_mb"] * threshold and row["peak_mb"] - base["peak_mb"] > 1:
+            regressions.append(f"{label}: peak {base['peak_mb']:.1f}MB -> {row['peak_mb']:.1f}MB")
+        if row["sql_statements"] > base["sql_statements"]:
+            regressions.append(f"{label}: statements {base['sql_statements']} -> {row['sql_statements']}")
+    return regressions
+
+
+def _print_table(results, baseline=None):
+    previous = {(row["case"], row["size"]): row for row in (baseline or {}).get("results", [])}
+    print(f"{'case':<28}{'size':>8}{'wall s':>11}{'vs base':>9}{'peak MB':>10}{'stmts':>10}")
+    for row in results:
+        base = previous.get((row["case"], row["size"]))
+        ratio = f"{row['wall_s'] / base['wall_s']:.2f}x" if base and base["wall_s"] else "-"
+        print(f"{row['case']:<28}{row['size']:>8}{row['wall_s']:>11.4f}{ratio:>9}{row['peak_mb']:>10.2f}{row['sql_statements']:>10}")
+
+
+def prompt_token_report():
+    """
+    Token estimates per task and prompt version for sample words and fake-LLM answers.
+    """
+    words = corpus_generator.make_stems(max(PROMPT_BATCH_SIZES.values()))
+    fake = make_fake_llm()
+    rows = prompt_templates.token_report(
+        words,
+        enrichment=_fake_enrich_words(words[:PROMPT_BATCH_SIZES["enrich"]]),
+        scores=fake.assess_difficulty(words),
+        tiers=fake.rank_words_tier(words),
+        batch_sizes=PROMPT_BATCH_SIZES,
+    )
+    first = {}
+    print(f"{'task':<14}{'version':>8}{'words':>7}{'system':>8}{'user':>7}{'answer':>8}{'total':>8}{'vs v1':>7}")
+    for row in rows:
+        base = first.setdefault(row["task"], row["total"])
+        print(f"{row['task']:<14}{row['version']:>8}{row['words']:>7}{row['system']:>8}{row['user']:>7}"
+              f"{row['response']:>8}{row['total']:>8}{row['total'] / base:>6.2f}x")
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the admin pipelines on generated corpora.")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="Comma-separated word counts.")
+    parser.add_argument("--cases", default=None, help="Comma-separated case names (default: all).")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds the fake LLM sleeps per call.")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--prompt-tokens", action="store_true", help="Only print per-call token estimates for each prompt version.")
+    args = parser.parse_args(argv)
+
+    if args.prompt_tokens:
+        prompt_token_report()
+        return 0
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    cases = args.cases.split(",") if args.cases else list(CASES)
+    unknown = [case for case in cases if case not in CASES]
+    if unknown:
+        parser.error(f"Unknown cases: {', '.join(unknown)}")
+
+    options = {"llm": make_fake_llm(args.llm_latency)}
+    results = []
+    for size in sizes:
+        for case in cases:
+            results.append(run_case(case, size, repeat=args.repeat, options=options))
+
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "environment": environment(),
+        "results": results,
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output_path = os.path.join(RESULTS_DIR, f"benchmark-{datetime.datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(output_path, "w") as handle:
+        json.dump(report, handle, indent=2)
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)
+
+    _print_table(results, baseline)
+    print(f"Results written to {output_path}")
+
+    if args.save_baseline:
+        shutil.copyfile(output_path, args.baseline)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if baseline is not None:
+        regressions = compare_to_baseline(results, baseline, args.threshold)
+        if regressions:
+            print("Regressions:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("No regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,334 @@
+"""
+Headless command line for the admin pipelines, for cron jobs and servers.
+
+Usage (from the repository root, or `python cli.py ...` inside desktop_admin):
+    python -m desktop_admin import ~/Kindle/vocab.db --db vocab_master.db
+    python -m desktop_admin import backups/kindles/ --workers 4
+    python -m desktop_admin check --batch-size 200 --concurrency 4
+    python -m desktop_admin rank --concurrency 4
+    python -m desktop_admin enrich --status New --limit 500 --concurrency 4 --json
+    python -m desktop_admin enrich --max-usd 0.50 --concurrency 4
+    python -m desktop_admin export --format csv --status Mastered -o mastered.csv
+    python -m desktop_admin pack --output-dir mobile_app/assets/word_packs
+    python -m desktop_admin dedupe --dry-run --include-similar
+    python -m desktop_admin compact --horizon-days 365 --vacuum
+    python -m desktop_admin options --rebuild
+    python -m desktop_admin mobile-db -o /media/phone/vocab_master.db
+
+Progress goes to stderr (JSON lines with --json) and the final summary to
+stdout (one JSON object with --json). Exit codes: 0 done, 1 finished but some
+words got no LLM result, 2 bad arguments, 3 error (missing file/DB/API key,
+SQLite failure), 130 interrupted.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sqlite3
+import sys
+import time
+
+import db_init
+import instrumentation
+import lemma_merge
+import log_archive
+import mobile_copy
+import pack_builder
+import pipelines
+import quiz_options
+
+EXIT_OK = 0
+EXIT_INCOMPLETE = 1
+EXIT_USAGE = 2
+EXIT_ERROR = 3
+EXIT_INTERRUPTED = 130
+
+STATUS_OPTIONS = ['New', 'On Deck', 'Learning', 'Proficient', 'Adept', 'Mastered', 'Ignored', 'Pau(S)ed']
+REQUIRED_TABLES = {"words", "distractors", "examples", "study_log", "insults"}
+
+
+class CliError(Exception):
+    pass
+
+
+class Reporter:
+    """
+    Writes progress and results either as text or as JSON lines.
+    """
+    def __init__(self, command, as_json=False, quiet=False, stream=None):
+        self.command = command
+        self.as_json = as_json
+        self.quiet = quiet
+        self.stream = stream or sys.stderr
+        self.started = time.perf_counter()
+
+    def elapsed(self):
+        return round(time.perf_counter() - self.started, 3)
+
+    def progress(self, done, total, message):
+        if self.quiet:
+            return
+        if self.as_json:
+            event = {"event": "progress", "command": self.command, "done": done, "total": total,
+                     "message": message, "elapsed_s": self.elapsed()}
+            self.stream.write(json.dumps(event) + "\n")
+        else:
+            self.stream.write(f"[{self.command}] {done}/{total} {message}\n")
+        self.stream.flush()
+
+    def result(self, summary, exit_code, stream):
+        if self.as_json:
+            event = {"event": "result", "command": self.command, "exit_code": exit_code,
+                     "elapsed_s": self.elapsed(), **summary}
+            stream.write(json.dumps(event, default=str) + "\n")
+        else:
+            details = " ".join(f"{key}={value}" for key, value in summary.items() if not isinstance(value, (list, dict)))
+            stream.write(f"{self.command}: {details} ({self.elapsed()}s)\n")
+        stream.flush()
+
+    def error(self, message):
+        if self.as_json:
+            self.stream.write(json.dumps({"event": "error", "command": self.command, "message": message}) + "\n")
+        else:
+            self.stream.write(f"{self.command}: error: {message}\n")
+        self.stream.flush()
+
+
+def open_database(path, create=False):
+    """
+    Opens vocab_master.db and applies the same schema upgrades as the console.
+    """
+    if not create and not os.path.exists(path):
+        raise CliError(f"Database not found: {path}")
+    conn = instrumentation.connect(path)
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    if not REQUIRED_TABLES.issubset(existing):
+        db_init.create_tables(conn)
+    db_init.ensure_words_columns(conn)
+    db_init.ensure_on_deck_status(conn)
+    db_init.ensure_search_index(conn)
+    db_init.ensure_change_feed(conn)
+    return conn
+
+
+def load_llm(args):
+    import llm_helper
+
+    if args.mock:
+        llm_helper.MOCK_MODE = True
+    elif not llm_helper.OPENROUTER_API_KEY:
+        raise CliError("OPENROUTER_API_KEY is not set (use --mock for an offline dry run).")
+    return llm_helper
+
+
+def cmd_import(conn, args, reporter):
+    missing = [path for path in args.kindle_db if not os.path.exists(path)]
+    if missing:
+        raise CliError(f"Kindle database not found: {', '.join(missing)}")
+    paths = pipelines.kindle_paths(args.kindle_db)
+    if not paths:
+        raise CliError("No .db files found.")
+    summary = pipelines.import_kindle_dbs(
+        conn, paths, merge_variants=not args.no_merge, workers=args.workers, progress=reporter.progress,
+    )
+    return summary, EXIT_OK
+
+
+def cmd_check(conn, args, reporter):
+    summary = pipelines.run_pedestrian_check(
+        conn, llm=load_llm(args), batch_size=args.batch_size, concurrency=args.concurrency, progress=reporter.progress,
+    )
+    return summary, EXIT_INCOMPLETE if summary["checked"] < summary["total"] else EXIT_OK
+
+
+def cmd_rank(conn, args, reporter):
+    summary = pipelines.run_ranking(
+        conn, llm=load_llm(args), batch_size=args.batch_size, concurrency=args.concurrency, progress=reporter.progress,
+    )
+    return summary, EXIT_INCOMPLETE if summary["ranked"] < summary["total"] else EXIT_OK
+
+
+def cmd_enrich(conn, args, reporter):
+    summary = pipelines.run_enrichment(
+        conn, args.status, llm=load_llm(args), batch_size=args.batch_size, concurrency=args.concurrency,
+        limit=args.limit, max_tokens=args.max_tokens, max_usd=args.max_usd, progress=reporter.progress,
+    )
+    # Words left queued by the budget are not failures.
+    return summary, EXIT_INCOMPLETE if summary["enriched"] < summary["attempted"] else EXIT_OK
+
+
+def cmd_export(conn, args, reporter):
+    with contextlib.ExitStack() as stack:
+        if args.output == "-":
+            out = args.stdout
+        else:
+            out = stack.enter_context(open(args.output, "w", newline="", encoding="utf-8"))
+        summary = pipelines.export_words(
+            conn, out, fmt=args.format, statuses=args.status, include_enrichment=not args.no_enrichment,
+            progress=reporter.progress,
+        )
+    return summary, EXIT_OK
+
+
+def cmd_dedupe(conn, args, reporter):
+    kinds = lemma_merge.ALL_KINDS if args.include_similar else lemma_merge.AUTO_KINDS
+    reporter.progress(0, 1, "Clustering stems...")
+    clusters = lemma_merge.find_duplicates(conn, kinds)
+    if args.dry_run:
+        proposals = [
+            {"survivor": cluster["survivor"]["word_stem"], "variants": cluster["reasons"]}
+            for cluster in clusters
+        ]
+        if not args.json:
+            for proposal in proposals:
+                variants = ", ".join(f"{stem} ({kind})" for stem, kind in proposal["variants"].items())
+                args.stdout.write(f"{proposal['survivor']} <- {variants}\n")
+        summary = {"clusters": len(clusters), "merged": 0, "proposals": proposals}
+    else:
+        summary = lemma_merge.merge_clusters(conn, clusters)
+    reporter.progress(1, 1, "Dedupe complete.")
+    return summary, EXIT_OK
+
+
+def cmd_compact(conn, args, reporter):
+    summary = log_archive.compact_logs(
+        conn, args.archive or log_archive.default_archive_path(args.db), horizon_days=args.horizon_days,
+        vacuum=args.vacuum, progress=reporter.progress,
+    )
+    summary["feed_pruned"] = db_init.prune_changes(conn)
+    return summary, EXIT_OK
+
+
+def cmd_options(conn, args, reporter):
+    summary = quiz_options.refresh_options(conn, rebuild=args.rebuild, progress=reporter.progress)
+    return summary, EXIT_OK
+
+
+def cmd_mobile_db(conn, args, reporter):
+    summary = mobile_copy.write_mobile_copy(
+        conn, args.output or mobile_copy.default_mobile_path(args.db),
+        archive_path=args.archive or log_archive.default_archive_path(args.db),
+    )
+    return summary, EXIT_OK
+
+
+def cmd_pack(conn, args, reporter):
+    if args.gzip and os.path.abspath(args.output_dir) == os.path.abspath(pack_builder.DEFAULT_OUTPUT_DIR):
+        raise CliError("--gzip packs are for server hosting, not the app's bundled assets; pass --output-dir.")
+    summary = pack_builder.build_packs(
+        conn, output_dir=args.output_dir, words_per_pack=args.words_per_pack, compress=args.gzip,
+        progress=reporter.progress,
+    )
+    return summary, EXIT_OK
+
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--db", default=db_init.DB_NAME, help="Path to vocab_master.db (default: %(default)s).")
+    common.add_argument("--json", action="store_true", help="JSON-lines progress on stderr and a JSON summary on stdout.")
+    common.add_argument("--quiet", action="store_true", help="No progress output.")
+
+    llm_common = argparse.ArgumentParser(add_help=False)
+    llm_common.add_argument("--concurrency", type=int, default=1, help="LLM requests in flight (default: %(default)s).")
+    llm_common.add_argument("--mock", action="store_true", help="Use llm_helper's offline mock responses.")
+
+    parser = argparse.ArgumentParser(prog="python -m desktop_admin", description="Run the admin pipelines without the Streamlit console.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", parents=[common], help="Merge Kindle vocab.db files into the word list.")
+    import_parser.add_argument("kindle_db", nargs="+", help="Kindle vocab.db files or directories (searched for *.db).")
+    import_parser.add_argument("--workers", type=int, default=None, help="Parser processes (default: one per CPU, at most one per file).")
+    import_parser.add_argument("--no-merge", action="store_true", help="Keep inflected variants as separate words.")
+    import_parser.set_defaults(handler=cmd_import, create=True)
+
+    check_parser = subparsers.add_parser("check", parents=[common, llm_common], help="Score New words and ignore pedestrian ones.")
+    check_parser.add_argument("--batch-size", type=int, default=100)
+    check_parser.set_defaults(handler=cmd_check, create=False)
+
+    rank_parser = subparsers.add_parser("rank", parents=[common, llm_common], help="Assign priority tiers to unranked words.")
+    rank_parser.add_argument("--batch-size", type=int, default=50)
+    rank_parser.set_defaults(handler=cmd_rank, create=False)
+
+    enrich_parser = subparsers.add_parser("enrich", parents=[common, llm_common], help="Generate definitions, distractors and examples.")
+    enrich_parser.add_argument("--status", default="New", choices=STATUS_OPTIONS)
+    enrich_parser.add_argument("--batch-size", type=int, default=5)
+    enrich_parser.add_argument("--limit", type=int, default=None, help="Enrich at most this many words.")
+    enrich_parser.add_argument("--max-tokens", type=int, default=None, help="Stop before the run uses more LLM tokens than this.")
+    enrich_parser.add_argument("--max-usd", type=float, default=None, help="Stop before the run costs more than this many USD.")
+    enrich_parser.set_defaults(handler=cmd_enrich, create=False)
+
+    export_parser = subparsers.add_parser("export", parents=[common], help="Write words (with examples and distractors) to a file.")
+    export_parser.add_argument("--format", default="jsonl", choices=pipelines.EXPORT_FORMATS)
+    export_parser.add_argument("--status", action="append", choices=STATUS_OPTIONS, help="Repeatable; default: all statuses.")
+    export_parser.add_argument("--no-enrichment", action="store_true", help="Skip the examples/distractors lists.")
+    export_parser.add_argument("-o", "--output", default="-", help="Output file (default: stdout).")
+    export_parser.set_defaults(handler=cmd_export, create=False)
+
+    dedupe_parser = subparsers.add_parser("dedupe", parents=[common], help="Merge inflected/variant stems into one lemma row.")
+    dedupe_parser.add_argument("--include-similar", action="store_true", help="Also merge case, -er/-ing/-est/-s, -ly/-ness and one-edit spelling variants (review with --dry-run first).")
+    dedupe_parser.add_argument("--dry-run", action="store_true", help="List the clusters without merging.")
+    dedupe_parser.set_defaults(handler=cmd_dedupe, create=False)
+
+    compact_parser = subparsers.add_parser("compact", parents=[common], help="Roll old log rows into daily aggregates and an archive DB.")
+    compact_parser.add_argument("--horizon-days", type=int, default=log_archive.DEFAULT_HORIZON_DAYS, help="Keep raw rows this recent (default: %(default)s).")
+    compact_parser.add_argument("--archive", default=None, help="Archive database (default: <db>_archive.db).")
+    compact_parser.add_argument("--vacuum", action="store_true", help="VACUUM afterwards so the file shrinks.")
+    compact_parser.set_defaults(handler=cmd_compact, create=False)
+
+    options_parser = subparsers.add_parser("options", parents=[common], help="Refresh the quiz_options table the mobile quiz cards read.")
+    options_parser.add_argument("--rebuild", action="store_true", help="Rebuild every word's option sets instead of only changed words.")
+    options_parser.set_defaults(handler=cmd_options, create=False)
+
+    mobile_parser = subparsers.add_parser("mobile-db", parents=[common], help="Write the copy of the DB to put on the phone (no desktop-only schema).")
+    mobile_parser.add_argument("-o", "--output", default=None, help="Output file (default: <db>_mobile.db).")
+    mobile_parser.add_argument("--archive", default=None, help="Compaction archive whose log rows go back into the copy (default: <db>_archive.db).")
+    mobile_parser.set_defaults(handler=cmd_mobile_db, create=False)
+
+    pack_parser = subparsers.add_parser("pack", parents=[common], help="Compile enriched words into mobile word packs.")
+    pack_parser.add_argument("--output-dir", default=pack_builder.DEFAULT_OUTPUT_DIR, help="Word pack directory (default: the app's assets).")
+    pack_parser.add_argument("--words-per-pack", type=int, default=pack_builder.WORDS_PER_PACK)
+    pack_parser.add_argument("--gzip", action="store_true", help="Write .json.gz packs and manifest.gzip.json for server-hosted downloads (needs --output-dir).")
+    pack_parser.set_defaults(handler=cmd_pack, create=False)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    for name in ("batch_size", "concurrency", "limit", "words_per_pack", "horizon_days", "max_tokens", "workers"):
+        value = getattr(args, name, None)
+        if value is not None and value < 1:
+            parser.error(f"--{name.replace('_', '-')} must be at least 1")
+    if getattr(args, "max_usd", None) is not None and args.max_usd <= 0:
+        parser.error("--max-usd must be positive")
+
+    reporter = Reporter(args.command, as_json=args.json, quiet=args.quiet)
+    # Pipelines and llm_helper print diagnostics; keep stdout for results and exports.
+    args.stdout = sys.stdout
+    result_stream = sys.stderr if getattr(args, "output", None) == "-" else sys.stdout
+    instrumentation.start_run()
+    conn = None
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            conn = open_database(args.db, create=args.create)
+            summary, exit_code = args.handler(conn, args, reporter)
+    except CliError as exc:
+        reporter.error(str(exc))
+        return EXIT_ERROR
+    except (sqlite3.Error, OSError) as exc:
+        reporter.error(f"{type(exc).__name__}: {exc}")
+        return EXIT_ERROR
+    except KeyboardInterrupt:
+        reporter.error("interrupted")
+        return EXIT_INTERRUPTED
+    finally:
+        if conn is not None:
+            conn.close()
+        instrumentation.flush()
+
+    reporter.result(summary, exit_code, result_stream)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
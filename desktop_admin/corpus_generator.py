@@ -0,0 +1,419 @@
+"""
+Reproducible synthetic corpora for benchmarks.
+
+Generates Kindle vocab.db files and pre-populated vocab_master.db files of any
+size. Rows are streamed to SQLite with executemany in fixed-size chunks, so a
+1M-lookup corpus never has to fit in Python lists at once.
+
+Usage:
+    python corpus_generator.py kindle bench/vocab_100k.db --lookups 100000 --books 400
+    python corpus_generator.py master bench/master_50k.db --words 50000 --history-days 1095
+"""
+import argparse
+import datetime
+import math
+import os
+import sqlite3
+
+import numpy as np
+
+import create_dummy_kindle_db
+import db_init
+
+DEFAULT_CHUNK_SIZE = 50000
+# Bumped whenever the same arguments start producing different rows, so cached benchmark corpora are regenerated.
+CORPUS_VERSION = 2
+
+CONSONANTS = "bcdfghjklmnprstvwz"
+VOWELS = "aeiou"
+SYLLABLES = [c + v for c in CONSONANTS for v in VOWELS]
+STEM_ENDINGS = ["ous", "ate", "ity", "ent", "ive", "ize", "ism", "ial", "ant", "ure", "ine", "ory"]
+INFLECTIONS = ["s", "d", "ly", "ness", "ing"]
+
+BOOK_WORDS = [
+    "Silent", "River", "Glass", "Empire", "Winter", "Harbor", "Shadow", "Orchard", "Iron", "Garden",
+    "Lantern", "Meridian", "Quiet", "Crown", "Ember", "Atlas", "Hollow", "Signal", "Tide", "Archive",
+]
+AUTHOR_FIRST = ["Ada", "Miles", "Iris", "Jonah", "Clara", "Felix", "Nora", "Elias", "Vera", "Otto"]
+AUTHOR_LAST = ["Hale", "Moreau", "Quinn", "Okafor", "Lindqvist", "Brandt", "Sato", "Reyes", "Whitlock", "Adeyemi"]
+
+USAGE_TEMPLATES = [
+    "The {w} silence of the hall made everyone lower their voices.",
+    "She answered with a {w} smile that told him nothing at all.",
+    "His {w} manner had unsettled the committee from the very first meeting.",
+    "Nothing about the {w} letter suggested the trouble that would follow.",
+    "They had grown used to the {w} rhythm of life along the coast.",
+    "It was a {w} decision, and he knew it even as he signed.",
+    "The old house kept its {w} secrets well into the next century.",
+    "Her {w} reply drew a murmur from the back of the room.",
+]
+LEAD_INS = ["Relating to", "Having", "Marked by", "Characterized by", "Being", "Showing"]
+TOPICS = [
+    "seasonal weather patterns and forecasting", "theatrical performance and stagecraft",
+    "culinary technique and slow cooking", "insect behavior and life cycles",
+    "navigation safety and route planning", "financial markets and speculation",
+    "marine biology and ecosystem balance", "architectural design and planning",
+    "religious ceremony and liturgy", "bird migration and seasonal movement",
+    "mechanical repair and maintenance", "medical nutrition and recovery",
+    "software updates and release cycles", "group psychology and social behavior",
+    "careful and deliberate official work", "sudden and reckless enthusiasm",
+    "quiet resentment held over time", "excessive politeness toward superiors",
+    "a fleeting and temporary quality", "stubborn refusal to change course",
+]
+EXAMPLE_TEMPLATES = [
+    "By the end of the meeting, her {w} tone had turned scattered talk into measured decisions.",
+    "He approached the negotiations with a {w} air, pausing often and preferring certainty over speed.",
+    "After the notice arrived, the office adopted a {w} style in every response it sent.",
+    "She chose a {w} approach to the case, resisting shortcuts at every turn.",
+    "His {w} habits made him the obvious choice for tasks demanding patience.",
+]
+
+# (status, weight) for generated master rows.
+STATUS_MIX = [
+    ("New", 0.25), ("On Deck", 0.15), ("Learning", 0.05), ("Proficient", 0.08),
+    ("Adept", 0.08), ("Mastered", 0.14), ("Ignored", 0.25),
+]
+ENRICHED_STATUSES = {"On Deck", "Learning", "Proficient", "Adept", "Mastered"}
+STUDIED_STATUSES = ["Learning", "Proficient", "Adept", "Mastered"]
+REVIEW_DAYS = {"Proficient": 1, "Adept": 3, "Mastered": 14}
+
+
+def make_stems(count, syllables=None):
+    """
+    Returns `count` unique, pronounceable pseudo-words (deterministic per index).
+    A check syllable (digit sum) follows the index syllables, so any two stems
+    differ in at least two syllables and never look like one-edit spelling
+    variants of each other to lemma_merge.
+    """
+    syllables = syllables or max(3, math.ceil(math.log(max(count, 2), len(SYLLABLES))))
+    stems = []
+    for index in range(count):
+        digits = []
+        value = index
+        for _ in range(syllables):
+            value, digit = divmod(value, len(SYLLABLES))
+            digits.append(digit)
+        digits.append(sum(digits) % len(SYLLABLES))
+        stems.append("".join(SYLLABLES[digit] for digit in digits) + STEM_ENDINGS[index % len(STEM_ENDINGS)])
+    return stems
+
+
+def make_surface_forms(words, variant_rate, rng):
+    """
+    Returns `words` unique stems: lemmas plus a `variant_rate` share of
+    inflected forms of random lemmas, drawing again whenever a variant repeats
+    one already taken.
+    """
+    # Enough lemmas that the requested variants exist at all.
+    lemma_count = max(int(round(words * (1 - variant_rate))), -(-words // (len(INFLECTIONS) + 1)), 1)
+    lemmas = make_stems(lemma_count)
+    surface = dict.fromkeys(lemmas[:words])
+    offset = 0
+    while len(surface) < words:
+        for base in rng.integers(0, lemma_count, size=words - len(surface)).tolist():
+            surface.setdefault(_inflect(lemmas[base], base + offset))
+            offset += 1
+    return list(surface)
+
+
+def zipf_weights(count, exponent=1.07):
+    """
+    Normalized Zipf probabilities for ranks 1..count.
+    """
+    weights = 1.0 / np.power(np.arange(1, count + 1, dtype="float64"), exponent)
+    return weights / weights.sum()
+
+
+def make_books(count):
+    titles = []
+    for index in range(count):
+        first = BOOK_WORDS[index % len(BOOK_WORDS)]
+        second = BOOK_WORDS[(index // len(BOOK_WORDS) + 7) % len(BOOK_WORDS)]
+        suffix = f" {index // (len(BOOK_WORDS) ** 2) + 1}" if index >= len(BOOK_WORDS) ** 2 else ""
+        author = f"{AUTHOR_FIRST[index % len(AUTHOR_FIRST)]} {AUTHOR_LAST[(index // len(AUTHOR_FIRST)) % len(AUTHOR_LAST)]}"
+        titles.append((f"The {first} {second}{suffix}", author))
+    return titles
+
+
+def _open_for_bulk_load(path):
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    # Throwaway benchmark files: trade durability for load speed.
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    return conn
+
+
+def _chunks(total, chunk_size):
+    for start in range(0, total, chunk_size):
+        yield start, min(start + chunk_size, total)
+
+
+def _inflect(stem, rng_value):
+    # English spelling rules, so every variant is one lemma_merge can trace back to its stem.
+    suffix = INFLECTIONS[rng_value % len(INFLECTIONS)]
+    if suffix == "d" and not stem.endswith("e"):
+        suffix = "ed"
+    elif suffix == "s" and stem.endswith("s"):
+        suffix = "es"
+    elif suffix == "ing" and stem.endswith("e"):
+        stem = stem[:-1]
+    return stem + suffix
+
+
+def generate_kindle_db(path, lookups=10000, words=None, books=50, variant_rate=0.1, years=3,
+                       seed=0, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Writes a Kindle-style vocab.db with long-tailed lookups per word and per book.
+    A `variant_rate` share of WORDS rows carry an inflected stem of another word.
+    words defaults to lookups // 3 and is capped at lookups.
+    Returns a dictionary of row counts.
+    """
+    rng = np.random.default_rng(seed)
+    words = min(words or max(lookups // 3, 1), lookups)
+    conn = _open_for_bulk_load(path)
+    create_dummy_kindle_db.create_kindle_tables(conn)
+    cursor = conn.cursor()
+
+    surface = make_surface_forms(words, variant_rate, rng)
+
+    end_ms = int(datetime.datetime(2026, 1, 1).timestamp() * 1000)
+    start_ms = end_ms - int(years * 365 * 86400 * 1000)
+
+    cursor.execute("BEGIN")
+    for start, stop in _chunks(words, chunk_size):
+        cursor.executemany(
+            "INSERT INTO WORDS (id, stem, word, lang, category, timestamp, profileid) VALUES (?, ?, ?, 'en', 0, ?, '')",
+            [(f"en:{surface[i]}", surface[i], surface[i], start_ms) for i in range(start, stop)],
+        )
+
+    book_rows = make_books(books)
+    cursor.executemany(
+        "INSERT INTO BOOK_INFO (id, asin, guid, lang, title, authors) VALUES (?, ?, ?, 'en', ?, ?)",
+        [(f"book{i}", f"ASIN{i:07d}", f"guid{i}", title, author) for i, (title, author) in enumerate(book_rows)],
+    )
+
+    # Every word is looked up at least once; repeat lookups follow a
+    # gamma-weighted long tail, and a few books get most of the reading.
+    first_lookups = rng.permutation(words)
+    repeat_p = rng.gamma(0.5, size=words)
+    repeat_p /= repeat_p.sum()
+    book_p = zipf_weights(books, exponent=0.8)
+    for start, stop in _chunks(lookups, chunk_size):
+        size = stop - start
+        firsts = first_lookups[start:stop]
+        repeats = rng.choice(words, size=size - len(firsts), p=repeat_p)
+        word_idx = np.concatenate((firsts, repeats))
+        book_idx = rng.choice(books, size=size, p=book_p)
+        template_idx = rng.integers(0, len(USAGE_TEMPLATES), size=size)
+        stamps = np.sort(rng.integers(start_ms, end_ms, size=size))
+        cursor.executemany(
+            "INSERT INTO LOOKUPS (id, word_key, book_key, dict_key, pos, usage, timestamp) VALUES (?, ?, ?, 'dict1', '0', ?, ?)",
+            [
+                (
+                    f"lookup{start + j}",
+                    f"en:{surface[w]}",
+                    f"book{b}",
+                    USAGE_TEMPLATES[t].format(w=surface[w]),
+                    int(ts),
+                )
+                for j, (w, b, t, ts) in enumerate(zip(word_idx.tolist(), book_idx.tolist(), template_idx.tolist(), stamps.tolist()))
+            ],
+        )
+    conn.commit()
+    conn.close()
+    return {"words": words, "books": books, "lookups": lookups}
+
+
+def _definition(rng_value):
+    lead_in = LEAD_INS[rng_value % len(LEAD_INS)]
+    return f"{lead_in} {TOPICS[(rng_value // len(LEAD_INS)) % len(TOPICS)]}."
+
+
+def _create_mobile_log_tables(conn):
+    # Same DDL as the mobile db_helper, so log-heavy benchmarks see the real file layout.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS status_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            word_id INTEGER,
+            from_status TEXT,
+            to_status TEXT,
+            FOREIGN KEY (word_id) REFERENCES words (id)
+        );
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS score_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            word_id INTEGER,
+            points INTEGER NOT NULL,
+            reason TEXT,
+            mode TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            session_id TEXT,
+            FOREIGN KEY (word_id) REFERENCES words (id)
+        );
+    """)
+
+
+def generate_master_db(path, words=10000, books=50, distractors_per_word=15, examples_per_word=5,
+                       history_days=730, answers_per_day=20, variant_rate=0.05, seed=0,
+                       chunk_size=DEFAULT_CHUNK_SIZE, end_date=None):
+    """
+    Writes a vocab_master.db with a realistic status mix, enrichment rows for
+    studied words and `history_days` of study_log/status_log/score_log history.
+    Returns a dictionary of row counts.
+    """
+    rng = np.random.default_rng(seed)
+    end_date = end_date or datetime.date(2026, 1, 1)
+    conn = _open_for_bulk_load(path)
+    db_init.create_tables(conn)
+    # Per-row search triggers are slow for bulk loads; the index is rebuilt at the end.
+    db_init.drop_search_index(conn)
+    _create_mobile_log_tables(conn)
+    cursor = conn.cursor()
+
+    stems = make_surface_forms(words, variant_rate, rng)
+    rng.shuffle(stems)
+
+    status_names = [name for name, _ in STATUS_MIX]
+    status_p = np.array([weight for _, weight in STATUS_MIX])
+    statuses = rng.choice(len(status_names), size=words, p=status_p / status_p.sum())
+    book_rows = make_books(books)
+    book_idx = rng.choice(books, size=words, p=zipf_weights(books, exponent=0.8))
+    tiers = rng.integers(1, 6, size=words)
+    difficulty = rng.integers(1, 11, size=words)
+    bucket_offsets = rng.integers(0, max(history_days, 1), size=words)
+
+    counts = {"words": 0, "distractors": 0, "examples": 0, "study_log": 0, "status_log": 0, "score_log": 0}
+    cursor.execute("BEGIN")
+    for start, stop in _chunks(words, chunk_size):
+        rows = []
+        for i in range(start, stop):
+            status = status_names[statuses[i]]
+            enriched = status in ENRICHED_STATUSES
+            checked = status != "New"
+            bucket = end_date - datetime.timedelta(days=int(bucket_offsets[i])) if enriched else None
+            review = None
+            if status in REVIEW_DAYS:
+                review = (bucket + datetime.timedelta(days=REVIEW_DAYS[status])).isoformat()
+            stem = stems[i]
+            rows.append((
+                i + 1,
+                stem,
+                USAGE_TEMPLATES[i % len(USAGE_TEMPLATES)].format(w=stem),
+                book_rows[book_idx[i]][0],
+                _definition(i) if enriched else None,
+                status,
+                bucket.isoformat() if bucket else None,
+                review,
+                int(difficulty[i]) if checked else None,
+                int(tiers[i]) if checked else None,
+                int(rng.integers(0, 3)) if status in STUDIED_STATUSES else 0,
+            ))
+        cursor.executemany(
+            """
+                INSERT INTO words (id, word_stem, original_context, book_title, definition, status,
+                                   bucket_date, next_review_date, difficulty_score, priority_tier, status_correct_streak)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            rows,
+        )
+        counts["words"] += len(rows)
+
+        enriched_ids = [row[0] for row in rows if row[4] is not None]
+        cursor.executemany(
+            "INSERT INTO distractors (word_id, text) VALUES (?, ?)",
+            (
+                (word_id, _definition(word_id * distractors_per_word + k + 1))
+                for word_id in enriched_ids
+                for k in range(distractors_per_word)
+            ),
+        )
+        cursor.executemany(
+            "INSERT INTO examples (word_id, sentence) VALUES (?, ?)",
+            (
+                (word_id, EXAMPLE_TEMPLATES[k % len(EXAMPLE_TEMPLATES)].format(w=stems[word_id - 1]))
+                for word_id in enriched_ids
+                for k in range(examples_per_word)
+            ),
+        )
+        counts["distractors"] += len(enriched_ids) * distractors_per_word
+        counts["examples"] += len(enriched_ids) * examples_per_word
+
+    studied_ids = np.flatnonzero(np.isin(statuses, [status_names.index(s) for s in STUDIED_STATUSES])) + 1
+    if len(studied_ids) and history_days > 0 and answers_per_day > 0:
+        # Stream the history a block of days at a time.
+        days_per_block = max(chunk_size // answers_per_day, 1)
+        first_day = end_date - datetime.timedelta(days=history_days)
+        for block_start, block_stop in _chunks(history_days, days_per_block):
+            per_day = rng.poisson(answers_per_day, size=block_stop - block_start)
+            day_idx = np.repeat(np.arange(block_start, block_stop), per_day)
+            total = len(day_idx)
+            word_ids = rng.choice(studied_ids, size=total)
+            correct = rng.random(total) < 0.72
+            seconds = rng.integers(6 * 3600, 23 * 3600, size=total)
+            log_rows, status_rows, score_rows = [], [], []
+            for day, word_id, ok, second in zip(day_idx.tolist(), word_ids.tolist(), correct.tolist(), seconds.tolist()):
+                stamp = (datetime.datetime.combine(first_day + datetime.timedelta(days=day), datetime.time())
+                         + datetime.timedelta(seconds=second)).isoformat(sep=" ")
+                session = f"s{day}"
+                log_rows.append((stamp, word_id, "Correct" if ok else "Incorrect", session))
+                if ok:
+                    score_rows.append((word_id, 10, "correct", "multiple_choice", stamp, session))
+                elif second % 3 == 0:
+                    status_rows.append((stamp, word_id, "Proficient", "Learning"))
+            cursor.executemany("INSERT INTO study_log (timestamp, word_id, result, session_id) VALUES (?, ?, ?, ?)", log_rows)
+            cursor.executemany("INSERT INTO status_log (timestamp, word_id, from_status, to_status) VALUES (?, ?, ?, ?)", status_rows)
+            cursor.executemany(
+                "INSERT INTO score_log (word_id, points, reason, mode, timestamp, session_id) VALUES (?, ?, ?, ?, ?, ?)",
+                score_rows,
+            )
+            counts["study_log"] += len(log_rows)
+            counts["status_log"] += len(status_rows)
+            counts["score_log"] += len(score_rows)
+
+    conn.commit()
+    db_init.ensure_search_index(conn)
+    conn.close()
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic Kindle / vocab_master databases.")
+    subparsers = parser.add_subparsers(dest="kind", required=True)
+
+    kindle = subparsers.add_parser("kindle", help="Kindle vocab.db")
+    kindle.add_argument("path")
+    kindle.add_argument("--lookups", type=int, default=10000)
+    kindle.add_argument("--words", type=int, default=None)
+    kindle.add_argument("--books", type=int, default=50)
+    kindle.add_argument("--variant-rate", type=float, default=0.1)
+    kindle.add_argument("--years", type=float, default=3)
+    kindle.add_argument("--seed", type=int, default=0)
+
+    master = subparsers.add_parser("master", help="pre-populated vocab_master.db")
+    master.add_argument("path")
+    master.add_argument("--words", type=int, default=10000)
+    master.add_argument("--books", type=int, default=50)
+    master.add_argument("--history-days", type=int, default=730)
+    master.add_argument("--answers-per-day", type=int, default=20)
+    master.add_argument("--variant-rate", type=float, default=0.05)
+    master.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args()
+    if args.kind == "kindle":
+        result = generate_kindle_db(
+            args.path, lookups=args.lookups, words=args.words, books=args.books,
+            variant_rate=args.variant_rate, years=args.years, seed=args.seed,
+        )
+    else:
+        result = generate_master_db(
+            args.path, words=args.words, books=args.books, history_days=args.history_days,
+            answers_per_day=args.answers_per_day, variant_rate=args.variant_rate, seed=args.seed,
+        )
+    print(f"Generated {args.path}: " + ", ".join(f"{k}={v}" for k, v in result.items()))
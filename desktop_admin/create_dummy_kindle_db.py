@@ -3,11 +3,7 @@ import os
 
 DB_NAME = "import_db/vocab.db"
 
-def create_dummy_kindle_db():
-    if not os.path.exists("import_db"):
-        os.makedirs("import_db")
-
-    conn = sqlite3.connect(DB_NAME)
+def create_kindle_tables(conn):
     cursor = conn.cursor()
 
     # Kindle Schema (Simplified)
@@ -45,6 +41,15 @@ def create_dummy_kindle_db():
             timestamp INTEGER DEFAULT 0
         );
     """)
+    conn.commit()
+
+def create_dummy_kindle_db():
+    if not os.path.exists("import_db"):
+        os.makedirs("import_db")
+
+    conn = sqlite3.connect(DB_NAME)
+    cursor = conn.cursor()
+    create_kindle_tables(conn)
 
     # Insert Dummy Data
     words = [
@@ -1,3 +1,4 @@
+import contextlib
 import sqlite3
 import os
 
@@ -79,6 +80,8 @@ def create_tables(conn):
 
         ensure_words_columns(conn)
         ensure_on_deck_status(conn)
+        ensure_search_index(conn)
+        ensure_change_feed(conn)
         
         # Pre-populate insults
         cursor.execute("SELECT count(*) FROM insults")
@@ -184,6 +187,12 @@ def ensure_on_deck_status(conn):
     cursor.execute("PRAGMA foreign_keys=ON")
     conn.commit()
 
+def schema_version(conn):
+    """
+    SQLite's schema cookie: changes whenever any table, index or trigger changes.
+    """
+    return conn.execute("PRAGMA schema_version").fetchone()[0]
+
 def ensure_words_columns(conn):
     cursor = conn.cursor()
     cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='words'")
@@ -200,6 +209,361 @@ def ensure_words_columns(conn):
         cursor.execute("ALTER TABLE words ADD COLUMN status_correct_streak INTEGER DEFAULT 0")
     conn.commit()
 
+# Tables keyed by word_id; indexed so per-word lookups, merges and deletes don't scan them.
+WORD_CHILD_TABLES = ("distractors", "examples", "study_log", "status_log", "score_log")
+
+def ensure_child_indexes(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    tables = {row[0] for row in cursor.fetchall()}
+    for table in WORD_CHILD_TABLES:
+        if table in tables:
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_word_id ON {table} (word_id)")
+    conn.commit()
+
+# Full-text search over words plus their example sentences (one FTS row per word,
+# rowid = words.id). Triggers keep it in sync with words and examples.
+SEARCH_TABLE = "words_fts"
+SEARCH_COLUMNS = ("word_stem", "original_context", "book_title", "definition", "examples")
+# bm25 weights, in SEARCH_COLUMNS order: a hit on the stem outranks one in a sentence.
+SEARCH_WEIGHTS = (10.0, 2.0, 1.0, 4.0, 1.0)
+SEARCH_TRIGGERS = {
+    "words_fts_insert": """
+        CREATE TRIGGER IF NOT EXISTS words_fts_insert AFTER INSERT ON words BEGIN
+            INSERT INTO words_fts (rowid, word_stem, original_context, book_title, definition, examples)
+            VALUES (
+                NEW.id, NEW.word_stem, NEW.original_context, NEW.book_title, NEW.definition,
+                (SELECT group_concat(sentence, ' / ') FROM examples WHERE word_id = NEW.id)
+            );
+        END;
+    """,
+    "words_fts_update": """
+        CREATE TRIGGER IF NOT EXISTS words_fts_update
+        AFTER UPDATE OF id, word_stem, original_context, book_title, definition ON words BEGIN
+            DELETE FROM words_fts WHERE rowid = OLD.id;
+            INSERT INTO words_fts (rowid, word_stem, original_context, book_title, definition, examples)
+            VALUES (
+                NEW.id, NEW.word_stem, NEW.original_context, NEW.book_title, NEW.definition,
+                (SELECT group_concat(sentence, ' / ') FROM examples WHERE word_id = NEW.id)
+            );
+        END;
+    """,
+    "words_fts_delete": """
+        CREATE TRIGGER IF NOT EXISTS words_fts_delete AFTER DELETE ON words BEGIN
+            DELETE FROM words_fts WHERE rowid = OLD.id;
+        END;
+    """,
+    "examples_fts_insert": """
+        CREATE TRIGGER IF NOT EXISTS examples_fts_insert AFTER INSERT ON examples BEGIN
+            UPDATE words_fts
+            SET examples = (SELECT group_concat(sentence, ' / ') FROM examples WHERE word_id = NEW.word_id)
+            WHERE rowid = NEW.word_id;
+        END;
+    """,
+    "examples_fts_update": """
+        CREATE TRIGGER IF NOT EXISTS examples_fts_update AFTER UPDATE OF word_id, sentence ON examples BEGIN
+            UPDATE words_fts
+            SET examples = (
+                SELECT group_concat(sentence, ' / ') FROM examples WHERE examples.word_id = words_fts.rowid
+            )
+            WHERE rowid IN (OLD.word_id, NEW.word_id);
+        END;
+    """,
+    "examples_fts_delete": """
+        CREATE TRIGGER IF NOT EXISTS examples_fts_delete AFTER DELETE ON examples BEGIN
+            UPDATE words_fts
+            SET examples = (SELECT group_concat(sentence, ' / ') FROM examples WHERE word_id = OLD.word_id)
+            WHERE rowid = OLD.word_id;
+        END;
+    """,
+}
+
+def ensure_search_index(conn):
+    """
+    Creates the FTS5 search table and its sync triggers, backfilling it when new.
+    Returns False (and leaves the schema alone) if SQLite was built without FTS5.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name IN ('words', 'examples')")
+    if len(cursor.fetchall()) < 2:
+        return False
+
+    cursor.execute("SELECT name FROM sqlite_master WHERE name = ?", (SEARCH_TABLE,))
+    is_new = cursor.fetchone() is None
+    if is_new:
+        try:
+            cursor.execute(f"""
+                CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5(
+                    {", ".join(SEARCH_COLUMNS)},
+                    tokenize = 'porter unicode61 remove_diacritics 2',
+                    prefix = '2 3'
+                )
+            """)
+        except sqlite3.OperationalError as e:
+            print(f"Full-text search disabled: {e}")
+            return False
+        weights = ", ".join(str(weight) for weight in SEARCH_WEIGHTS)
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rank) VALUES ('rank', 'bm25({weights})')")
+
+    for trigger_sql in SEARCH_TRIGGERS.values():
+        cursor.execute(trigger_sql)
+    if is_new:
+        rebuild_search_index(conn)
+    conn.commit()
+    return True
+
+def rebuild_search_index(conn):
+    """
+    Repopulates the search table from words and examples in one pass.
+    """
+    cursor = conn.cursor()
+    cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+    cursor.execute(f"""
+        INSERT INTO {SEARCH_TABLE} (rowid, word_stem, original_context, book_title, definition, examples)
+        SELECT w.id, w.word_stem, w.original_context, w.book_title, w.definition, e.sentences
+        FROM words w
+        LEFT JOIN (
+            SELECT word_id, group_concat(sentence, ' / ') AS sentences
+            FROM examples
+            GROUP BY word_id
+        ) e ON e.word_id = w.id
+    """)
+    conn.commit()
+
+@contextlib.contextmanager
+def deferred_search_sync(conn, word_ids):
+    """
+    For bulk edits of a known set of words: drops the per-row search triggers
+    and re-syncs only `word_ids` afterwards. Opens a transaction first when
+    none is active (sqlite3 would otherwise run the DROP TRIGGERs in
+    autocommit), so the drops, the caller's edits and the re-sync commit or
+    roll back together; commits nothing itself. If the block raises, the
+    triggers are re-created anyway, so even a caller that commits after an
+    error keeps the index in sync from then on.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (SEARCH_TABLE,))
+    if cursor.fetchone() is None:
+        yield
+        return
+    if not conn.in_transaction:
+        cursor.execute("BEGIN")
+    for name in SEARCH_TRIGGERS:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    try:
+        yield
+        word_ids = list(word_ids)
+        for start in range(0, len(word_ids), 500):
+            chunk = word_ids[start:start + 500]
+            placeholders = ", ".join("?" for _ in chunk)
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})", chunk)
+            cursor.execute(f"""
+                INSERT INTO {SEARCH_TABLE} (rowid, word_stem, original_context, book_title, definition, examples)
+                SELECT w.id, w.word_stem, w.original_context, w.book_title, w.definition,
+                       (SELECT group_concat(sentence, ' / ') FROM examples WHERE word_id = w.id)
+                FROM words w
+                WHERE w.id IN ({placeholders})
+            """, chunk)
+    finally:
+        for trigger_sql in SEARCH_TRIGGERS.values():
+            cursor.execute(trigger_sql)
+
+# Append-only log of row changes (seq, table, row id, op, word id) written by
+# triggers, so caches and sync can pick up only what changed since their cursor.
+CHANGE_FEED_TABLE = "change_feed"
+CHANGE_FEED_TABLES = ("words", "distractors", "examples", "study_log", "status_log", "score_log")
+# Cursor row holding the highest pruned seq, so readers behind it know to reload.
+PRUNED_CURSOR = "_pruned"
+# Consumers that no longer exist; their cursors would hold back pruning.
+RETIRED_FEED_CONSUMERS = ("deck_candidates",)
+# Most entries prune_changes keeps, however far behind a consumer is; a
+# consumer left behind the prune gets None from read_changes and rebuilds.
+CHANGE_FEED_KEEP = 100000
+# Extra table_name logged for updates of a word's stem or definition, so readers
+# that only depend on those (quiz options) can skip status and score writes.
+DEFINITION_FEED = "words_definition"
+
+def _change_feed_triggers(table):
+    word_id = "id" if table == "words" else "word_id"
+    triggers = {
+        f"{table}_feed_insert": f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_feed_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO {CHANGE_FEED_TABLE} (table_name, row_id, op, word_id) VALUES ('{table}', NEW.id, 'I', NEW.{word_id});
+            END;
+        """,
+        f"{table}_feed_update": f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_feed_update AFTER UPDATE ON {table} BEGIN
+                INSERT INTO {CHANGE_FEED_TABLE} (table_name, row_id, op, word_id) VALUES ('{table}', NEW.id, 'U', NEW.{word_id});
+            END;
+        """,
+        f"{table}_feed_delete": f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_feed_delete AFTER DELETE ON {table} BEGIN
+                INSERT INTO {CHANGE_FEED_TABLE} (table_name, row_id, op, word_id) VALUES ('{table}', OLD.id, 'D', OLD.{word_id});
+            END;
+        """,
+    }
+    if table == "words":
+        triggers["words_feed_definition"] = f"""
+            CREATE TRIGGER IF NOT EXISTS words_feed_definition AFTER UPDATE OF word_stem, definition ON words BEGIN
+                INSERT INTO {CHANGE_FEED_TABLE} (table_name, row_id, op, word_id) VALUES ('{DEFINITION_FEED}', NEW.id, 'U', NEW.id);
+            END;
+        """
+    return triggers
+
+def ensure_change_feed(conn):
+    """
+    Creates the change feed and its cursor table and installs the feed
+    triggers on every CHANGE_FEED_TABLES table present (the mobile app creates
+    status_log/score_log on first use, so this runs on every open).
+    """
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {CHANGE_FEED_TABLE} (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            op TEXT NOT NULL CHECK(op IN ('I', 'U', 'D')),
+            word_id INTEGER
+        );
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS change_feed_cursors (
+            consumer TEXT PRIMARY KEY,
+            seq INTEGER NOT NULL
+        );
+    """)
+    cursor.execute(
+        f"DELETE FROM change_feed_cursors WHERE consumer IN ({', '.join('?' for _ in RETIRED_FEED_CONSUMERS)})",
+        RETIRED_FEED_CONSUMERS,
+    )
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    tables = {row[0] for row in cursor.fetchall()}
+    for table in CHANGE_FEED_TABLES:
+        if table in tables:
+            for trigger_sql in _change_feed_triggers(table).values():
+                cursor.execute(trigger_sql)
+    conn.commit()
+    prune_changes(conn)
+
+def change_feed_seq(conn):
+    """
+    The latest change seq (0 before the first change); a cheap cache key.
+    """
+    return conn.execute(f"SELECT COALESCE(MAX(seq), 0) FROM {CHANGE_FEED_TABLE}").fetchone()[0]
+
+def read_changes(conn, since=0, tables=None, limit=None):
+    """
+    Changes after seq `since`, oldest first, as [(seq, table_name, row_id, op, word_id)].
+    Returns None when entries after `since` have been pruned, i.e. the reader
+    fell behind and has to reload everything.
+    """
+    pruned = conn.execute("SELECT seq FROM change_feed_cursors WHERE consumer = ?", (PRUNED_CURSOR,)).fetchone()
+    if pruned is not None and since < pruned[0]:
+        return None
+    query = f"SELECT seq, table_name, row_id, op, word_id FROM {CHANGE_FEED_TABLE} WHERE seq > ?"
+    params = [since]
+    if tables:
+        query += f" AND table_name IN ({', '.join('?' for _ in tables)})"
+        params += list(tables)
+    query += " ORDER BY seq"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(int(limit))
+    return conn.execute(query, params).fetchall()
+
+def acknowledge_changes(conn, consumer, seq):
+    """
+    Records that `consumer` has processed every change up to `seq` and prunes
+    what every registered consumer has now processed, so the feed only holds
+    entries someone still needs. Returns the number of entries pruned.
+    """
+    conn.execute(
+        """
+            INSERT INTO change_feed_cursors (consumer, seq) VALUES (?, ?)
+            ON CONFLICT(consumer) DO UPDATE SET seq = MAX(seq, excluded.seq)
+        """,
+        (consumer, seq),
+    )
+    conn.commit()
+    return prune_changes(conn)
+
+@contextlib.contextmanager
+def unlogged_deletes(conn, tables):
+    """
+    Keeps deletes from `tables` inside the block out of the change feed, for
+    bulk moves that change nothing a consumer tracks (compaction archiving
+    log rows). Drops the tables' feed delete triggers and re-creates them
+    afterwards, inside one transaction like deferred_search_sync.
+    """
+    cursor = conn.cursor()
+    triggers = {row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+    paused = [table for table in tables if f"{table}_feed_delete" in triggers]
+    if not conn.in_transaction:
+        cursor.execute("BEGIN")
+    for table in paused:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {table}_feed_delete")
+    try:
+        yield
+    finally:
+        for table in paused:
+            cursor.execute(_change_feed_triggers(table)[f"{table}_feed_delete"])
+
+def consumer_cursor(conn, consumer):
+    """
+    The last seq `consumer` acknowledged, or None before its first acknowledge_changes.
+    """
+    row = conn.execute("SELECT seq FROM change_feed_cursors WHERE consumer = ?", (consumer,)).fetchone()
+    return row[0] if row else None
+
+def prune_changes(conn, through=None):
+    """
+    Deletes changes up to seq `through` (default: what every registered
+    consumer has acknowledged, and at least all but the latest
+    CHANGE_FEED_KEEP entries, so a consumer that stopped running cannot
+    make the feed grow without bound). Returns the number of entries removed.
+    """
+    if through is None:
+        acknowledged = conn.execute(
+            "SELECT MIN(seq) FROM change_feed_cursors WHERE consumer != ?", (PRUNED_CURSOR,)
+        ).fetchone()[0]
+        through = max(acknowledged or 0, change_feed_seq(conn) - CHANGE_FEED_KEEP)
+    if through <= 0:
+        return 0
+    with conn:
+        removed = conn.execute(f"DELETE FROM {CHANGE_FEED_TABLE} WHERE seq <= ?", (through,)).rowcount
+        conn.execute(
+            """
+                INSERT INTO change_feed_cursors (consumer, seq) VALUES (?, ?)
+                ON CONFLICT(consumer) DO UPDATE SET seq = MAX(seq, excluded.seq)
+            """,
+            (PRUNED_CURSOR, through),
+        )
+    return removed
+
+def drop_change_feed(conn):
+    """
+    Removes the feed triggers and tables, e.g. from the copy that goes to the
+    phone, where nothing reads or prunes the feed.
+    """
+    cursor = conn.cursor()
+    for table in CHANGE_FEED_TABLES:
+        for name in _change_feed_triggers(table):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    cursor.execute(f"DROP TABLE IF EXISTS {CHANGE_FEED_TABLE}")
+    cursor.execute("DROP TABLE IF EXISTS change_feed_cursors")
+    conn.commit()
+
+def drop_search_index(conn):
+    """
+    Removes the search table and triggers, e.g. before a bulk load
+    (ensure_search_index rebuilds it afterwards).
+    """
+    cursor = conn.cursor()
+    for name in SEARCH_TRIGGERS:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+    conn.commit()
+
 if __name__ == "__main__":
     if not os.path.exists(DB_NAME):
         print(f"Creating new database: {DB_NAME}")
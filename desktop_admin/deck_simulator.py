@@ -0,0 +1,438 @@
+"""
+Offline simulator for the mobile daily-deck selection.
+
+Mirrors getDailyDeck / _promoteOnDeckToLearning / _pickCandidatesByBias /
+recordAnswer from mobile_app/lib/db_helper.dart against an in-memory copy of
+vocab_master.db, driven by a synthetic learner, so deck settings can be tuned
+without a phone.
+
+Usage:
+    python deck_simulator.py --db vocab_master.db --days 180 --set quiz_length=25
+"""
+import argparse
+import datetime
+import math
+import random
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+import log_archive
+import scheduler
+
+DB_NAME = "vocab_master.db"
+
+STATUSES = ['New', 'On Deck', 'Learning', 'Proficient', 'Adept', 'Mastered', 'Ignored', 'Pau(S)ed']
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+NEW, ON_DECK, LEARNING, PROFICIENT, ADEPT, MASTERED, IGNORED, PAUSED = range(len(STATUSES))
+STAGE_ORDER = (LEARNING, PROFICIENT, ADEPT)
+
+# Sentinel for NULL bucket_date / next_review_date (a NULL review date is always due).
+NO_DATE = np.iinfo(np.int32).min
+
+# SharedPreferences defaults used by the mobile app.
+DEFAULT_SETTINGS = {
+    "quiz_length": 20,
+    "max_learning": 20,
+    "max_proficient": 20,
+    "max_adept": 30,
+    "pct_mastered": 10,
+    "within_stage_bias": 1,
+    "promote_learning_correct": 3,
+    "promote_proficient_correct": 4,
+    "promote_adept_correct": 5,
+}
+
+# Synthetic learner model.
+DEFAULT_LEARNER = {
+    "new_words_per_day": 5,         # enriched words arriving On Deck each day
+    "base_recall": 0.85,            # recall chance for a difficulty-1 word in Learning
+    "difficulty_penalty": 0.04,     # recall lost per difficulty point above 1
+    "ability_spread": 0.08,         # per-word noise around the difficulty curve
+    "stage_bonus": 0.04,            # recall gained per stage above Learning
+    "forgetting_per_day": 0.01,     # recall lost per day past next_review_date
+    "practice_gain": 0.01,          # recall gained per correct answer
+    "sentence_pass_rate": 0.7,      # chance the Adept -> Mastered usage check passes
+    "skip_day_rate": 0.0,           # chance no quiz is taken on a given day
+}
+
+REVIEW_INTERVALS = {STATUS_CODES[status]: days for status, days in scheduler.REVIEW_INTERVALS.items()}
+BIAS_ALPHA = 0.7
+
+
+def _grow(state, extra):
+    size = state["size"]
+    if size + extra <= len(state["status"]):
+        return
+    capacity = max(size + extra, len(state["status"]) * 2)
+    for key, value in state.items():
+        if isinstance(value, np.ndarray):
+            grown = np.empty(capacity, dtype=value.dtype)
+            grown[:size] = value[:size]
+            state[key] = grown
+
+
+def _initial_ability(difficulty, learner, rng):
+    difficulty = np.where(np.isnan(difficulty), 5.0, difficulty)
+    ability = (
+        learner["base_recall"]
+        - learner["difficulty_penalty"] * (difficulty - 1.0)
+        + rng.normal(0.0, learner["ability_spread"], size=len(difficulty))
+    )
+    return np.clip(ability, 0.05, 0.99)
+
+
+def load_word_state(conn, learner=None, today=None, seed=None):
+    """
+    Loads the words table (plus study_log exposure counts) into NumPy arrays.
+    Day offsets are relative to today, which becomes simulation day 0.
+    """
+    learner = {**DEFAULT_LEARNER, **(learner or {})}
+    today = today or datetime.date.today()
+    rng = np.random.default_rng(seed)
+    # The connection is read-only, so the combined log view is not created here.
+    answers = log_archive.daily_all_source(conn, "study_log")
+    frame = pd.read_sql_query(f"""
+        SELECT
+            w.id,
+            w.status,
+            w.priority_tier,
+            w.difficulty_score,
+            w.bucket_date,
+            w.next_review_date,
+            COALESCE(w.status_correct_streak, 0) AS streak,
+            COALESCE(SUM(l.attempts), 0) AS attempts
+        FROM words w
+        LEFT JOIN {answers} l
+            ON l.word_id = w.id
+           AND l.day >= COALESCE(w.bucket_date, '1970-01-01')
+        GROUP BY w.id
+    """, conn)
+
+    def _days(column):
+        offsets = scheduler.date_offsets(frame[column], today)
+        return np.where(np.isnan(offsets), NO_DATE, offsets).astype(np.int32)
+
+    tier = pd.to_numeric(frame["priority_tier"], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    difficulty = pd.to_numeric(frame["difficulty_score"], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    return {
+        "size": len(frame),
+        "status": frame["status"].map(STATUS_CODES).fillna(NEW).to_numpy(dtype=np.int8),
+        "tier": np.nan_to_num(tier, nan=0).astype(np.int8),
+        "streak": frame["streak"].to_numpy(dtype=np.int16),
+        "attempts": frame["attempts"].to_numpy(dtype=np.int32),
+        "bucket_day": _days("bucket_date"),
+        "review_day": _days("next_review_date"),
+        "ability": _initial_ability(difficulty, learner, rng).astype(np.float32),
+    }
+
+
+def _add_new_words(state, count, day, learner, rng):
+    if count <= 0:
+        return
+    _grow(state, count)
+    start, end = state["size"], state["size"] + count
+    state["status"][start:end] = ON_DECK
+    state["tier"][start:end] = rng.integers(1, 6, size=count)
+    state["streak"][start:end] = 0
+    state["attempts"][start:end] = 0
+    state["bucket_day"][start:end] = day
+    state["review_day"][start:end] = NO_DATE
+    state["ability"][start:end] = _initial_ability(rng.uniform(3, 9, size=count), learner, rng)
+    state["size"] = end
+
+
+def _promote_on_deck(state, day, active_limit, learning_count, rng):
+    """
+    Mirrors _promoteOnDeckToLearning. Returns (promoted, queries).
+    """
+    queries = 2  # _hasTable + COUNT(Learning)
+    needed = active_limit - learning_count
+    if needed <= 0:
+        return 0, queries
+
+    queries += 1  # On Deck candidates
+    candidates = np.flatnonzero(state["status"][:state["size"]] == ON_DECK)
+    if len(candidates) == 0:
+        return 0, queries
+
+    # Null/invalid tiers count as tier 3; lowest tier first, random within a tier.
+    tiers = state["tier"][candidates].astype(np.int64)
+    tiers = np.clip(np.where(tiers <= 0, 3, tiers), 1, 5)
+    picks = candidates[np.lexsort((rng.random(len(candidates)), tiers))][:needed]
+
+    state["status"][picks] = LEARNING
+    state["bucket_day"][picks] = day
+    state["review_day"][picks] = NO_DATE
+    state["attempts"][picks] = 0
+    return len(picks), queries + 2 * len(picks)
+
+
+def _exposure_rates(state, indices, day):
+    bucket = state["bucket_day"][indices].astype(np.int64)
+    days = np.where(bucket == NO_DATE, 1, np.maximum(day - bucket + 1, 1))
+    return state["attempts"][indices] / days
+
+
+def _order_candidates(state, indices, day, bias, rng):
+    """
+    Orders a status pool the way repeated _pickCandidatesByBias calls would
+    draw from it, so popping from the front is one weighted pick.
+    """
+    if len(indices) == 0 or bias <= 0:
+        return rng.permutation(indices)
+    rates = _exposure_rates(state, indices, day)
+    if bias >= 2:
+        return indices[np.lexsort((rng.random(len(indices)), rates))]
+    # Weighted sampling without replacement via exponential keys (Efraimidis-Spirakis).
+    weights = 1.0 / np.power(1.0 + rates, BIAS_ALPHA)
+    return indices[np.argsort(rng.exponential(size=len(indices)) / weights)]
+
+
+def build_deck(state, day, settings, rng, pick_rng):
+    """
+    Mirrors getDailyDeck. Returns (deck_indices, query_count).
+    """
+    quiz_length = settings["quiz_length"]
+    bias = settings["within_stage_bias"]
+    queries = 1  # _hasTable(words)
+    if quiz_length <= 0:
+        return np.zeros(0, dtype=np.int64), queries
+
+    size = state["size"]
+    learning_count = int(np.count_nonzero(state["status"][:size] == LEARNING))
+    _, promote_queries = _promote_on_deck(state, day, settings["max_learning"], learning_count, rng)
+    queries += promote_queries
+
+    status = state["status"][:size]
+    due = state["review_day"][:size] <= day
+    deck = []
+
+    # Dart's round() is half-away-from-zero.
+    mastered_target = min(max(int(math.floor(quiz_length * settings["pct_mastered"] / 100 + 0.5)), 0), quiz_length)
+    if mastered_target > 0:
+        queries += 1
+        pool = np.flatnonzero((status == MASTERED) & due)
+        deck.extend(_order_candidates(state, pool, day, bias, rng)[:mastered_target].tolist())
+
+    remaining = quiz_length - len(deck)
+    if remaining > 0:
+        queries += 1  # COUNT(*) GROUP BY status
+        counts = np.bincount(status, minlength=len(STATUSES))
+        max_targets = {
+            LEARNING: settings["max_learning"],
+            PROFICIENT: settings["max_proficient"],
+            ADEPT: settings["max_adept"],
+        }
+        weights = {
+            stage: 1.0 + counts[stage] / (max_targets[stage] if max_targets[stage] > 0 else 1)
+            for stage in STAGE_ORDER
+        }
+        pools = {}
+        cursors = {stage: 0 for stage in STAGE_ORDER}
+        exhausted = set()
+
+        def _pool(stage):
+            if stage not in pools:
+                mask = status == stage
+                if stage != LEARNING:
+                    mask &= due
+                pools[stage] = _order_candidates(state, np.flatnonzero(mask), day, bias, rng)
+            return pools[stage]
+
+        while remaining > 0:
+            candidates = [stage for stage in STAGE_ORDER if stage not in exhausted and counts[stage] > 0]
+            if not candidates:
+                break
+            total_weight = sum(weights[stage] for stage in candidates)
+            pick = pick_rng.random() * total_weight
+            cumulative = 0.0
+            selected = candidates[0]
+            for stage in candidates:
+                cumulative += weights[stage]
+                if pick <= cumulative:
+                    selected = stage
+                    break
+
+            queries += 1
+            pool = _pool(selected)
+            if cursors[selected] >= len(pool):
+                exhausted.add(selected)
+                continue
+            deck.append(int(pool[cursors[selected]]))
+            cursors[selected] += 1
+            remaining -= 1
+
+        for stage in STAGE_ORDER:
+            if remaining <= 0:
+                break
+            queries += 1
+            pool = _pool(stage)
+            taken = pool[cursors[stage]:cursors[stage] + remaining]
+            cursors[stage] += len(taken)
+            deck.extend(taken.tolist())
+            remaining = quiz_length - len(deck)
+
+    return np.asarray(deck, dtype=np.int64), queries
+
+
+def answer_deck(state, deck, day, settings, learner, rng):
+    """
+    Vectorized recordAnswer for a whole session. Returns the number correct.
+    """
+    if len(deck) == 0:
+        return 0
+
+    status = state["status"][deck].astype(np.int64)
+    review = state["review_day"][deck].astype(np.int64)
+    overdue = np.where(review == NO_DATE, 0, np.maximum(day - review, 0))
+    recall = (
+        state["ability"][deck]
+        + learner["stage_bonus"] * np.maximum(status - LEARNING, 0)
+        - learner["forgetting_per_day"] * overdue
+    )
+    correct = rng.random(len(deck)) < np.clip(recall, 0.02, 0.99)
+
+    thresholds = np.full(len(STATUSES), np.iinfo(np.int16).max, dtype=np.int64)
+    thresholds[LEARNING] = settings["promote_learning_correct"]
+    thresholds[PROFICIENT] = settings["promote_proficient_correct"]
+    thresholds[ADEPT] = settings["promote_adept_correct"]
+
+    streak = np.where(correct, state["streak"][deck].astype(np.int64) + 1, 0)
+    promote = correct & (streak >= thresholds[status])
+    new_status = status.copy()
+
+    step_up = promote & ((status == LEARNING) | (status == PROFICIENT))
+    new_status[step_up] += 1
+    streak[step_up] = 0
+
+    # Adept -> Mastered is gated by the sentence-usage check.
+    gated = promote & (status == ADEPT)
+    passed = gated & (rng.random(len(deck)) < learner["sentence_pass_rate"])
+    streak[gated] = max(0, settings["promote_adept_correct"] - 1)
+    new_status[passed] = MASTERED
+    streak[passed] = 0
+
+    demote = ~correct
+    new_status[demote] = np.where((status[demote] > LEARNING) & (status[demote] <= MASTERED), status[demote] - 1, LEARNING)
+
+    intervals = np.zeros(len(STATUSES), dtype=np.int64)
+    for code, days in REVIEW_INTERVALS.items():
+        intervals[code] = days
+    next_review = np.where(intervals[new_status] > 0, day + intervals[new_status], NO_DATE)
+
+    state["status"][deck] = new_status
+    state["streak"][deck] = streak
+    state["bucket_day"][deck] = day
+    state["review_day"][deck] = next_review
+    # The study_log row is written just after bucket_date, so it is the only exposure.
+    state["attempts"][deck] = 1
+    state["ability"][deck] = np.minimum(state["ability"][deck] + learner["practice_gain"] * correct, 0.99)
+    return int(np.count_nonzero(correct))
+
+
+def simulate(state, days, settings=None, learner=None, seed=None):
+    """
+    Runs `days` daily sessions against a word state (mutated in place).
+    Returns a DataFrame with one row per simulated day.
+    """
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    learner = {**DEFAULT_LEARNER, **(learner or {})}
+    rng = np.random.default_rng(seed)
+    pick_rng = random.Random(seed)
+
+    columns = ["deck_size", "queries", "correct", "due_backlog"] + [f"count_{STATUSES[code]}" for code in (ON_DECK, LEARNING, PROFICIENT, ADEPT, MASTERED)]
+    records = np.zeros((days, len(columns)), dtype=np.int64)
+    for day in range(days):
+        _add_new_words(state, learner["new_words_per_day"], day, learner, rng)
+
+        deck_size = queries = correct = 0
+        if pick_rng.random() >= learner["skip_day_rate"]:
+            deck, queries = build_deck(state, day, settings, rng, pick_rng)
+            correct = answer_deck(state, deck, day, settings, learner, rng)
+            deck_size = len(deck)
+            learning_count = int(np.count_nonzero(state["status"][:state["size"]] == LEARNING))
+            _promote_on_deck(state, day, settings["max_learning"], learning_count, rng)
+
+        status = state["status"][:state["size"]]
+        counts = np.bincount(status, minlength=len(STATUSES))
+        reviewable = (status >= PROFICIENT) & (status <= MASTERED)
+        backlog = int(np.count_nonzero(reviewable & (state["review_day"][:state["size"]] <= day)))
+        records[day] = [deck_size, queries, correct, backlog] + [counts[code] for code in (ON_DECK, LEARNING, PROFICIENT, ADEPT, MASTERED)]
+
+    daily = pd.DataFrame(records, columns=columns)
+    daily.insert(0, "day", np.arange(days))
+    return daily
+
+
+def summarize(daily, elapsed=None):
+    """
+    Collapses a simulate() frame into headline numbers.
+    """
+    if daily.empty:
+        return {}
+    played = daily[daily["deck_size"] > 0]
+    first, last = daily.iloc[0], daily.iloc[-1]
+    summary = {
+        "days": len(daily),
+        "sessions": len(played),
+        "avg_deck_size": round(float(played["deck_size"].mean()), 2) if len(played) else 0.0,
+        "avg_queries_per_deck": round(float(played["queries"].mean()), 2) if len(played) else 0.0,
+        "max_queries_per_deck": int(daily["queries"].max()),
+        "accuracy": round(float(played["correct"].sum() / max(played["deck_size"].sum(), 1)), 3),
+        "on_deck_growth": int(last["count_On Deck"] - first["count_On Deck"]),
+        "final_due_backlog": int(last["due_backlog"]),
+        "max_due_backlog": int(daily["due_backlog"].max()),
+        "final_mastered": int(last["count_Mastered"]),
+    }
+    if elapsed:
+        summary["days_per_second"] = round(len(daily) / elapsed, 1)
+    return summary
+
+
+def run_simulation(db_path=DB_NAME, days=180, settings=None, learner=None, seed=None):
+    """
+    Loads db_path read-only, simulates `days` sessions and returns (daily, summary).
+    """
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        state = load_word_state(conn, learner=learner, seed=seed)
+    finally:
+        conn.close()
+
+    started = time.perf_counter()
+    daily = simulate(state, days, settings=settings, learner=learner, seed=seed)
+    return daily, summarize(daily, time.perf_counter() - started)
+
+
+def _parse_overrides(pairs):
+    settings, learner = {}, {}
+    for pair in pairs or []:
+        key, _, raw = pair.partition("=")
+        if key in DEFAULT_SETTINGS:
+            settings[key] = int(raw)
+        elif key in DEFAULT_LEARNER:
+            learner[key] = type(DEFAULT_LEARNER[key])(float(raw))
+        else:
+            raise SystemExit(f"Unknown setting: {key}")
+    return settings, learner
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate mobile daily decks against a vocab_master.db.")
+    parser.add_argument("--db", default=DB_NAME)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--set", dest="overrides", action="append", metavar="KEY=VALUE",
+                        help="Override a deck setting or learner parameter (repeatable).")
+    parser.add_argument("--csv", help="Write the per-day results to this CSV file.")
+    args = parser.parse_args()
+
+    settings, learner = _parse_overrides(args.overrides)
+    daily, summary = run_simulation(args.db, args.days, settings=settings, learner=learner, seed=args.seed)
+    if args.csv:
+        daily.to_csv(args.csv, index=False)
+    for key, value in summary.items():
+        print(f"{key}: {value}")
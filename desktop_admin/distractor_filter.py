@@ -0,0 +1,188 @@
+"""
+Local quality filter for LLM-generated distractors.
+
+Every candidate in a batch is embedded at once as a hashed character n-gram
+TF-IDF vector (NumPy only, fixed width so memory stays bounded), and cosine
+similarity matrices are computed per word. A candidate is rejected when it
+- breaks the prompt's format rules (length, target word, meta labels),
+- reads like the word's real definition, or
+- nearly duplicates a distractor already kept for the same word.
+"""
+import functools
+import re
+
+import numpy as np
+
+NGRAM_SIZE = 3
+HASH_DIM = 4096
+# Cosine similarity (char 3-gram TF-IDF) at or above which two texts count as the same.
+DUPLICATE_SIMILARITY = 0.65
+# ...and at or above which a distractor is treated as a paraphrase of the definition.
+DEFINITION_SIMILARITY = 0.45
+# The prompt asks for 5-12 words within +-2 of the definition; allow a little slack.
+MIN_WORDS = 4
+MAX_WORDS = 14
+DEFINITION_LENGTH_SLACK = 4
+TARGET_DISTRACTORS = 15
+# Words left with fewer than this many distractors get a follow-up request.
+MIN_DISTRACTORS = 10
+# Meta labels and generic-label lead-ins the prompt forbids ("a type of X", "brand name").
+BANNED_PATTERNS = re.compile(
+    r"\b(type|kind|sort|category|genre|brand|model) of\b|\b(brand|model|product|app|software|file) name\b",
+    re.IGNORECASE,
+)
+
+# Endings mentions_word treats as the target word in another form.
+INFLECTION_SUFFIXES = ("s", "es", "d", "ed", "ing", "er", "est", "ly")
+VOWELS = "aeiou"
+
+_TOKEN_RE = re.compile(r"[a-z']+")
+
+
+def _tokens(text):
+    return _TOKEN_RE.findall(text.lower())
+
+
+def word_count(text):
+    return len(_tokens(text or ""))
+
+
+def _ngram_counts(texts):
+    """
+    (len(texts), HASH_DIM) counts of hashed character n-grams, computed for all
+    texts at once with a polynomial rolling hash over their code points.
+    """
+    padded = [f" {' '.join(_tokens(text))} " for text in texts]
+    lengths = np.array([len(text) for text in padded])
+    codes = np.frombuffer("".join(padded).encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+    rows = np.repeat(np.arange(len(texts)), lengths)
+    # An n-gram starting at position i is valid when it ends inside the same text.
+    ends = np.repeat(np.cumsum(lengths), lengths)
+    starts = np.nonzero(np.arange(len(codes)) + NGRAM_SIZE <= ends)[0]
+    hashes = np.zeros(len(starts), dtype=np.int64)
+    for offset in range(NGRAM_SIZE):
+        hashes = (hashes * 1000003 + codes[starts + offset]) % 2147483647
+    counts = np.zeros((len(texts), HASH_DIM), dtype=np.float32)
+    np.add.at(counts, (rows[starts], hashes % HASH_DIM), 1.0)
+    return counts
+
+
+def tfidf_matrix(texts):
+    """
+    Returns an L2-normalized (len(texts), HASH_DIM) float32 TF-IDF matrix over
+    hashed character n-grams, with IDF taken from `texts` themselves.
+    """
+    counts = _ngram_counts(texts)
+    document_frequency = np.count_nonzero(counts, axis=0)
+    idf = np.log((1.0 + len(texts)) / (1.0 + document_frequency)) + 1.0
+    weights = np.log1p(counts) * idf.astype(np.float32)
+    norms = np.linalg.norm(weights, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return weights / norms
+
+
+@functools.lru_cache(maxsize=4096)
+def word_forms(word):
+    """
+    The word plus its regular inflections and -ly form (study: studies,
+    studied, studying, ...; stop: stopped; write: writing; gentle: gently).
+    Only explicit endings count, so short words do not match unrelated words
+    that merely share their first letters (indite/individual, refute/refuge).
+    """
+    word = word.lower()
+    bases = {word}
+    if word.endswith("e"):
+        bases.add(word[:-1])
+    if len(word) > 2 and word.endswith("y") and word[-2] not in VOWELS:
+        bases.add(word[:-1] + "i")
+    if len(word) > 2 and word[-1] not in VOWELS + "wxy" and word[-2] in VOWELS and word[-3] not in VOWELS:
+        bases.add(word + word[-1])
+    forms = {word, word + "'s"}
+    forms.update(base + suffix for base in bases for suffix in INFLECTION_SUFFIXES)
+    if word.endswith("le"):
+        forms.add(word[:-1] + "y")
+    return frozenset(forms)
+
+
+def mentions_word(text, word):
+    """
+    True when `text` contains the target word or one of its inflected forms.
+    """
+    forms = word_forms(word)
+    return any(token in forms for token in _tokens(text))
+
+
+def format_problem(text, word, definition_length):
+    """
+    Returns why `text` breaks the prompt's distractor rules, or None.
+    """
+    length = len(_tokens(text))
+    if length < MIN_WORDS:
+        return "too_short"
+    if length > MAX_WORDS:
+        return "too_long"
+    if definition_length and abs(length - definition_length) > DEFINITION_LENGTH_SLACK:
+        return "length_mismatch"
+    if mentions_word(text, word):
+        return "mentions_word"
+    if BANNED_PATTERNS.search(text):
+        return "meta_label"
+    return None
+
+
+def filter_batch(entries, limit=TARGET_DISTRACTORS):
+    """
+    Filters distractors for a batch of enriched words.
+
+    entries: {word: {"definition": str, "distractors": [str, ...], ...}}
+    Returns ({word: kept distractors (at most `limit`)}, {word: {reason: count}}).
+    """
+    words = [word for word, data in entries.items() if isinstance(data, dict)]
+    texts = []
+    spans = {}
+    for word in words:
+        start = len(texts)
+        texts.append(entries[word].get("definition") or "")
+        texts.extend(entries[word].get("distractors") or [])
+        spans[word] = (start, len(texts))
+    matrix = tfidf_matrix(texts) if texts else None
+
+    kept_by_word = {}
+    rejected_by_word = {}
+    for word in words:
+        start, end = spans[word]
+        candidates = texts[start + 1:end]
+        vectors = matrix[start:end]
+        similarity = vectors @ vectors.T
+        definition_length = len(_tokens(texts[start]))
+        has_definition = bool(texts[start].strip())
+
+        kept = []
+        rejected = {}
+        for offset, text in enumerate(candidates):
+            row = offset + 1
+            reason = format_problem(text, word, definition_length)
+            if reason is None and has_definition and similarity[row, 0] >= DEFINITION_SIMILARITY:
+                reason = "like_definition"
+            if reason is None and kept and similarity[row, kept].max() >= DUPLICATE_SIMILARITY:
+                reason = "near_duplicate"
+            if reason is None:
+                kept.append(row)
+            else:
+                rejected[reason] = rejected.get(reason, 0) + 1
+        kept_by_word[word] = [texts[start + row] for row in kept[:limit]]
+        rejected_by_word[word] = rejected
+    return kept_by_word, rejected_by_word
+
+
+def short_words(kept_by_word, target=TARGET_DISTRACTORS):
+    """
+    {word: missing count} for words that kept fewer than MIN_DISTRACTORS
+    (scaled down when fewer than TARGET_DISTRACTORS were asked for).
+    """
+    minimum = max(target * MIN_DISTRACTORS // TARGET_DISTRACTORS, 1)
+    return {
+        word: target - len(kept)
+        for word, kept in kept_by_word.items()
+        if len(kept) < minimum
+    }
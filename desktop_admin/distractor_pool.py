@@ -0,0 +1,192 @@
+"""
+Shared pool of distractor phrases, reused across words.
+
+Every existing distractor and definition is stored once in `distractor_pool`
+and bucketed by guessed part of speech, length band and lead-in phrase
+("Relating to...", "Having..."). Enrichment asks the LLM for only a few
+word-specific distractors and fills the rest with pool entries from the
+definition's bucket (widening to the same part of speech when a bucket is
+thin). Each row carries a random sort key, so picking k entries from a bucket
+is an index range scan rather than ORDER BY RANDOM() over the bucket.
+"""
+import random
+import re
+
+import distractor_filter
+
+# Distractors requested from the LLM per word once the pool is big enough.
+LLM_DISTRACTORS = 5
+# Below this many pool entries the LLM still writes all TARGET_DISTRACTORS.
+MIN_POOL_SIZE = 500
+# Pool candidates drawn per missing distractor, since the filter rejects some.
+CANDIDATE_FACTOR = 2
+LENGTH_BANDS = (5, 8, 12)
+
+ADJECTIVE_LEAD_INS = (
+    "relating to", "characterized by", "marked by", "having", "being", "showing",
+    "full of", "lacking", "prone to", "inclined to", "tending to", "given to",
+    "resembling", "capable of", "fond of", "inclined toward",
+)
+NOUN_LEAD_INS = ("a", "an", "the", "one who", "someone who", "something that", "the act of", "the quality of", "the state of")
+VERB_LEAD_INS = ("to",)
+ADVERB_LEAD_INS = ("in a", "with")
+
+_LEAD_INS = sorted(
+    [(lead_in, "adjective") for lead_in in ADJECTIVE_LEAD_INS]
+    + [(lead_in, "noun") for lead_in in NOUN_LEAD_INS]
+    + [(lead_in, "verb") for lead_in in VERB_LEAD_INS]
+    + [(lead_in, "adverb") for lead_in in ADVERB_LEAD_INS],
+    key=lambda item: -len(item[0]),
+)
+_WORD_RE = re.compile(r"[a-z']+")
+
+
+def classify(text):
+    """
+    Returns (part_of_speech, length_band, lead_in) for a definition-style phrase.
+    """
+    words = _WORD_RE.findall(text.lower())
+    phrase = " ".join(words)
+    band = sum(len(words) > limit for limit in LENGTH_BANDS)
+    for lead_in, pos in _LEAD_INS:
+        if phrase == lead_in or phrase.startswith(lead_in + " "):
+            return pos, band, lead_in
+    return "other", band, words[0] if words else ""
+
+
+def ensure_pool(conn):
+    """
+    Creates the pool table (filling it from distractors and definitions when new).
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='distractor_pool'")
+    if cursor.fetchone() is not None:
+        return
+    cursor.execute("""
+        CREATE TABLE distractor_pool (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            text TEXT UNIQUE NOT NULL,
+            pos TEXT NOT NULL,
+            length_band INTEGER NOT NULL,
+            lead_in TEXT NOT NULL,
+            source_word_id INTEGER,
+            sort_key REAL NOT NULL
+        );
+    """)
+    cursor.execute("CREATE INDEX idx_distractor_pool_bucket ON distractor_pool (pos, length_band, lead_in, sort_key)")
+    cursor.execute("CREATE INDEX idx_distractor_pool_pos ON distractor_pool (pos, sort_key)")
+    rebuild_pool(conn)
+
+
+def rebuild_pool(conn):
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM distractor_pool")
+    rows = cursor.execute("""
+        SELECT word_id, text FROM distractors
+        UNION ALL
+        SELECT id, definition FROM words WHERE definition IS NOT NULL AND definition != ''
+    """).fetchall()
+    add_to_pool(conn, rows)
+
+
+def add_to_pool(conn, rows):
+    """
+    Adds (source_word_id, text) pairs; texts already in the pool are skipped.
+    """
+    entries = []
+    for word_id, text in rows:
+        text = (text or "").strip()
+        if not text:
+            continue
+        pos, band, lead_in = classify(text)
+        entries.append((text, pos, band, lead_in, word_id, random.random()))
+    conn.executemany(
+        """
+            INSERT OR IGNORE INTO distractor_pool (text, pos, length_band, lead_in, source_word_id, sort_key)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        entries,
+    )
+    conn.commit()
+
+
+def pool_size(conn):
+    ensure_pool(conn)
+    return conn.execute("SELECT count(*) FROM distractor_pool").fetchone()[0]
+
+
+def llm_distractor_count(conn):
+    """
+    How many distractors enrichment should ask the LLM for per word.
+    """
+    if pool_size(conn) < MIN_POOL_SIZE:
+        return distractor_filter.TARGET_DISTRACTORS
+    return LLM_DISTRACTORS
+
+
+def _sample(conn, where, params, count, exclude_word_id, rng):
+    """
+    Up to `count` pool texts matching `where`, starting at a random sort key and
+    wrapping around to the start of the range when needed.
+    """
+    start = rng.random()
+    query = f"""
+        SELECT text FROM distractor_pool
+        WHERE {where} AND sort_key {{op}} ? AND (source_word_id IS NULL OR source_word_id != ?)
+        ORDER BY sort_key
+        LIMIT ?
+    """
+    texts = [row[0] for row in conn.execute(query.format(op=">="), (*params, start, exclude_word_id, count))]
+    if len(texts) < count:
+        texts += [row[0] for row in conn.execute(query.format(op="<"), (*params, start, exclude_word_id, count - len(texts)))]
+    return texts
+
+
+def sample_for(conn, definition, count, exclude_word_id=None, rng=None):
+    """
+    Draws `count` pool entries shaped like `definition`: same bucket first, then
+    the same part of speech and length band, then the same part of speech.
+    """
+    rng = rng or random
+    pos, band, lead_in = classify(definition or "")
+    picked = []
+    for where, params in (
+        ("pos = ? AND length_band = ? AND lead_in = ?", (pos, band, lead_in)),
+        ("pos = ? AND length_band = ?", (pos, band)),
+        ("pos = ?", (pos,)),
+    ):
+        for text in _sample(conn, where, params, count - len(picked), exclude_word_id, rng):
+            if text not in picked and text != definition:
+                picked.append(text)
+        if len(picked) >= count:
+            break
+    return picked[:count]
+
+
+def fill_batch(conn, enrichment_data, word_ids, target=distractor_filter.TARGET_DISTRACTORS, rng=None):
+    """
+    Tops up each word's distractors to `target` from the pool, in place.
+    LLM-written distractors stay first (the phone shows the first ones); pool
+    picks pass the same quality filter as LLM output. Returns pool entries used.
+    """
+    ensure_pool(conn)
+    candidates = {}
+    for word, data in enrichment_data.items():
+        existing = list(data.get("distractors") or [])
+        missing = target - len(existing)
+        if missing <= 0 or not data.get("definition"):
+            continue
+        extra = sample_for(conn, data["definition"], missing * CANDIDATE_FACTOR, word_ids.get(word), rng)
+        candidates[word] = {
+            "definition": data["definition"],
+            "distractors": existing + [text for text in extra if text not in existing],
+        }
+    if not candidates:
+        return 0
+
+    kept, _ = distractor_filter.filter_batch(candidates, limit=target)
+    used = 0
+    for word, distractors in kept.items():
+        used += max(len(distractors) - len(enrichment_data[word].get("distractors") or []), 0)
+        enrichment_data[word]["distractors"] = distractors
+    return used
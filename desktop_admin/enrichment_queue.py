@@ -0,0 +1,202 @@
+"""
+Persistent, priority-ordered queue of words waiting for LLM enrichment.
+
+`enrichment_queue` holds one row per word still to be enriched, with the time
+of its latest Kindle lookup (recorded on import) and how often enrichment has
+already failed for it. Runs take words in value order:
+- fewer failed attempts first (a word the LLM keeps skipping does not block the queue),
+- lower `priority_tier` first (tier 1 = most useful), unranked words last,
+- higher `difficulty_score` first within a tier,
+- most recently looked up first,
+and give up on a word after MAX_ATTEMPTS failed runs.
+
+Each run is logged in `enrichment_runs` with the words it sent, the tokens it
+used and what it cost, so the next run can estimate tokens per word and stop
+before a token or USD budget is exceeded rather than after it.
+"""
+MAX_ATTEMPTS = 3
+# Used until enrichment_runs has history: one word's share of the batch prompt plus its JSON answer.
+ESTIMATED_TOKENS_PER_WORD = 1200
+# Blended prompt/completion price, for when the API response carries no cost.
+USD_PER_MILLION_TOKENS = 3.0
+
+QUEUE_ORDER = """
+    q.attempts,
+    w.priority_tier IS NULL, w.priority_tier,
+    w.difficulty_score IS NULL, w.difficulty_score DESC,
+    q.looked_up_at IS NULL, q.looked_up_at DESC,
+    w.id
+"""
+
+
+def ensure_queue(conn):
+    """
+    Creates the queue and run-log tables when missing.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='enrichment_queue'")
+    if cursor.fetchone() is not None:
+        return
+    cursor.execute("""
+        CREATE TABLE enrichment_queue (
+            word_id INTEGER PRIMARY KEY,
+            looked_up_at INTEGER,
+            enqueued_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_run_id INTEGER,
+            FOREIGN KEY(word_id) REFERENCES words(id)
+        );
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS enrichment_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            started_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            status_filter TEXT,
+            words INTEGER NOT NULL DEFAULT 0,
+            enriched INTEGER NOT NULL DEFAULT 0,
+            tokens INTEGER NOT NULL DEFAULT 0,
+            cost_usd REAL NOT NULL DEFAULT 0,
+            max_tokens INTEGER,
+            max_usd REAL,
+            stopped_by_budget BOOLEAN DEFAULT 0
+        );
+    """)
+    conn.commit()
+
+
+def record_lookups(conn, lookups):
+    """
+    Queues New words from (word_stem, looked_up_at) pairs, keeping each word's
+    latest lookup time (Kindle epoch milliseconds). Runs in the caller's
+    transaction (call ensure_queue first).
+    """
+    conn.executemany(
+        """
+            INSERT INTO enrichment_queue (word_id, looked_up_at)
+            SELECT id, ? FROM words WHERE word_stem = ? AND status = 'New'
+            ON CONFLICT(word_id) DO UPDATE
+            SET looked_up_at = MAX(COALESCE(looked_up_at, 0), excluded.looked_up_at)
+        """,
+        [(looked_up_at, word_stem) for word_stem, looked_up_at in lookups],
+    )
+
+
+def sync_queue(conn, status_filter):
+    """
+    Queues every word in `status_filter` that is not queued yet and drops rows
+    of deleted words. Returns the number of words a run could still take.
+    """
+    ensure_queue(conn)
+    with conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO enrichment_queue (word_id) SELECT id FROM words WHERE status = ?",
+            (status_filter,),
+        )
+        conn.execute("DELETE FROM enrichment_queue WHERE word_id NOT IN (SELECT id FROM words)")
+    return pending_count(conn, status_filter)
+
+
+def pending_count(conn, status_filter):
+    return conn.execute(
+        """
+            SELECT count(*) FROM enrichment_queue q JOIN words w ON w.id = q.word_id
+            WHERE w.status = ? AND q.attempts < ?
+        """,
+        (status_filter, MAX_ATTEMPTS),
+    ).fetchone()[0]
+
+
+def next_words(conn, status_filter, count, run_id):
+    """
+    The `count` most valuable queued words in `status_filter` not yet tried by
+    run `run_id`, as [(word_id, word_stem)].
+    """
+    return conn.execute(
+        f"""
+            SELECT w.id, w.word_stem
+            FROM enrichment_queue q JOIN words w ON w.id = q.word_id
+            WHERE w.status = ? AND q.attempts < ? AND COALESCE(q.last_run_id, 0) != ?
+            ORDER BY {QUEUE_ORDER}
+            LIMIT ?
+        """,
+        (status_filter, MAX_ATTEMPTS, run_id, count),
+    ).fetchall()
+
+
+def mark_done(conn, word_ids):
+    conn.executemany("DELETE FROM enrichment_queue WHERE word_id = ?", [(word_id,) for word_id in word_ids])
+
+
+def mark_failed(conn, word_ids, run_id):
+    conn.executemany(
+        "UPDATE enrichment_queue SET attempts = attempts + 1, last_run_id = ? WHERE word_id = ?",
+        [(run_id, word_id) for word_id in word_ids],
+    )
+
+
+def tokens_per_word(conn):
+    """
+    Average tokens per word over past runs (ESTIMATED_TOKENS_PER_WORD without history).
+    """
+    ensure_queue(conn)
+    words, tokens = conn.execute("SELECT SUM(words), SUM(tokens) FROM enrichment_runs WHERE tokens > 0").fetchone()
+    if not words or not tokens:
+        return ESTIMATED_TOKENS_PER_WORD
+    return max(tokens / words, 1.0)
+
+
+def start_run(conn, status_filter, max_tokens=None, max_usd=None):
+    ensure_queue(conn)
+    cursor = conn.execute(
+        "INSERT INTO enrichment_runs (status_filter, max_tokens, max_usd) VALUES (?, ?, ?)",
+        (status_filter, max_tokens, max_usd),
+    )
+    conn.commit()
+    return cursor.lastrowid
+
+
+def finish_run(conn, run_id, words, enriched, budget):
+    conn.execute(
+        """
+            UPDATE enrichment_runs
+            SET words = ?, enriched = ?, tokens = ?, cost_usd = ?, stopped_by_budget = ?
+            WHERE id = ?
+        """,
+        (words, enriched, budget.tokens, round(budget.cost_usd, 6), int(budget.stopped), run_id),
+    )
+    conn.commit()
+
+
+class Budget:
+    """
+    Token and/or USD cap for one enrichment run (None = no cap).
+    """
+    def __init__(self, max_tokens=None, max_usd=None, usd_per_million_tokens=USD_PER_MILLION_TOKENS):
+        self.max_tokens = max_tokens
+        self.max_usd = max_usd
+        self.usd_per_million_tokens = usd_per_million_tokens
+        self.tokens = 0
+        self.cost_usd = 0.0
+        self.stopped = False
+
+    @property
+    def limited(self):
+        return self.max_tokens is not None or self.max_usd is not None
+
+    def spend(self, tokens, cost_usd=None):
+        self.tokens += tokens
+        self.cost_usd += cost_usd if cost_usd is not None else tokens * self.usd_per_million_tokens / 1_000_000
+
+    def affordable_words(self, tokens_per_word):
+        """
+        How many more words fit in the budget at `tokens_per_word`.
+        """
+        limits = []
+        if self.max_tokens is not None:
+            limits.append((self.max_tokens - self.tokens) / tokens_per_word)
+        if self.max_usd is not None:
+            usd_per_word = tokens_per_word * self.usd_per_million_tokens / 1_000_000
+            limits.append((self.max_usd - self.cost_usd) / usd_per_word)
+        if not limits:
+            return None
+        return max(int(min(limits)), 0)
@@ -0,0 +1,265 @@
+import pandas as pd
+
+import db_init
+
+DATE_COLUMNS = {"bucket_date", "next_review_date"}
+# refresh_data reloads the whole table once more than this share of rows changed.
+REFRESH_FULL_RELOAD_SHARE = 0.2
+
+# The grid frame lives in session state and is hashed and Arrow-encoded for
+# AgGrid on every rerun, so it is kept compact: Arrow-backed strings, the
+# smallest integer dtype each column's range allows, categoricals for the
+# low-cardinality columns, and only a preview of the Kindle context.
+STATUSES = ['New', 'On Deck', 'Learning', 'Proficient', 'Adept', 'Mastered', 'Ignored', 'Pau(S)ed']
+STRING_DTYPE = pd.StringDtype("pyarrow")
+INTEGER_DTYPES = {
+    "id": "int32",
+    "difficulty_score": "Int8",
+    "priority_tier": "Int8",
+    "status_correct_streak": "Int16",
+    "manual_flag": "Int8",
+}
+# Fixed categories so the dropdown's values (and "" for NULL) never fall outside them.
+CATEGORY_DTYPES = {"status": pd.CategoricalDtype(STATUSES + [""])}
+# Categories taken from the data. AgGrid casts edited values back to the
+# column's dtype, which would turn a new category into NaN, so grid_frame hands
+# these to the grid as strings; saved edits come back as categories on refresh.
+OBSERVED_CATEGORY_COLUMNS = ("book_title",)
+# Long text columns loaded as a preview of this many characters; load_full_text
+# fetches the whole value for display.
+PREVIEW_COLUMNS = {"original_context": 60}
+PREVIEW_SUFFIX = "..."
+
+
+def _grid_select(conn, where=""):
+    columns = []
+    for _, name, _, _, _, _ in conn.execute("PRAGMA table_info(words)"):
+        limit = PREVIEW_COLUMNS.get(name)
+        if limit is None:
+            columns.append(name)
+        else:
+            columns.append(
+                f"CASE WHEN length({name}) > {limit} THEN substr({name}, 1, {limit}) || '{PREVIEW_SUFFIX}' "
+                f"ELSE {name} END AS {name}"
+            )
+    return f"SELECT {', '.join(columns)} FROM words {where}"
+
+def _compact_integers(series, dtype):
+    values = pd.to_numeric(series, errors='coerce')
+    try:
+        return values.astype(dtype)
+    except (TypeError, ValueError):
+        # Out of range for the compact dtype (or a NULL in a non-nullable one).
+        return values.astype('Int64')
+
+def _normalize_frame(df):
+    # NORMALIZE IMMEDIATELY
+    # 1. Integers (priority_tier, scores, flags) as compact nullable ints
+    for col, dtype in INTEGER_DTYPES.items():
+        if col in df.columns:
+            df[col] = _compact_integers(df[col], dtype)
+
+    # 2. Normalize text columns: DB NULL -> "" (Empty String)
+    # This matches what AgGrid returns for empty cells
+    for col in df.columns:
+        if col in INTEGER_DTYPES or pd.api.types.is_numeric_dtype(df[col]):
+            continue
+        df[col] = df[col].fillna("").astype(STRING_DTYPE)
+
+    # 3. Low-cardinality text as categoricals
+    for col, dtype in CATEGORY_DTYPES.items():
+        if col in df.columns:
+            df[col] = df[col].astype(dtype)
+    for col in OBSERVED_CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+
+    return df
+
+def load_data(conn):
+    return _normalize_frame(pd.read_sql_query(_grid_select(conn), conn))
+
+def grid_frame(df):
+    """
+    The frame to hand to AgGrid: `df` with OBSERVED_CATEGORY_COLUMNS as
+    strings, so editing them can introduce new values.
+    """
+    columns = {col: STRING_DTYPE for col in OBSERVED_CATEGORY_COLUMNS if col in df.columns}
+    return df.astype(columns) if columns else df
+
+def load_full_text(conn, column, word_ids):
+    """
+    Full values of a PREVIEW_COLUMNS column for `word_ids`, as {word_id: text}.
+    """
+    if column not in PREVIEW_COLUMNS or not word_ids:
+        return {}
+    word_ids = [int(word_id) for word_id in word_ids]
+    placeholders = ", ".join("?" for _ in word_ids)
+    rows = conn.execute(f"SELECT id, {column} FROM words WHERE id IN ({placeholders})", word_ids)
+    return {word_id: text or "" for word_id, text in rows}
+
+def refresh_data(conn, df, since):
+    """
+    Brings a frame from load_data up to date using the change feed.
+    Returns (df, seq): the same frame when no word changed after seq `since`,
+    a patched copy when a few did, and a full reload when many did (or the
+    feed no longer reaches back to `since`).
+    """
+    seq = db_init.change_feed_seq(conn)
+    changes = None if df is None else db_init.read_changes(conn, since, tables=("words",))
+    if changes is None or len(changes) > max(len(df) * REFRESH_FULL_RELOAD_SHARE, 1):
+        return load_data(conn), seq
+    if not changes:
+        return df, seq
+
+    word_ids = list({row_id for _, _, row_id, _, _ in changes})
+    fresh = []
+    for start in range(0, len(word_ids), 500):
+        chunk = word_ids[start:start + 500]
+        placeholders = ", ".join("?" for _ in chunk)
+        fresh.append(pd.read_sql_query(_grid_select(conn, f"WHERE id IN ({placeholders})"), conn, params=chunk))
+    fresh = _normalize_frame(pd.concat(fresh, ignore_index=True))
+
+    patched = pd.concat([df[~df['id'].isin(word_ids)], fresh], ignore_index=True)
+    # Concatenating categoricals with different categories falls back to plain strings.
+    for col in OBSERVED_CATEGORY_COLUMNS:
+        if col in patched.columns and not isinstance(patched[col].dtype, pd.CategoricalDtype):
+            patched[col] = patched[col].astype(STRING_DTYPE).astype('category')
+    return patched.sort_values('id', ignore_index=True), seq
+
+def _normalize_date(value):
+    if value is None or pd.isna(value):
+        return None
+
+    if isinstance(value, str):
+        stripped = value.strip()
+        if stripped == "":
+            return None
+        parsed = pd.to_datetime(stripped, errors="coerce")
+        if pd.isna(parsed):
+            return stripped
+        return parsed.date().isoformat()
+
+    parsed = pd.to_datetime(value, errors="coerce")
+    if pd.isna(parsed):
+        return str(value)
+    return parsed.date().isoformat()
+
+def _normalize_for_compare(value, is_numeric, is_date):
+    if is_date:
+        return _normalize_date(value)
+
+    if value is None or pd.isna(value):
+        return None if is_numeric else ""
+
+    if isinstance(value, str):
+        stripped = value.strip()
+        if stripped == "":
+            return None if is_numeric else ""
+        if is_numeric:
+            parsed = pd.to_numeric(stripped, errors="coerce")
+            return None if pd.isna(parsed) else parsed
+        return value
+
+    if is_numeric:
+        return value
+
+    return str(value)
+
+def _normalize_for_db(value, is_numeric, is_date):
+    if is_date:
+        return _normalize_date(value)
+
+    if value is None or pd.isna(value):
+        return None
+
+    if isinstance(value, str):
+        stripped = value.strip()
+        if stripped == "":
+            return None
+        if is_numeric:
+            parsed = pd.to_numeric(stripped, errors="coerce")
+            if pd.isna(parsed):
+                return None
+            if float(parsed).is_integer():
+                return int(parsed)
+            return float(parsed)
+        return value
+
+    if is_numeric and isinstance(value, float) and value.is_integer():
+        return int(value)
+
+    return value
+
+def find_changes(original_df, grid_data):
+    if grid_data is None:
+        return []
+
+    original_rows = original_df.to_dict(orient="records")
+    original_by_id = {row["id"]: row for row in original_rows if row.get("id") is not None} if "id" in original_df.columns else {}
+    original_by_stem = {row["word_stem"]: row for row in original_rows if row.get("word_stem")} if "word_stem" in original_df.columns else {}
+    numeric_cols = {
+        col for col in original_df.columns if pd.api.types.is_numeric_dtype(original_df[col])
+    }
+    # Previews are truncated, so never write them back.
+    read_only_cols = {"id", "word_stem", *PREVIEW_COLUMNS}
+
+    changed_records = []
+    for row in grid_data:
+        row_keys = set(row.keys())
+        key_field = "id"
+        key_value = row.get("id")
+        original_row = original_by_id.get(key_value) if key_value is not None else None
+        if original_row is None and "word_stem" in row:
+            key_field = "word_stem"
+            key_value = row.get("word_stem")
+            original_row = original_by_stem.get(key_value)
+
+        if original_row is None:
+            continue
+
+        updates = {}
+        for col in original_df.columns:
+            if col in read_only_cols or col not in row_keys:
+                continue
+            old_val = original_row.get(col)
+            new_val = row.get(col)
+            # Untouched cells come back identical; skip the (slow) normalization for them.
+            if type(old_val) is type(new_val) and isinstance(old_val, (str, int, float)) and old_val == new_val:
+                continue
+            is_numeric = col in numeric_cols
+            is_date = col in DATE_COLUMNS
+            if _normalize_for_compare(old_val, is_numeric, is_date) != _normalize_for_compare(new_val, is_numeric, is_date):
+                updates[col] = _normalize_for_db(new_val, is_numeric, is_date)
+
+        if updates:
+            updates[key_field] = key_value
+            changed_records.append(updates)
+
+    return changed_records
+
+def save_changes_from_records(conn, changed_records):
+    if not changed_records:
+        return 0
+
+    cursor = conn.cursor()
+    updated_rows = 0
+
+    for record in changed_records:
+        record_id = record.get("id")
+        key_field = "id" if record_id is not None else "word_stem"
+        key_value = record_id if record_id is not None else record.get("word_stem")
+        if key_value is None:
+            continue
+
+        updates = {k: v for k, v in record.items() if k not in ("id", "word_stem")}
+        if not updates:
+            continue
+
+        set_clause = ", ".join(f"{col} = ?" for col in updates)
+        values = list(updates.values()) + [key_value]
+        cursor.execute(f"UPDATE words SET {set_clause} WHERE {key_field} = ?", values)
+        updated_rows += cursor.rowcount
+
+    conn.commit()
+    return updated_rows
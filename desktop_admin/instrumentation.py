@@ -0,0 +1,379 @@
+"""
+Lightweight hot-path instrumentation for the admin console.
+
+- SQL: connections from connect() time every execute/executemany and every
+  fetch path (fetchone, fetchmany, fetchall and iteration; one record per
+  result set), count the statements SQLite actually ran (set_trace_callback)
+  and approximate the VM work done (set_progress_handler).
+- LLM: llm_helper records latency, tokens and payload sizes per OpenRouter call.
+- Streamlit: lap()/phase() time named sections of each script rerun.
+
+Collection is off by default: the trace callback and progress handler cost
+something on every statement. Set ADMIN_METRICS=1, or tick "Record metrics"
+in the console sidebar, which enables it for that browser session only.
+
+Run state lives in a Session (one per console session, one per CLI process):
+start_run() makes it current for the calling context, and connections keep
+the session they were opened in. Records are kept in the session's ring
+buffer for the debug panel and appended as JSON lines to a size-rotated file
+next to this module.
+"""
+import collections
+import contextlib
+import contextvars
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import re
+import sqlite3
+import time
+
+ENABLED = os.getenv("ADMIN_METRICS", "0") == "1"
+METRICS_PATH = os.getenv(
+    "ADMIN_METRICS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "metrics", "admin_metrics.jsonl"),
+)
+MAX_BYTES = 5 * 1024 * 1024
+BACKUP_COUNT = 3
+RECENT_LIMIT = 5000
+# Records are written to disk in batches of FLUSH_BATCH (and at the end of each rerun).
+FLUSH_BATCH = 500
+# The progress handler fires every PROGRESS_INTERVAL SQLite VM instructions.
+PROGRESS_INTERVAL = 1000
+SQL_TEXT_LIMIT = 200
+
+_logger = None
+_session_ids = itertools.count(1)
+
+
+def _get_logger():
+    global _logger
+    if _logger is None:
+        logger = logging.getLogger("word_quizzer.metrics")
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        directory = os.path.dirname(METRICS_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(METRICS_PATH, maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(logging.handlers.MemoryHandler(FLUSH_BATCH, flushLevel=logging.CRITICAL, target=handler))
+        _logger = logger
+    return _logger
+
+
+class Session:
+    """
+    Metrics state of one console session or CLI run: whether collection is
+    on, the rerun counter and lap clock, and the recent records.
+    """
+    def __init__(self, enabled=None):
+        self.id = next(_session_ids)
+        self.enabled = ENABLED if enabled is None else enabled
+        self.run_id = 0
+        self.lap = None
+        self.recent = collections.deque(maxlen=RECENT_LIMIT)
+
+    def record(self, kind, **fields):
+        if not self.enabled:
+            return
+        entry = {"ts": round(time.time(), 3), "session": self.id, "run": self.run_id, "kind": kind, **fields}
+        self.recent.append(entry)
+        try:
+            _get_logger().info(json.dumps(entry, default=str))
+        except OSError:
+            # Metrics must never break the app (e.g. read-only install directory).
+            pass
+
+
+# Used by scripts and benchmarks that never call start_run.
+_default_session = Session()
+_current = contextvars.ContextVar("admin_metrics_session", default=None)
+
+
+def current_session():
+    return _current.get() or _default_session
+
+
+def record(kind, **fields):
+    """
+    Stores one metric record in the current session (and the rotating metrics file).
+    """
+    current_session().record(kind, **fields)
+
+
+def start_run(session=None):
+    """
+    Marks the start of a Streamlit script rerun (or CLI command) and makes
+    `session` the current one for this context. Returns the new run id.
+    """
+    session = session or current_session()
+    _current.set(session)
+    session.run_id += 1
+    session.lap = time.perf_counter()
+    return session.run_id
+
+
+def flush():
+    """
+    Writes buffered records to the metrics file.
+    """
+    if _logger is None:
+        return
+    for handler in _logger.handlers:
+        try:
+            handler.flush()
+        except OSError:
+            pass
+
+
+def current_run():
+    return current_session().run_id
+
+
+@contextlib.contextmanager
+def phase(name):
+    """
+    Times a named section of the current rerun.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record("phase", name=name, ms=round((time.perf_counter() - started) * 1000, 3))
+
+
+def lap(name):
+    """
+    Records the time since the previous lap (or start_run) as phase `name`.
+    Suits the top-to-bottom Streamlit script, where phases run back to back.
+    """
+    session = current_session()
+    now = time.perf_counter()
+    if session.lap is not None:
+        session.record("phase", name=name, ms=round((now - session.lap) * 1000, 3))
+    session.lap = now
+
+
+def normalize_sql(sql):
+    return re.sub(r"\s+", " ", str(sql)).strip()[:SQL_TEXT_LIMIT]
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    Times statements and fetches: one "sql_fetch" record per fetchone/
+    fetchmany/fetchall call, and one per iteration over a result set (when
+    it is exhausted, re-executed, closed or collected).
+    """
+    _last_sql = ""
+    _fetch = None
+
+    def _timed(self, method, sql, *args):
+        self._end_fetch()
+        conn = self.connection
+        ticks, statements = conn._vm_ticks, conn._statements
+        started = time.perf_counter()
+        try:
+            return method(self, sql, *args)
+        finally:
+            self._last_sql = normalize_sql(sql)
+            self._fetch = [0.0, 0, 0]
+            conn._session.record(
+                "sql",
+                sql=self._last_sql,
+                ms=round((time.perf_counter() - started) * 1000, 3),
+                statements=conn._statements - statements,
+                vm_steps=(conn._vm_ticks - ticks) * PROGRESS_INTERVAL,
+            )
+
+    def _fetched(self, method, *args):
+        conn = self.connection
+        ticks = conn._vm_ticks
+        started = time.perf_counter()
+        try:
+            return method(self, *args)
+        finally:
+            if self._fetch is not None:
+                self._fetch[0] += time.perf_counter() - started
+                self._fetch[2] += conn._vm_ticks - ticks
+
+    def _end_fetch(self):
+        if not self._fetch:
+            return
+        seconds, rows, ticks = self._fetch
+        # Later fetches from the same result set start a new tally.
+        self._fetch = [0.0, 0, 0]
+        if rows or seconds:
+            self.connection._session.record(
+                "sql_fetch",
+                sql=self._last_sql,
+                ms=round(seconds * 1000, 3),
+                rows=rows,
+                vm_steps=ticks * PROGRESS_INTERVAL,
+            )
+
+    def _tally(self, rows):
+        if self._fetch is not None:
+            self._fetch[1] += rows
+
+    def execute(self, sql, parameters=()):
+        return self._timed(sqlite3.Cursor.execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._timed(sqlite3.Cursor.executemany, sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self._timed(sqlite3.Cursor.executescript, sql_script)
+
+    def fetchone(self):
+        row = self._fetched(sqlite3.Cursor.fetchone)
+        self._tally(row is not None)
+        self._end_fetch()
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        rows = self._fetched(sqlite3.Cursor.fetchmany, size)
+        self._tally(len(rows))
+        self._end_fetch()
+        return rows
+
+    def fetchall(self):
+        rows = self._fetched(sqlite3.Cursor.fetchall)
+        self._tally(len(rows))
+        self._end_fetch()
+        return rows
+
+    def __next__(self):
+        try:
+            row = self._fetched(sqlite3.Cursor.__next__)
+        except StopIteration:
+            self._end_fetch()
+            raise
+        self._tally(1)
+        return row
+
+    def close(self):
+        self._end_fetch()
+        self._fetch = None
+        super().close()
+
+    def __del__(self):
+        self._end_fetch()
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._session = current_session()
+        self._vm_ticks = 0
+        self._statements = 0
+        self.set_trace_callback(self._on_statement)
+        self.set_progress_handler(self._on_progress, PROGRESS_INTERVAL)
+
+    def _on_statement(self, _):
+        self._statements += 1
+
+    def _on_progress(self):
+        self._vm_ticks += 1
+        return 0
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    # The Connection shortcuts bypass cursor(), so route them through it.
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+def connect(path, **kwargs):
+    """
+    sqlite3.connect that returns an instrumented connection, recording into
+    the current session, when that session has metrics enabled.
+    """
+    if current_session().enabled:
+        kwargs.setdefault("factory", InstrumentedConnection)
+    return sqlite3.connect(path, **kwargs)
+
+
+def recent(kind=None, run_id=None):
+    return [
+        entry for entry in list(current_session().recent)
+        if (kind is None or entry["kind"] == kind) and (run_id is None or entry["run"] == run_id)
+    ]
+
+
+def load_history(path=None):
+    """
+    Reads persisted records from the metrics file and its rotated backups (oldest first).
+    """
+    path = path or METRICS_PATH
+    paths = [f"{path}.{index}" for index in range(BACKUP_COUNT, 0, -1)] + [path]
+    entries = []
+    for candidate in paths:
+        if not os.path.exists(candidate):
+            continue
+        with open(candidate) as handle:
+            for line in handle:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return entries
+
+
+def slow_queries(entries=None, limit=10):
+    """
+    Aggregates SQL records by statement text, slowest total time first.
+    """
+    totals = {}
+    for entry in (recent() if entries is None else entries):
+        if entry["kind"] not in ("sql", "sql_fetch"):
+            continue
+        row = totals.setdefault(entry["sql"], {"sql": entry["sql"], "calls": 0, "total_ms": 0.0, "max_ms": 0.0, "fetch_ms": 0.0, "statements": 0, "vm_steps": 0})
+        if entry["kind"] == "sql":
+            row["calls"] += 1
+            row["total_ms"] += entry["ms"]
+            row["max_ms"] = max(row["max_ms"], entry["ms"])
+            row["statements"] += entry.get("statements", 0)
+            row["vm_steps"] += entry.get("vm_steps", 0)
+        else:
+            row["fetch_ms"] += entry["ms"]
+            row["total_ms"] += entry["ms"]
+            row["vm_steps"] += entry.get("vm_steps", 0)
+    ranked = sorted(totals.values(), key=lambda row: row["total_ms"], reverse=True)
+    for row in ranked:
+        row["total_ms"] = round(row["total_ms"], 3)
+        row["fetch_ms"] = round(row["fetch_ms"], 3)
+    return ranked[:limit]
+
+
+def run_breakdown(run_id=None, entries=None):
+    """
+    Returns {section: ms} for one rerun: each timed phase plus SQL and LLM totals.
+    """
+    run_id = current_run() if run_id is None else run_id
+    entries = recent() if entries is None else entries
+    breakdown = {}
+    for entry in entries:
+        if entry["run"] != run_id:
+            continue
+        if entry["kind"] == "phase":
+            breakdown[entry["name"]] = breakdown.get(entry["name"], 0.0) + entry["ms"]
+        elif entry["kind"] in ("sql", "sql_fetch"):
+            breakdown["(sql total)"] = breakdown.get("(sql total)", 0.0) + entry["ms"]
+        elif entry["kind"] == "llm":
+            breakdown["(llm total)"] = breakdown.get("(llm total)", 0.0) + entry["ms"]
+    return {name: round(ms, 3) for name, ms in breakdown.items()}
+
+
+def llm_calls(entries=None, limit=20):
+    calls = [entry for entry in (recent() if entries is None else entries) if entry["kind"] == "llm"]
+    return calls[-limit:]
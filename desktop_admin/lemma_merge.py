@@ -0,0 +1,355 @@
+"""
+Finds words rows that are variants of one lemma and merges them.
+
+Kindle stores inflected forms (`studies`, `studied`, `studying`) as separate
+stems, and each would otherwise be checked, ranked and enriched on its own.
+Two passes cluster the stems:
+- a rule-based lemmatizer strips English inflections (plural, past, -ing,
+  comparative) and derivational -ly/-ness, keeping a candidate only when that
+  base is itself a stem in the table;
+- an edit-distance index (one insertion/deletion/substitution, words of
+  MIN_SIMILAR_LENGTH+ letters sharing their first letters) catches spelling
+  variants such as colour/color and judgement/judgment.
+Only unambiguous inflections (-ies/-ied/-ier/-iest, -es/-ed onto a base
+ending in e, doubled consonants) are merged automatically, and on import only for new words whose other form the same
+Kindle files also looked up. Everything else is a proposal for review (the
+console's merge review, or `dedupe --dry-run`):
+- -er, -ing, -est and -s forms, which are often words of their own
+  (flower/flow, ruler/rule, meeting/meet, forest/for, goods/good),
+- -es/-ed forms whose base is the bare stem (scared/scar, planes/plan) or
+  that fit two stems at once (hoped: hope and hop),
+- case variants, which may be proper nouns (Polish/polish),
+- -ly/-ness and edit-distance matches (early/ear, angel/angle).
+
+Merging moves examples, distractors, every log row and the latest lookup time
+onto the surviving row, keeps the variants' Kindle contexts as examples,
+carries over the most advanced study status, and deletes the variants, all in
+one transaction.
+"""
+import db_init
+
+CASE = "case"
+INFLECTION = "inflection"
+# Inflection-shaped endings that also form unrelated words (sober/sob, building/build).
+AMBIGUOUS = "ambiguous"
+DERIVATION = "derivation"
+SIMILAR = "similar"
+AUTO_KINDS = (INFLECTION,)
+PROPOSAL_KINDS = (CASE, AMBIGUOUS, DERIVATION, SIMILAR)
+ALL_KINDS = (CASE, INFLECTION, AMBIGUOUS, DERIVATION, SIMILAR)
+
+# (suffix, replacements, kind); longest suffixes first so "studies" is tried as "ies" before "s".
+SUFFIX_RULES = [
+    ("iness", ("y",), DERIVATION),
+    ("ness", ("",), DERIVATION),
+    ("iest", ("y",), INFLECTION),
+    ("ies", ("y",), INFLECTION),
+    ("ied", ("y",), INFLECTION),
+    ("ier", ("y",), INFLECTION),
+    ("ily", ("y",), DERIVATION),
+    ("ing", ("", "e"), AMBIGUOUS),
+    ("est", ("", "e"), AMBIGUOUS),
+    ("es", ("e", ""), INFLECTION),
+    ("ed", ("e", ""), INFLECTION),
+    ("er", ("", "e"), AMBIGUOUS),
+    ("ly", ("", "le"), DERIVATION),
+    ("s", ("",), AMBIGUOUS),
+]
+DOUBLED_SUFFIXES = ("ing", "ed", "er", "est")
+# Suffixes whose bare-stem reading often names another word (hated/hat, cares/car):
+# that base is only ever proposed.
+BARE_STEM_AMBIGUOUS = ("es", "ed")
+MIN_BASE_LENGTH = 3
+# Words ending in -s that are not plurals.
+NOT_PLURAL_ENDINGS = ("ss", "us", "is", "ous")
+# Common words whose "inflection" is a different word.
+NOT_INFLECTED = frozenset({
+    "during", "evening", "morning", "ceiling", "nothing", "something", "anything", "everything",
+    "wedding", "pudding", "herring", "sterling", "news", "lens", "series", "species", "corner",
+    "number", "hammer", "never", "under", "order", "butter", "letter", "matter", "bitter", "tender",
+    "proper", "silver", "weather", "whether", "feather", "ledger", "finger", "hunger", "ginger",
+    "summer", "winter", "ever", "bed", "red", "need", "seed", "feed", "speed", "breed", "greed",
+    "hundred", "sacred", "naked", "wicked", "kindred", "rugged", "jagged", "ragged", "crooked",
+})
+MIN_SIMILAR_LENGTH = 5
+SIMILAR_PREFIX = 3
+
+STATUS_RANK = {
+    "Ignored": 0, "New": 1, "On Deck": 2, "Pau(S)ed": 3,
+    "Learning": 4, "Proficient": 5, "Adept": 6, "Mastered": 7,
+}
+# Child tables re-pointed at the surviving word (those missing from the DB are skipped).
+LOG_TABLES = ("study_log", "status_log", "score_log", "study_log_daily", "status_log_daily", "score_log_daily")
+WORD_COLUMNS = (
+    "id", "word_stem", "original_context", "book_title", "definition", "phonetic", "status",
+    "bucket_date", "next_review_date", "difficulty_score", "priority_tier", "status_correct_streak",
+    "manual_flag",
+)
+# Moved together with the status they schedule.
+PROGRESS_COLUMNS = ("status", "bucket_date", "next_review_date", "status_correct_streak")
+FILL_COLUMNS = ("original_context", "book_title", "definition", "phonetic", "difficulty_score", "priority_tier")
+
+
+def _rule_candidates(word):
+    """
+    Yields, per matching suffix rule (most specific first), the [(base, kind)]
+    readings of `word` in order of preference.
+    """
+    word = word.lower()
+    if word in NOT_INFLECTED:
+        return
+    for suffix, replacements, kind in SUFFIX_RULES:
+        if not word.endswith(suffix):
+            continue
+        base = word[:-len(suffix)]
+        if len(base) < MIN_BASE_LENGTH:
+            continue
+        if suffix == "s" and word.endswith(NOT_PLURAL_ENDINGS):
+            continue
+        readings = [
+            (base + replacement, AMBIGUOUS if replacement == "" and suffix in BARE_STEM_AMBIGUOUS else kind)
+            for replacement in replacements
+        ]
+        # stopped -> stop, bigger -> big
+        if suffix in DOUBLED_SUFFIXES and len(base) > MIN_BASE_LENGTH and base[-1] == base[-2] and base[-1] not in "aeiouls":
+            readings.append((base[:-1], kind))
+        yield readings
+
+
+def lemma_candidates(word):
+    """
+    Yields (base, kind) guesses for an inflected or derived `word`, most specific first.
+    """
+    for readings in _rule_candidates(word):
+        yield from readings
+
+
+def _deletions(word):
+    return {word[:index] + word[index + 1:] for index in range(SIMILAR_PREFIX, len(word))}
+
+
+def _similar_pairs(stems):
+    """
+    Pairs of stems within one edit of each other (same first SIMILAR_PREFIX letters),
+    found with a deletion index built one prefix group at a time to bound memory.
+    """
+    groups = {}
+    for stem in stems:
+        if len(stem) >= MIN_SIMILAR_LENGTH:
+            groups.setdefault(stem[:SIMILAR_PREFIX], []).append(stem)
+    for group in groups.values():
+        if len(group) < 2:
+            continue
+        by_key = {}
+        for stem in group:
+            by_key.setdefault(stem, set()).add(stem)
+            for key in _deletions(stem):
+                by_key.setdefault(key, set()).add(stem)
+        seen = set()
+        for members in by_key.values():
+            if len(members) < 2:
+                continue
+            ordered = sorted(members)
+            for index, first in enumerate(ordered):
+                for second in ordered[index + 1:]:
+                    if (first, second) not in seen:
+                        seen.add((first, second))
+                        yield first, second
+
+
+def _survivor_key(row):
+    # Most study progress first, then enriched rows, then the shorter (base) form.
+    return (-STATUS_RANK.get(row["status"], 1), not row["definition"], len(row["word_stem"]), row["id"])
+
+
+def _load_words(conn, stems=None):
+    """
+    {word_stem: row} for every word, or only for the given stems.
+    """
+    query = f"SELECT {', '.join(WORD_COLUMNS)} FROM words"
+    if stems is None:
+        return {row[1]: dict(zip(WORD_COLUMNS, row)) for row in conn.execute(f"{query} ORDER BY id")}
+    stems = list(stems)
+    words = {}
+    for start in range(0, len(stems), 500):
+        chunk = stems[start:start + 500]
+        for row in conn.execute(f"{query} WHERE word_stem IN ({', '.join('?' for _ in chunk)})", chunk):
+            words[row[1]] = dict(zip(WORD_COLUMNS, row))
+    return dict(sorted(words.items(), key=lambda item: item[1]["id"]))
+
+
+def find_duplicates(conn, kinds=ALL_KINDS, stems=None, word_ids=None):
+    """
+    Returns merge clusters of the given match kinds, one per surviving word:
+    [{"survivor": row, "variants": [row, ...], "reasons": {variant stem: kind}}]
+    Case and rule clusters keep the base form; edit-distance clusters keep the
+    row furthest along in study.
+    `stems` limits both forms of a match to those stems (e.g. the ones an
+    import looked up); `word_ids` keeps only matches with a side in those ids.
+    """
+    words = _load_words(conn, stems)
+    word_ids = None if word_ids is None else set(word_ids)
+    by_lower = {}
+    for stem in words:
+        by_lower.setdefault(stem.lower(), stem)
+    parent = {}
+    reasons = {}
+
+    def root(stem):
+        while stem in parent:
+            stem = parent[stem]
+        return stem
+
+    def link(stem, base, kind):
+        parent[stem] = base
+        reasons[stem] = kind
+
+    def in_scope(stem, base):
+        return word_ids is None or words[stem]["id"] in word_ids or words[base]["id"] in word_ids
+
+    for stem in words:
+        lower = stem.lower()
+        if by_lower[lower] != stem:
+            if CASE in kinds and in_scope(stem, by_lower[lower]):
+                link(stem, by_lower[lower], CASE)
+            continue
+        # The most specific rule with a base in the table decides; later rules are not tried.
+        for readings in _rule_candidates(lower):
+            found = [(by_lower[candidate], kind) for candidate, kind in readings if by_lower.get(candidate) not in (None, stem)]
+            if not found:
+                continue
+            base, kind = found[0]
+            if len({candidate for candidate, _ in found}) > 1:
+                # Two stems fit (hoped: hope, hop); propose the preferred one.
+                kind = AMBIGUOUS
+            if kind in kinds and root(base) != stem and in_scope(stem, base):
+                link(stem, base, kind)
+            break
+
+    if SIMILAR in kinds:
+        # Pairs only: chaining one-edit links would join whole families of short words.
+        paired = set()
+        for first, second in _similar_pairs(list(by_lower)):
+            first_root, second_root = root(by_lower[first]), root(by_lower[second])
+            if first_root == second_root or first_root in paired or second_root in paired:
+                continue
+            if not in_scope(first_root, second_root):
+                continue
+            keep, drop = sorted((first_root, second_root), key=lambda stem: _survivor_key(words[stem]))
+            link(drop, keep, SIMILAR)
+            paired.update((keep, drop))
+
+    clusters = {}
+    for stem in parent:
+        clusters.setdefault(root(stem), []).append(stem)
+    return [
+        {
+            "survivor": words[survivor],
+            "variants": [words[stem] for stem in sorted(variants)],
+            "reasons": {stem: reasons[stem] for stem in sorted(variants)},
+        }
+        for survivor, variants in sorted(clusters.items())
+    ]
+
+
+def _existing_tables(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+
+
+def _merged_fields(survivor, variants):
+    """
+    Survivor's columns with gaps filled from the variants and the study
+    progress of the most advanced row.
+    """
+    fields = {}
+    for column in FILL_COLUMNS:
+        if survivor[column] in (None, ""):
+            for variant in variants:
+                if variant[column] not in (None, ""):
+                    fields[column] = variant[column]
+                    break
+    leader = min([survivor] + variants, key=_survivor_key)
+    if leader is not survivor:
+        for column in PROGRESS_COLUMNS:
+            fields[column] = leader[column]
+    if any(variant["manual_flag"] for variant in variants):
+        fields["manual_flag"] = 1
+    return fields
+
+
+def merge_clusters(conn, clusters):
+    """
+    Merges each cluster's variants into its survivor in a single transaction.
+    Returns {"clusters", "merged"} (merged = variant rows removed).
+    """
+    db_init.ensure_child_indexes(conn)
+    tables = _existing_tables(conn)
+    log_tables = [table for table in LOG_TABLES if table in tables]
+    touched = [cluster["survivor"]["id"] for cluster in clusters]
+    touched += [variant["id"] for cluster in clusters for variant in cluster["variants"]]
+    merged = 0
+    with conn, db_init.deferred_search_sync(conn, touched):
+        cursor = conn.cursor()
+        for cluster in clusters:
+            survivor = cluster["survivor"]
+            variants = cluster["variants"]
+            survivor_id = survivor["id"]
+            variant_ids = [variant["id"] for variant in variants]
+            placeholders = ", ".join("?" for _ in variant_ids)
+
+            fields = _merged_fields(survivor, variants)
+            if fields:
+                assignments = ", ".join(f"{column} = ?" for column in fields)
+                cursor.execute(f"UPDATE words SET {assignments} WHERE id = ?", (*fields.values(), survivor_id))
+
+            for table in log_tables:
+                cursor.execute(f"UPDATE {table} SET word_id = ? WHERE word_id IN ({placeholders})", (survivor_id, *variant_ids))
+
+            # Distractors were written against one definition; keep the survivor's when it has any.
+            has_distractors = cursor.execute("SELECT 1 FROM distractors WHERE word_id = ? LIMIT 1", (survivor_id,)).fetchone()
+            if has_distractors:
+                cursor.execute(f"DELETE FROM distractors WHERE word_id IN ({placeholders})", variant_ids)
+            else:
+                cursor.execute(f"UPDATE distractors SET word_id = ? WHERE word_id IN ({placeholders})", (survivor_id, *variant_ids))
+
+            contexts = [
+                (survivor_id, variant["original_context"]) for variant in variants
+                if variant["original_context"] and variant["original_context"] != (fields.get("original_context") or survivor["original_context"])
+            ]
+            cursor.executemany("INSERT INTO examples (word_id, sentence) VALUES (?, ?)", contexts)
+            cursor.execute(f"UPDATE examples SET word_id = ? WHERE word_id IN ({placeholders})", (survivor_id, *variant_ids))
+            cursor.execute(
+                """
+                    DELETE FROM examples
+                    WHERE word_id = ? AND id NOT IN (SELECT MIN(id) FROM examples WHERE word_id = ? GROUP BY sentence)
+                """,
+                (survivor_id, survivor_id),
+            )
+
+            if "enrichment_queue" in tables:
+                # The lemma stays queued if it was; it inherits the latest lookup of its variants.
+                cursor.execute(
+                    f"""
+                        UPDATE enrichment_queue
+                        SET looked_up_at = (SELECT MAX(looked_up_at) FROM enrichment_queue WHERE word_id IN (?, {placeholders}))
+                        WHERE word_id = ?
+                    """,
+                    (survivor_id, *variant_ids, survivor_id),
+                )
+                cursor.execute(f"DELETE FROM enrichment_queue WHERE word_id IN ({placeholders})", variant_ids)
+            if "distractor_pool" in tables:
+                cursor.execute(
+                    f"UPDATE distractor_pool SET source_word_id = ? WHERE source_word_id IN ({placeholders})",
+                    (survivor_id, *variant_ids),
+                )
+            cursor.execute(f"DELETE FROM words WHERE id IN ({placeholders})", variant_ids)
+            merged += len(variant_ids)
+    return {"clusters": len(clusters), "merged": merged}
+
+
+def merge_duplicates(conn, kinds=AUTO_KINDS, stems=None, word_ids=None):
+    """
+    Finds and merges duplicates of the given kinds (by default the ones safe to
+    merge without review), scoped like find_duplicates. Returns {"clusters", "merged"}.
+    """
+    return merge_clusters(conn, find_duplicates(conn, kinds, stems=stems, word_ids=word_ids))
@@ -1,8 +1,14 @@
 import json
 import os
+import threading
+import time
 import requests
 from dotenv import load_dotenv
 
+import distractor_filter
+import instrumentation
+import prompt_templates
+
 load_dotenv()
 
 # Mock response mode for development
@@ -10,7 +16,31 @@ MOCK_MODE = False  # Changed to False to enable real calls if key is present
 
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 
-def _call_openrouter(messages, model="google/gemini-3-flash-preview", max_tokens=40000):
+# Running totals over every OpenRouter call in this process (read with usage_totals()).
+_usage = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0, "priced_calls": 0}
+_usage_lock = threading.Lock()
+
+# Extra distractors requested per short word, since some of the follow-up is filtered too.
+FOLLOW_UP_MARGIN = 3
+
+def _add_usage(stats):
+    with _usage_lock:
+        _usage["calls"] += 1
+        _usage["prompt_tokens"] += stats.get("prompt_tokens") or 0
+        _usage["completion_tokens"] += stats.get("completion_tokens") or 0
+        if stats.get("cost_usd") is not None:
+            _usage["cost_usd"] += stats["cost_usd"]
+            _usage["priced_calls"] += 1
+
+def usage_totals():
+    """
+    Tokens and USD (as reported by OpenRouter) used by this process so far;
+    pipelines diff two snapshots to charge a run's budget.
+    """
+    with _usage_lock:
+        return dict(_usage)
+
+def _call_openrouter(messages, model="google/gemini-3-flash-preview", max_tokens=40000, task=None):
     """
     Helper function to call OpenRouter API.
     """
@@ -18,6 +48,17 @@ def _call_openrouter(messages, model="google/gemini-3-flash-preview", max_tokens
         print("Error: OPENROUTER_API_KEY not found in environment variables.")
         return None
 
+    payload = json.dumps({
+        "model": model,
+        "messages": messages,
+        "max_tokens": max_tokens,
+        "reasoning": {"enabled": True},
+        "response_format": {"type": "json_object"},
+        "usage": {"include": True},
+    })
+    stats = {"model": model, "task": task, "prompt_version": prompt_templates.resolve_version(),
+             "request_bytes": len(payload), "ok": False}
+    started = time.perf_counter()
     try:
         response = requests.post(
             url="https://openrouter.ai/api/v1/chat/completions",
@@ -25,22 +66,25 @@ def _call_openrouter(messages, model="google/gemini-3-flash-preview", max_tokens
                 "Authorization": f"Bearer {OPENROUTER_API_KEY}",
                 "Content-Type": "application/json",
             },
-            data=json.dumps({
-                "model": model,
-                "messages": messages,
-                "max_tokens": max_tokens,
-                "reasoning": {"enabled": True},
-                "response_format": {"type": "json_object"} 
-            })
+            data=payload
         )
+        stats["response_bytes"] = len(response.content)
         
         response.raise_for_status()
         data = response.json()
+        usage = data.get("usage") or {}
+        stats["prompt_tokens"] = usage.get("prompt_tokens")
+        stats["completion_tokens"] = usage.get("completion_tokens")
+        stats["cached_tokens"] = (usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+        stats["cost_usd"] = usage.get("cost")
+        _add_usage(stats)
         
         if 'choices' in data and len(data['choices']) > 0:
             content = data['choices'][0]['message']['content']
             try:
-                return json.loads(content)
+                parsed = json.loads(content)
+                stats["ok"] = True
+                return parsed
             except json.JSONDecodeError:
                 print(f"Failed to parse JSON response: {content}")
                 return None
@@ -49,6 +93,9 @@ def _call_openrouter(messages, model="google/gemini-3-flash-preview", max_tokens
     except Exception as e:
         print(f"API Call Error: {e}")
         return None
+    finally:
+        stats["ms"] = round((time.perf_counter() - started) * 1000, 3)
+        instrumentation.record("llm", **stats)
 
 def assess_difficulty(words):
     """
@@ -66,23 +113,16 @@ def assess_difficulty(words):
                 results[word] = random.randint(5, 10)
         return results
 
-    prompt = f"""
-    Analyze the following list of words. Assign a difficulty score (1-10) to each, where 1 is very basic (pedestrian) and 10 is extremely obscure.
-    
-    Words: {', '.join(words)}
-    
-    Return ONLY a JSON object where keys are the words and values are the integer scores.
-    Example: {{"word1": 5, "word2": 2}}
-    """
-
-    messages = [{"role": "user", "content": prompt}]
-    result = _call_openrouter(messages)
+    messages = prompt_templates.build_messages("difficulty", words)
+    result = _call_openrouter(messages, task="difficulty")
     
     return result if result else {}
 
-def enrich_words(words):
+def enrich_words(words, distractor_count=distractor_filter.TARGET_DISTRACTORS):
     """
     Generates definitions, distractors, and examples for a list of words.
+    With a distractor_count below the usual 15, asks only for that many
+    word-specific hard distractors (pipelines fill the rest from distractor_pool).
     Returns a dictionary keyed by word_stem.
     """
     if MOCK_MODE:
@@ -106,7 +146,7 @@ def enrich_words(words):
                     "A photography term about lighting",
                     "A software setting for preferences",
                     "A workplace policy about attendance",
-                ],
+                ][:distractor_count],
                 "examples": [
                     f"He showed great {word} in the face of danger.",
                     f"The {word} in her voice hinted at quiet disappointment.",
@@ -115,75 +155,13 @@ def enrich_words(words):
                     f"Their {word} was obvious to anyone watching."
                 ]
             }
-        return results
+        return _filter_distractors(results, distractor_count)
 
-    prompt = f"""
-    For each word, return:
-    - definition: 5-12 words, plain English, no filler.
-    - distractors: 15 short definition-style phrases (5-12 words), same part of speech.
-      Each distractor MUST be a definition-style clause with a verb (e.g., "being...", "having...", "marked by...", "characterized by...").
-      Match the definition’s format and length (use a similar lead-in like "Relating to...", within ±2 words).
-      Do NOT output noun-only fragments.
-      Mix difficulty: 5 easy wrong, 7 medium, 3 hard-but-wrong.
-      Avoid close synonyms or near-misses that could confuse learners.
-      Do NOT use the target word or close variants.
-      Avoid meta labels like category/genre/brand/model/app/software/name/address.
-      EMPHATIC ANTI-PATTERNS (DO NOT DO THESE):
-      - Do NOT output concrete objects or food/drink items (e.g., "sweet fruit aroma", "fizzy soda", "pastry").
-      - Do NOT output scene fragments or physical places (e.g., "quiet forest glade", "busy train station").
-      - Do NOT output single nouns or noun lists without definition-style wording.
-      - Do NOT output generic labels (e.g., "a type of X", "kind of Y", "brand/model/name").
-    - examples: 5 sentences, 12-25 words each, each must include the word (or inflected form).
-      Provide helpful context for someone learning the word; use book-like usage.
-      The context should NOT be a dead giveaway for the definition, and NOT useless for inferring meaning.
-      Avoid bland, generic sentences.
-    
-    Words: {', '.join(words)}
-    
-    Return ONLY a JSON object where the keys are the words and the values are objects with the following structure.
-    Example response for a fictional word "vellumate":
-    {{
-      "vellumate": {{
-        "definition": "Relating to formal, meticulous work in an official setting.",
-        "distractors": [
-          "Relating to seasonal weather patterns and forecasting",
-          "Relating to theatrical performance and stagecraft traditions",
-          "Relating to childhood play and social games",
-          "Relating to culinary technique and slow cooking methods",
-          "Relating to insect behavior and life cycles",
-          "Relating to navigation safety and route planning",
-          "Relating to financial markets and speculative trading",
-          "Relating to marine biology and ecosystem balance",
-          "Relating to architectural design and urban planning",
-          "Relating to religious ceremony and liturgy",
-          "Relating to bird migration and seasonal movement",
-          "Relating to mechanical repair and equipment maintenance",
-          "Relating to medical nutrition and recovery support",
-          "Relating to software updates and release cycles",
-          "Relating to group psychology and social behavior"
-        ],
-        "examples": [
-          "By the end of the meeting, her vellumate tone slowed the rush and turned scattered talk into measured decisions.",
-          "He approached the negotiations with a vellumate air, pausing often, preferring certainty over speed.",
-          "After the audit notice arrived, the office adopted a vellumate style, careful and deliberate in every response.",
-          "She chose a vellumate approach to the case, resisting shortcuts and insisting on clear steps.",
-          "His vellumate habits made him the obvious choice for sensitive tasks demanding patience and restraint."
-        ]
-      }}
-    }}
-    {{
-      "word_stem": {{
-        "definition": "Short, punchy definition",
-        "distractors": ["distractor 1", ..., "distractor 15"],
-        "examples": ["sentence 1", ..., "sentence 5"]
-      }}
-    }}
-    """
-    
-    messages = [{"role": "user", "content": prompt}]
-    result = _call_openrouter(messages)
+    messages = prompt_templates.build_messages("enrich", words, distractor_count)
+    result = _call_openrouter(messages, task="enrich")
     if not isinstance(result, dict):
         return {}
+    result = prompt_templates.enrichment_payloads(result)
 
     cleaned = {}
     for word in words:
@@ -204,8 +182,67 @@ def enrich_words(words):
             "distractors": distractors,
         }
 
+    return _filter_distractors(cleaned, distractor_count)
+
+def _filter_distractors(cleaned, target=distractor_filter.TARGET_DISTRACTORS):
+    """
+    Drops near-duplicate, definition-like and off-format distractors for the
+    whole batch; words left short of `target` get one shared follow-up request.
+    """
+    kept, rejected = distractor_filter.filter_batch(cleaned, limit=target)
+    missing = distractor_filter.short_words(kept, target=target)
+    if missing:
+        extra = request_more_distractors({
+            word: {
+                "definition": cleaned[word]["definition"],
+                "existing": kept[word],
+                "count": count + FOLLOW_UP_MARGIN,
+            }
+            for word, count in missing.items()
+        })
+        retry = {
+            word: {"definition": cleaned[word]["definition"], "distractors": kept[word] + extra.get(word, [])}
+            for word in missing
+        }
+        kept.update(distractor_filter.filter_batch(retry, limit=target)[0])
+
+    for word, distractors in kept.items():
+        cleaned[word]["distractors"] = distractors
+    instrumentation.record(
+        "distractor_filter",
+        words=len(kept),
+        rejected=sum(sum(reasons.values()) for reasons in rejected.values()),
+        follow_up_words=len(missing),
+        still_short=len(distractor_filter.short_words(kept, target=target)),
+    )
     return cleaned
 
+def request_more_distractors(requests):
+    """
+    Asks for additional distractors for several words in a single call.
+    requests: {word: {"definition": str, "existing": [str], "count": int}}
+    Returns {word: [new distractors]}.
+    """
+    if not requests:
+        return {}
+
+    if MOCK_MODE:
+        extras = [
+            "Relating to careful record keeping in offices",
+            "Having a habit of speaking very loudly",
+            "Marked by sudden changes in the weather",
+            "Characterized by a love of outdoor sports",
+            "Being unusually fond of long train journeys",
+            "Relating to the upkeep of public gardens",
+        ]
+        return {word: extras[:request["count"]] for word, request in requests.items()}
+
+    messages = prompt_templates.build_messages("distractors", requests)
+    result = _call_openrouter(messages, task="distractors")
+    if not isinstance(result, dict):
+        return {}
+    return {word: _normalize_list(_find_word_payload(result, word)) for word in requests}
+
 def _find_word_payload(result, word):
     if word in result:
         return result[word]
@@ -244,20 +281,6 @@ def rank_words_tier(words):
         import random
         return {w: random.randint(1, 5) for w in words}
 
-    prompt = f"""
-    You are a strict lexicographer. I have a list of {len(words)} words.
-    Rank them by frequency of use in modern English and assign them to 5 Tiers.
-    
-    Constraints:
-    1. Divide the list into 5 roughly equal groups (Quintiles).
-    2. Tier 1 = Most Useful / Highest Frequency (e.g., 'Nuance', 'Pragmatic').
-    3. Tier 5 = Least Useful / Obscure / Archaic (e.g., 'Crapulent', 'Defenestrate').
-    
-    Words: {', '.join(words)}
-    
-    Return ONLY a JSON object: {{"word_stem": tier_integer}}
-    """
-    
-    messages = [{"role": "user", "content": prompt}]
-    result = _call_openrouter(messages)
+    messages = prompt_templates.build_messages("rank", words)
+    result = _call_openrouter(messages, task="rank")
     return result if result else {}
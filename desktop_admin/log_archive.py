@@ -0,0 +1,242 @@
+"""
+Compaction of the answer/status/score logs into daily aggregates plus an archive file.
+
+`compact_logs` rolls log rows older than a horizon into per-word, per-day
+tables (`study_log_daily`, `status_log_daily`, `score_log_daily`) and moves the
+raw rows to an attached archive database, all in one transaction. The hot
+vocab_master.db keeps only recent raw rows, so sync payloads and scans stay
+bounded.
+
+The `*_daily_all` views combine the aggregates with the remaining raw rows
+grouped the same way, and `study_log_word_totals` gives per-word attempts,
+correct answers and the last answer time; queries that aggregate per word or
+per day read these views and return the same results before and after
+compaction. Queries that need individual rows (session ids, exact times)
+only see the rows within the horizon.
+
+The mobile app reads the raw tables (attempt counts, score totals, status
+history), so the copy that goes to the phone is uncompacted again with
+`restore_logs`: archived rows go back into the raw tables and the daily
+tables are emptied, leaving the views' results unchanged.
+"""
+import datetime
+import os
+
+import db_init
+
+DEFAULT_HORIZON_DAYS = 365
+ARCHIVE_ALIAS = "archive"
+
+# Per log table: aggregate DDL (grouping columns first) and the SELECT that rolls raw rows into it.
+AGGREGATES = {
+    "study_log": {
+        "columns": "word_id INTEGER, day TEXT, attempts INTEGER, correct INTEGER, first_at TEXT, last_at TEXT",
+        "group_by": ("word_id", "day"),
+        "rollup": """
+            SELECT word_id, DATE(timestamp) AS day, COUNT(*), SUM(CASE WHEN result = 'Correct' THEN 1 ELSE 0 END),
+                   MIN(timestamp), MAX(timestamp)
+            FROM {source}
+            {where}
+            GROUP BY word_id, DATE(timestamp)
+        """,
+        "combine": "SUM(attempts) AS attempts, SUM(correct) AS correct, MIN(first_at) AS first_at, MAX(last_at) AS last_at",
+    },
+    "status_log": {
+        "columns": "word_id INTEGER, day TEXT, from_status TEXT, to_status TEXT, transitions INTEGER",
+        "group_by": ("word_id", "day", "from_status", "to_status"),
+        "rollup": """
+            SELECT word_id, DATE(timestamp) AS day, from_status, to_status, COUNT(*)
+            FROM {source}
+            {where}
+            GROUP BY word_id, DATE(timestamp), from_status, to_status
+        """,
+        "combine": "SUM(transitions) AS transitions",
+    },
+    "score_log": {
+        "columns": "word_id INTEGER, day TEXT, mode TEXT, reason TEXT, points INTEGER, events INTEGER",
+        "group_by": ("word_id", "day", "mode", "reason"),
+        "rollup": """
+            SELECT word_id, DATE(timestamp) AS day, mode, reason, SUM(points), COUNT(*)
+            FROM {source}
+            {where}
+            GROUP BY word_id, DATE(timestamp), mode, reason
+        """,
+        "combine": "SUM(points) AS points, SUM(events) AS events",
+    },
+}
+
+
+def default_archive_path(db_path):
+    stem, extension = os.path.splitext(db_path)
+    return f"{stem}_archive{extension or '.db'}"
+
+
+def _existing_tables(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")}
+
+
+def log_tables(conn):
+    existing = _existing_tables(conn)
+    return [table for table in AGGREGATES if table in existing]
+
+
+def _aggregate_columns(table):
+    return [column.split()[0] for column in AGGREGATES[table]["columns"].split(", ")]
+
+
+def _daily_all_sql(table, with_daily):
+    spec = AGGREGATES[table]
+    group_by = ", ".join(spec["group_by"])
+    rollup = spec["rollup"].format(source=table, where="")
+    if with_daily:
+        # The daily table's column names carry over to the rolled-up rows.
+        return f"SELECT {group_by}, {spec['combine']} FROM (SELECT * FROM {table}_daily UNION ALL {rollup}) GROUP BY {group_by}"
+    return (f"WITH rolled ({', '.join(_aggregate_columns(table))}) AS ({rollup}) "
+            f"SELECT {group_by}, {spec['combine']} FROM rolled GROUP BY {group_by}")
+
+
+def daily_all_source(conn, table):
+    """
+    A FROM-clause source with the rows of the `<table>_daily_all` view that
+    creates nothing, for read-only connections: the view when it exists,
+    otherwise the same query inline (no rows when the log table is missing).
+    """
+    existing = _existing_tables(conn)
+    if f"{table}_daily_all" in existing:
+        return f"{table}_daily_all"
+    if table not in existing:
+        columns = ", ".join(f"NULL AS {column}" for column in _aggregate_columns(table))
+        return f"(SELECT {columns} WHERE 0)"
+    return f"({_daily_all_sql(table, with_daily=f'{table}_daily' in existing)})"
+
+
+def ensure_log_views(conn):
+    """
+    Creates the aggregate tables and the combined views for every log table
+    present (the mobile app creates status_log/score_log on first use).
+    """
+    existing = _existing_tables(conn)
+    created = False
+    for table in log_tables(conn):
+        spec = AGGREGATES[table]
+        daily, view = f"{table}_daily", f"{table}_daily_all"
+        if daily not in existing:
+            conn.execute(f"CREATE TABLE {daily} ({spec['columns']})")
+            conn.execute(f"CREATE INDEX idx_{daily}_word_day ON {daily} (word_id, day)")
+            created = True
+        if view not in existing:
+            conn.execute(f"CREATE VIEW {view} AS {_daily_all_sql(table, with_daily=True)}")
+            created = True
+    if "study_log" in existing and "study_log_word_totals" not in existing:
+        conn.execute("""
+            CREATE VIEW study_log_word_totals AS
+            SELECT word_id, SUM(attempts) AS attempts, SUM(correct) AS correct, MAX(last_at) AS last_studied
+            FROM (
+                SELECT word_id, attempts, correct, last_at FROM study_log_daily
+                UNION ALL
+                SELECT word_id, 1, CASE WHEN result = 'Correct' THEN 1 ELSE 0 END, timestamp FROM study_log
+            )
+            GROUP BY word_id
+        """)
+        created = True
+    if created:
+        conn.commit()
+
+
+def _ensure_archive_table(conn, table):
+    """
+    Creates (or widens) the archive copy of `table`; returns its column names.
+    Foreign keys are left out since the archive has no words table.
+    """
+    columns = [(name, column_type, is_primary_key) for _, name, column_type, _, _, is_primary_key
+               in conn.execute(f"PRAGMA main.table_info({table})")]
+    definitions = ", ".join(f"{name} {column_type}{' PRIMARY KEY' if is_primary_key else ''}" for name, column_type, is_primary_key in columns)
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {ARCHIVE_ALIAS}.{table} ({definitions})")
+    archived = {row[1] for row in conn.execute(f"PRAGMA {ARCHIVE_ALIAS}.table_info({table})")}
+    for name, column_type, _ in columns:
+        if name not in archived:
+            conn.execute(f"ALTER TABLE {ARCHIVE_ALIAS}.{table} ADD COLUMN {name} {column_type}")
+    return [name for name, _, _ in columns]
+
+
+def compact_logs(conn, archive_path, horizon_days=DEFAULT_HORIZON_DAYS, today=None, vacuum=False, progress=None):
+    """
+    Rolls log rows from before `today - horizon_days` into the daily tables and
+    moves them to `archive_path` (created on first use). The moved rows are
+    kept out of the change feed, since no total changes. Returns
+    {"cutoff", "archive", "<table>": rows moved, ...}.
+    """
+    today = today or datetime.date.today()
+    cutoff = (today - datetime.timedelta(days=horizon_days)).isoformat()
+    ensure_log_views(conn)
+    tables = log_tables(conn)
+    summary = {"cutoff": cutoff, "archive": archive_path}
+
+    conn.commit()
+    conn.execute(f"ATTACH DATABASE ? AS {ARCHIVE_ALIAS}", (archive_path,))
+    try:
+        with conn, db_init.unlogged_deletes(conn, tables):
+            for index, table in enumerate(tables):
+                if progress is not None:
+                    progress(index, len(tables), f"Compacting {table}...")
+                # Whole days only: 'YYYY-MM-DD HH:MM' < cutoff exactly when its date is before the cutoff.
+                where = "WHERE timestamp < ?"
+                columns = ", ".join(_ensure_archive_table(conn, table))
+                conn.execute(
+                    f"INSERT INTO main.{table}_daily {AGGREGATES[table]['rollup'].format(source='main.' + table, where=where)}",
+                    (cutoff,),
+                )
+                moved = conn.execute(
+                    f"INSERT INTO {ARCHIVE_ALIAS}.{table} ({columns}) SELECT {columns} FROM main.{table} {where}", (cutoff,),
+                ).rowcount
+                conn.execute(f"DELETE FROM main.{table} {where}", (cutoff,))
+                summary[table] = moved
+    finally:
+        conn.execute(f"DETACH DATABASE {ARCHIVE_ALIAS}")
+
+    if vacuum:
+        conn.execute("VACUUM")
+    if progress is not None:
+        progress(len(tables), len(tables), "Compaction complete.")
+    return summary
+
+
+def restore_logs(conn, archive_path):
+    """
+    Moves the compacted history back into the raw log tables of `conn` (meant
+    for a copy of the DB, e.g. the phone's): archived rows are re-inserted
+    and the daily tables emptied, in one transaction. Row ids are not kept;
+    the aggregates only ever hold archived rows, so nothing is counted twice.
+    Returns {"<table>": rows restored, ...}; raises FileNotFoundError when
+    there are aggregates but no archive to restore them from.
+    """
+    existing = _existing_tables(conn)
+    tables = [table for table in log_tables(conn) if f"{table}_daily" in existing]
+    compacted = any(conn.execute(f"SELECT 1 FROM {table}_daily LIMIT 1").fetchone() for table in tables)
+    if not compacted:
+        return {}
+    if not os.path.exists(archive_path):
+        raise FileNotFoundError(f"Logs were compacted but the archive {archive_path} is missing.")
+
+    summary = {}
+    conn.commit()
+    conn.execute(f"ATTACH DATABASE ? AS {ARCHIVE_ALIAS}", (archive_path,))
+    try:
+        archived = {row[0] for row in conn.execute(f"SELECT name FROM {ARCHIVE_ALIAS}.sqlite_master WHERE type = 'table'")}
+        with conn:
+            for table in tables:
+                restored = 0
+                if table in archived:
+                    main_columns = {row[1]: row[5] for row in conn.execute(f"PRAGMA main.table_info({table})")}
+                    columns = ", ".join(
+                        row[1] for row in conn.execute(f"PRAGMA {ARCHIVE_ALIAS}.table_info({table})")
+                        if row[1] in main_columns and not main_columns[row[1]]
+                    )
+                    restored = conn.execute(
+                        f"INSERT INTO main.{table} ({columns}) SELECT {columns} FROM {ARCHIVE_ALIAS}.{table} ORDER BY timestamp"
+                    ).rowcount
+                conn.execute(f"DELETE FROM main.{table}_daily")
+                summary[table] = restored
+    finally:
+        conn.execute(f"DETACH DATABASE {ARCHIVE_ALIAS}")
+    return summary
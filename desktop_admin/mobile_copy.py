@@ -0,0 +1,72 @@
+"""
+The copy of vocab_master.db that goes to the phone.
+
+The mobile app opens the file with sqflite, i.e. the platform SQLite, which
+is not guaranteed to include FTS5. Desktop-only schema is therefore stripped
+from a backup of the database rather than shipped: the `words_fts` search
+index and the triggers that keep it in sync (with them in place, any word
+insert or definition edit on the device would fail with "no such module:
+fts5"). The change feed goes too: its triggers would log every answer on
+the device into a table nothing there reads or prunes. Tables left behind by
+retired desktop caches (RETIRED_TABLES) are dropped as well. The desktop
+database itself is left untouched.
+
+The app also reads the raw study/status/score logs, so rows that
+`log_archive.compact_logs` moved to the archive are restored into the copy;
+the phone sees its full history whether or not the desktop DB was compacted.
+"""
+import os
+import sqlite3
+
+import db_init
+import log_archive
+
+# Cache tables older desktop versions created; nothing reads them any more.
+RETIRED_TABLES = ("deck_candidates",)
+
+
+def default_mobile_path(db_path):
+    stem, extension = os.path.splitext(db_path)
+    return f"{stem}_mobile{extension or '.db'}"
+
+
+def strip_desktop_schema(conn):
+    """
+    Drops the desktop-only tables and triggers from `conn` (a mobile copy).
+    Returns the names of the objects removed.
+    """
+    before = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")}
+    db_init.drop_search_index(conn)
+    db_init.drop_change_feed(conn)
+    for table in RETIRED_TABLES:
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+    conn.commit()
+    after = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")}
+    return sorted(before - after)
+
+
+def write_mobile_copy(conn, path, archive_path=None):
+    """
+    Writes a consistent snapshot of `conn` to `path` without the desktop-only
+    schema and with the archived log rows restored (from `archive_path`,
+    by default the compaction archive next to the DB), compacted with VACUUM.
+    The file is built next to `path` and moved into place, so an existing
+    copy is only replaced by a complete one.
+    Returns {"path", "removed", "restored", "bytes"}.
+    """
+    if archive_path is None:
+        db_path = conn.execute("PRAGMA database_list").fetchone()[2]
+        archive_path = log_archive.default_archive_path(db_path)
+    partial = f"{path}.partial"
+    if os.path.exists(partial):
+        os.remove(partial)
+    target = sqlite3.connect(partial)
+    try:
+        conn.backup(target)
+        restored = log_archive.restore_logs(target, archive_path)
+        removed = strip_desktop_schema(target)
+        target.execute("VACUUM")
+    finally:
+        target.close()
+    os.replace(partial, path)
+    return {"path": path, "removed": removed, "restored": restored, "bytes": os.path.getsize(path)}
@@ -0,0 +1,243 @@
+"""
+Compiles vocab_master.db into the mobile app's bundled word packs.
+
+Enriched words (definition plus at least PACK_DISTRACTORS distractors, not
+Ignored) are grouped into difficulty levels 1-5 by `priority_tier` (falling
+back to `difficulty_score` 1-10 halved) and cut into packs of
+about `words_per_pack`, easiest first. Each pack is written in the same JSON layout
+as the hand-made packs under mobile_app/assets/word_packs, optionally gzipped
+for server-hosted downloads, and listed in manifest.json with its size and
+SHA-256. The app reads manifest.json with rootBundle.loadString, so gzip
+builds are listed in a separate manifest (GZIP_MANIFEST_NAME) instead.
+
+Rows are streamed PACK_CHUNK_SIZE words at a time, so memory stays bounded by
+one chunk plus one pack. Pack boundaries are content-defined (a word ends a
+pack when its hash says so, within size limits) and packs are named after
+their first word, so adding, removing or editing a word changes only the
+pack(s) around it (a short hash of the first word is appended when its slug
+is not the word itself, so "Polish" and "polish" get different files). A
+pack whose bytes match the file on disk is not
+rewritten, and packs no longer produced are removed.
+Hand-made packs (manifest entries without "generated") are kept as they are.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import zlib
+
+import db_init
+
+DEFAULT_OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "mobile_app", "assets", "word_packs")
+MANIFEST_NAME = "manifest.json"
+GZIP_MANIFEST_NAME = "manifest.gzip.json"
+WORDS_PER_PACK = 30
+PACK_CHUNK_SIZE = 500
+# Same shape as the hand-made packs: the quiz shows 3 distractors, the pack import keeps the examples.
+PACK_DISTRACTORS = 3
+PACK_EXAMPLES = 2
+LEVELS = (1, 2, 3, 4, 5)
+
+PACK_WORDS_QUERY = """
+    SELECT id, word_stem, definition, difficulty_score, level
+    FROM (
+        SELECT id, word_stem, definition, difficulty_score,
+               MIN(MAX(COALESCE(priority_tier, (difficulty_score + 1) / 2), 1), 5) AS level
+        FROM words
+        WHERE status != 'Ignored'
+          AND definition IS NOT NULL AND definition != ''
+          AND (priority_tier IS NOT NULL OR difficulty_score IS NOT NULL)
+    )
+    ORDER BY level, COALESCE(difficulty_score, 10), word_stem
+"""
+
+
+def _report(progress, done, total, message):
+    if progress is not None:
+        progress(done, total, message)
+
+
+def _children(conn, table, column, word_ids, limit):
+    placeholders = ", ".join("?" for _ in word_ids)
+    grouped = {}
+    for word_id, value in conn.execute(
+        f"SELECT word_id, {column} FROM {table} WHERE word_id IN ({placeholders}) ORDER BY word_id, id",
+        word_ids,
+    ):
+        values = grouped.setdefault(word_id, [])
+        if len(values) < limit and value and value.strip():
+            values.append(value.strip())
+    return grouped
+
+
+def iter_pack_words(conn):
+    """
+    Yields (level, pack word dict) in pack order for every word that can be quizzed.
+    """
+    cursor = conn.cursor()
+    cursor.execute(PACK_WORDS_QUERY)
+    while True:
+        chunk = cursor.fetchmany(PACK_CHUNK_SIZE)
+        if not chunk:
+            return
+        word_ids = [row[0] for row in chunk]
+        distractors = _children(conn, "distractors", "text", word_ids, PACK_DISTRACTORS)
+        examples = _children(conn, "examples", "sentence", word_ids, PACK_EXAMPLES)
+        for word_id, word_stem, definition, difficulty_score, level in chunk:
+            if len(distractors.get(word_id, [])) < PACK_DISTRACTORS:
+                continue
+            yield level, {
+                "word_stem": word_stem,
+                "definition": definition,
+                "difficulty_score": difficulty_score if difficulty_score is not None else level * 2,
+                "examples": examples.get(word_id, []),
+                "distractors": distractors[word_id],
+            }
+
+
+def _ends_pack(word_stem, size, words_per_pack):
+    # Between half and twice words_per_pack, a word ends the pack with probability
+    # 2 / words_per_pack (by hash), so packs average words_per_pack words.
+    if size >= 2 * words_per_pack:
+        return True
+    return size >= words_per_pack // 2 and zlib.crc32(word_stem.encode("utf-8")) % words_per_pack < 2
+
+
+def iter_packs(conn, words_per_pack=WORDS_PER_PACK):
+    """
+    Yields (level, words) packs of about `words_per_pack` words.
+    """
+    current_level, words = None, []
+    for level, word in iter_pack_words(conn):
+        if level != current_level and words:
+            yield current_level, words
+            words = []
+        current_level = level
+        words.append(word)
+        if _ends_pack(word["word_stem"], len(words), words_per_pack):
+            yield current_level, words
+            words = []
+    if words:
+        yield current_level, words
+
+
+def _slug(text):
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-") or "word"
+
+
+def pack_name(first_word):
+    """
+    File-name part for a pack starting with `first_word`. Stems are unique,
+    and only a stem that is its own slug keeps the bare slug, so names never
+    collide within a level.
+    """
+    slug = _slug(first_word)
+    if slug == first_word:
+        return slug
+    return f"{slug}-{hashlib.sha1(first_word.encode('utf-8')).hexdigest()[:8]}"
+
+
+def pack_bytes(header, words, compress=False):
+    """
+    Serializes a pack like the hand-made ones (one word per line); gzip output
+    has a fixed mtime so identical packs produce identical bytes.
+    """
+    lines = ["{"]
+    lines += [f"  {json.dumps(key)}: {json.dumps(value, ensure_ascii=False)}," for key, value in header.items()]
+    lines.append('  "words": [')
+    lines.append(",\n".join(f"    {json.dumps(word, ensure_ascii=False)}" for word in words))
+    lines += ["  ]", "}", ""]
+    data = "\n".join(lines).encode("utf-8")
+    if compress:
+        data = gzip.compress(data, mtime=0)
+    return data
+
+
+def _write_if_changed(path, data):
+    """
+    Writes `data` to `path` unless the file already holds exactly those bytes.
+    Returns True when the file was (re)written.
+    """
+    if os.path.exists(path) and os.path.getsize(path) == len(data):
+        with open(path, "rb") as existing:
+            if existing.read() == data:
+                return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as out:
+        out.write(data)
+    os.replace(temp_path, path)
+    return True
+
+
+def load_manifest(output_dir, name=MANIFEST_NAME):
+    path = os.path.join(output_dir, name)
+    if not os.path.exists(path):
+        return {"version": 1, "difficulty_levels": [], "packs": []}
+    with open(path, encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def build_packs(conn, output_dir=DEFAULT_OUTPUT_DIR, words_per_pack=WORDS_PER_PACK, compress=False, progress=None):
+    """
+    Writes generated packs and an updated manifest.json (GZIP_MANIFEST_NAME
+    with `compress`) into `output_dir`.
+    Returns {"packs", "words", "written", "unchanged", "removed", "bytes", "manifest"}.
+    """
+    db_init.ensure_child_indexes(conn)
+    manifest_name = GZIP_MANIFEST_NAME if compress else MANIFEST_NAME
+    manifest = load_manifest(output_dir, manifest_name)
+    if not manifest.get("difficulty_levels"):
+        manifest["difficulty_levels"] = load_manifest(output_dir).get("difficulty_levels", [])
+    level_names = {level["level"]: level["name"] for level in manifest.get("difficulty_levels", [])}
+    previous = [pack for pack in manifest.get("packs", []) if pack.get("generated")]
+    packs = [pack for pack in manifest.get("packs", []) if not pack.get("generated")]
+    extension = ".json.gz" if compress else ".json"
+
+    summary = {"packs": 0, "words": 0, "written": 0, "unchanged": 0, "removed": 0, "bytes": 0, "manifest": manifest_name}
+    last_level = None
+    for level, words in iter_packs(conn, words_per_pack):
+        if level != last_level:
+            _report(progress, level - 1, len(LEVELS), f"Building level {level} packs...")
+            last_level = level
+        first, last = words[0]["word_stem"], words[-1]["word_stem"]
+        name = pack_name(first)
+        pack_id = f"level-{level}-db-{name}"
+        asset_path = f"level-{level}/db-{name}{extension}"
+        header = {
+            "id": pack_id,
+            "name": f"{level_names.get(level, f'Level {level}')}: {first} to {last}",
+            "difficulty_level": level,
+            "description": f"{len(words)} words from the master word list",
+        }
+        data = pack_bytes(header, words, compress)
+        if _write_if_changed(os.path.join(output_dir, asset_path), data):
+            summary["written"] += 1
+        else:
+            summary["unchanged"] += 1
+        packs.append({
+            **header,
+            "word_count": len(words),
+            "asset_path": asset_path,
+            "bytes": len(data),
+            "sha256": hashlib.sha256(data).hexdigest(),
+            "encoding": "gzip" if compress else "identity",
+            "generated": True,
+        })
+        summary["packs"] += 1
+        summary["words"] += len(words)
+        summary["bytes"] += len(data)
+
+    current_paths = {pack["asset_path"] for pack in packs}
+    for pack in previous:
+        path = os.path.join(output_dir, pack["asset_path"])
+        if pack["asset_path"] not in current_paths and os.path.exists(path):
+            os.remove(path)
+            summary["removed"] += 1
+
+    manifest["packs"] = packs
+    manifest_data = (json.dumps(manifest, indent=2, ensure_ascii=False) + "\n").encode("utf-8")
+    _write_if_changed(os.path.join(output_dir, manifest_name), manifest_data)
+    _report(progress, len(LEVELS), len(LEVELS), "Word packs complete.")
+    return summary
@@ -0,0 +1,517 @@
+"""
+UI-independent import and LLM pipelines.
+
+Every function takes an open vocab_master.db connection and an optional
+progress(done, total, message) callback, so the same code runs under
+Streamlit, from scripts and in benchmarks. `llm` defaults to llm_helper,
+imported on first use so callers that never reach the LLM skip requests and
+dotenv; it may be any object with the same assess_difficulty /
+rank_words_tier / enrich_words functions. The batched LLM pipelines accept
+`concurrency` to keep several LLM requests in flight; database writes always
+happen on the calling thread.
+"""
+import concurrent.futures
+import contextvars
+import csv
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+import db_init
+import distractor_pool
+import enrichment_queue
+import lemma_merge
+
+KINDLE_IMPORT_QUERY = """
+    SELECT
+        w.stem as word_stem,
+        l.usage as original_context,
+        b.title as book_title,
+        MAX(l.timestamp) as looked_up_at
+    FROM WORDS w
+    JOIN LOOKUPS l ON w.id = l.word_key
+    JOIN BOOK_INFO b ON l.book_key = b.id
+    GROUP BY w.stem
+"""
+
+
+def _report(progress, done, total, message):
+    if progress is not None:
+        progress(done, total, message)
+
+
+def _default_llm():
+    import llm_helper
+    return llm_helper
+
+
+def _batches(items, batch_size):
+    batch_size = max(int(batch_size or len(items) or 1), 1)
+    return [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+
+
+def _map_batches(call, batches, concurrency=1):
+    """
+    Yields (batch, call(batch)) in order, running up to `concurrency` calls at once.
+    """
+    if concurrency <= 1 or len(batches) <= 1:
+        for batch in batches:
+            yield batch, call(batch)
+        return
+    # Each call runs in a copy of the caller's context, so workers record metrics into the caller's session.
+    contexts = [contextvars.copy_context() for _ in batches]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+        yield from zip(batches, pool.map(lambda context, batch: context.run(call, batch), contexts, batches))
+
+
+def read_kindle_words(kindle_path):
+    """
+    Reads one row per stem (with a usage sentence, book title and latest lookup time) from a Kindle vocab.db.
+    """
+    k_conn = sqlite3.connect(kindle_path)
+    try:
+        return pd.read_sql_query(KINDLE_IMPORT_QUERY, k_conn)
+    finally:
+        k_conn.close()
+
+
+def kindle_paths(inputs):
+    """
+    Expands files and directories (searched recursively for *.db) into a
+    sorted list of Kindle database paths.
+    """
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                paths += [os.path.join(root, name) for name in files if name.lower().endswith(".db")]
+        else:
+            paths.append(item)
+    return sorted(dict.fromkeys(paths))
+
+
+def parse_kindle_file(kindle_path):
+    """
+    Reads and normalizes one Kindle vocab.db (runs in a worker process).
+    Returns (path, [(word_stem, original_context, book_title, looked_up_at)], seconds).
+    """
+    started = time.perf_counter()
+    k_conn = sqlite3.connect(kindle_path)
+    try:
+        rows = k_conn.execute(KINDLE_IMPORT_QUERY).fetchall()
+    finally:
+        k_conn.close()
+    normalized = []
+    for word_stem, context, title, looked_up_at in rows:
+        word_stem = (word_stem or "").strip()
+        if word_stem:
+            normalized.append((word_stem, (context or "").strip() or None, (title or "").strip() or None, looked_up_at))
+    return kindle_path, normalized, time.perf_counter() - started
+
+
+def _stem_key(word_stem):
+    # 8-byte digest: a set of these stays small next to a set of the stems themselves.
+    return int.from_bytes(hashlib.blake2b(word_stem.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _parse_kindle_files(paths, workers):
+    """
+    Yields parse_kindle_file results as they finish, in a process pool when
+    there are several files.
+    """
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    if workers <= 1:
+        for path in paths:
+            yield parse_kindle_file(path)
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        for future in concurrent.futures.as_completed([pool.submit(parse_kindle_file, path) for path in paths]):
+            yield future.result()
+
+
+def import_kindle_dbs(conn, kindle_paths, merge_variants=True, workers=None, progress=None):
+    """
+    Imports several Kindle vocab.db files (e.g. one per device): each file is
+    parsed in a worker process, stems are deduplicated across files (the most
+    recent lookup wins), and new stems are inserted by this connection in one
+    transaction with the search index re-synced once. New words are queued
+    for enrichment with their lookup time; with merge_variants, new words that
+    are unambiguous inflections of another stem looked up in the same files
+    (or the base of one) are then folded into their lemma rows.
+    Returns {"files", "found", "unique", "added", "merged", "parse_s",
+    "write_s", "words_per_s", "per_file": [{"path", "found", "seconds", "words_per_s"}]}.
+    """
+    started = time.perf_counter()
+    total = len(kindle_paths)
+    summary = {"files": total, "found": 0, "unique": 0, "added": 0, "merged": 0,
+               "parse_s": 0.0, "write_s": 0.0, "words_per_s": 0, "per_file": []}
+    parsed = []
+    _report(progress, 0, total, f"Reading {total} Kindle file(s)...")
+    for path, rows, seconds in _parse_kindle_files(kindle_paths, workers):
+        parsed.append(rows)
+        summary["found"] += len(rows)
+        summary["per_file"].append({
+            "path": path, "found": len(rows), "seconds": round(seconds, 3),
+            "words_per_s": round(len(rows) / seconds) if seconds else None,
+        })
+        _report(progress, len(parsed), total,
+                f"Read {len(rows)} words from {path} in {seconds:.2f}s ({summary['per_file'][-1]['words_per_s']} words/s)")
+    summary["parse_s"] = round(time.perf_counter() - started, 3)
+
+    # Newest lookups first, so the first row kept for a stem is its latest.
+    rows = sorted((row for rows in parsed for row in rows), key=lambda row: row[3] or 0, reverse=True)
+    seen = set()
+    unique = []
+    for row in rows:
+        key = _stem_key(row[0])
+        if key not in seen:
+            seen.add(key)
+            unique.append(row)
+    summary["unique"] = len(unique)
+    if not unique:
+        return summary
+
+    write_started = time.perf_counter()
+    enrichment_queue.ensure_queue(conn)
+    new_ids = []
+    with conn, db_init.deferred_search_sync(conn, new_ids):
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM words").fetchone()[0]
+        conn.executemany(
+            "INSERT OR IGNORE INTO words (word_stem, original_context, book_title) VALUES (?, ?, ?)",
+            [row[:3] for row in unique],
+        )
+        new_ids.extend(row[0] for row in conn.execute("SELECT id FROM words WHERE id > ?", (last_id,)))
+        enrichment_queue.record_lookups(conn, [(row[0], row[3]) for row in unique])
+    summary["added"] = len(new_ids)
+    summary["write_s"] = round(time.perf_counter() - write_started, 3)
+    if merge_variants and new_ids:
+        stems = [row[0] for row in unique]
+        summary["merged"] = lemma_merge.merge_duplicates(conn, stems=stems, word_ids=new_ids)["merged"]
+    elapsed = time.perf_counter() - started
+    summary["words_per_s"] = round(summary["found"] / elapsed) if elapsed else None
+    _report(progress, total, total, "Import complete.")
+    return summary
+
+
+def import_kindle_db(conn, kindle_path, merge_variants=True):
+    """
+    Merges new stems from one Kindle vocab.db (see import_kindle_dbs).
+    Returns {"found": rows read, "added": rows inserted, "merged": variant rows folded}.
+    """
+    summary = import_kindle_dbs(conn, [kindle_path], merge_variants=merge_variants, workers=1)
+    return {"found": summary["found"], "added": summary["added"], "merged": summary["merged"]}
+
+
+def run_pedestrian_check(conn, llm=None, batch_size=None, concurrency=1, progress=None):
+    """
+    Scores New words for difficulty and auto-ignores pedestrian ones (score < 4).
+    batch_size=None sends every word in one request.
+    Returns {"total", "checked", "ignored"}.
+    """
+    llm = llm or _default_llm()
+    # Get New words that haven't been scored yet (or re-score all New)
+    df_new = pd.read_sql_query("SELECT id, word_stem FROM words WHERE status = 'New'", conn)
+    if df_new.empty:
+        return {"total": 0, "checked": 0, "ignored": 0}
+
+    words_to_check = df_new['word_stem'].tolist()
+    total = len(words_to_check)
+    _report(progress, 0, total, f"Analyzing {total} words...")
+
+    cursor = conn.cursor()
+    updated_count = 0
+    ignored_count = 0
+    done = 0
+
+    for batch, scores in _map_batches(llm.assess_difficulty, _batches(words_to_check, batch_size), concurrency):
+        for word, score in scores.items():
+            # Auto-ignore logic: Score < 4 implies pedestrian
+            new_status = 'New'
+            if score < 4:
+                new_status = 'Ignored'
+                ignored_count += 1
+
+            cursor.execute("""
+                UPDATE words
+                SET difficulty_score = ?, status = ?
+                WHERE word_stem = ? AND status = 'New'
+            """, (score, new_status, word))
+            updated_count += 1
+
+        conn.commit()
+        done += len(batch)
+        if done < total:
+            _report(progress, done, total, f"Checked {done}/{total} words...")
+
+    _report(progress, total, total, "Pedestrian check complete.")
+    return {"total": total, "checked": updated_count, "ignored": ignored_count}
+
+
+def run_ranking(conn, llm=None, batch_size=50, concurrency=1, progress=None):
+    """
+    Assigns priority tiers to unranked, non-Ignored words in batches.
+    Returns {"total", "ranked"}.
+    """
+    llm = llm or _default_llm()
+    # Rank words that have no tier yet (NULL), excluding Ignored words
+    df_rank = pd.read_sql_query("SELECT word_stem FROM words WHERE priority_tier IS NULL AND status != 'Ignored'", conn)
+    if df_rank.empty:
+        return {"total": 0, "ranked": 0}
+
+    words_to_rank = df_rank['word_stem'].tolist()
+    total = len(words_to_rank)
+    cursor = conn.cursor()
+    total_ranked = 0
+    done = 0
+
+    # Process in batches to respect context window and logic
+    _report(progress, 0, total, f"Ranking {total} words...")
+    for batch, tiers in _map_batches(llm.rank_words_tier, _batches(words_to_rank, batch_size), concurrency):
+        for word, tier in tiers.items():
+            cursor.execute("UPDATE words SET priority_tier = ? WHERE word_stem = ?", (tier, word))
+            total_ranked += 1
+
+        conn.commit()
+        done += len(batch)
+        if done < total:
+            _report(progress, done, total, f"Ranked batch {done - len(batch)}-{done}...")
+
+    _report(progress, total, total, "Ranking complete.")
+    return {"total": total, "ranked": total_ranked}
+
+
+def _clean_strings(value):
+    if isinstance(value, str):
+        value = [value]
+    return [item.strip() for item in (value or []) if isinstance(item, str) and item.strip()]
+
+
+def _usage_spent(llm, before):
+    """
+    (tokens, cost_usd) used since the `before` usage_totals() snapshot; None
+    for what the LLM client does not report.
+    """
+    usage_totals = getattr(llm, "usage_totals", None)
+    if before is None or usage_totals is None:
+        return None, None
+    after = usage_totals()
+    tokens = (after["prompt_tokens"] - before["prompt_tokens"]) + (after["completion_tokens"] - before["completion_tokens"])
+    cost = after["cost_usd"] - before["cost_usd"] if after["priced_calls"] > before["priced_calls"] else None
+    return tokens, cost
+
+
+def run_enrichment(conn, status_filter, llm=None, batch_size=5, concurrency=1, limit=None,
+                   max_tokens=None, max_usd=None, progress=None):
+    """
+    Generates definitions, distractors and examples for the words in
+    status_filter, taken from enrichment_queue in priority order (at most
+    `limit` words when given). New words move to On Deck. Once the shared
+    distractor pool is big enough the LLM writes only a few word-specific
+    distractors per word and the rest are drawn from the pool.
+    With max_tokens and/or max_usd the run sends words in rounds of
+    batch_size * concurrency, sized to what the remaining budget affords, and
+    stops once the budget is spent; the rest stay queued for the next run.
+    Returns {"total", "attempted", "enriched", "with_examples",
+    "with_distractors", "pool_distractors", "tokens", "cost_usd",
+    "stopped_by_budget", "remaining", "per_word_counts"}.
+    """
+    llm = llm or _default_llm()
+    total = enrichment_queue.sync_queue(conn, status_filter)
+    if limit is not None:
+        total = min(total, int(limit))
+    summary = {"total": total, "attempted": 0, "enriched": 0, "with_examples": 0, "with_distractors": 0,
+               "pool_distractors": 0, "tokens": 0, "cost_usd": 0.0, "stopped_by_budget": False,
+               "remaining": 0, "per_word_counts": []}
+    if total == 0:
+        return summary
+
+    budget = enrichment_queue.Budget(max_tokens, max_usd)
+    tokens_per_word = enrichment_queue.tokens_per_word(conn)
+    run_id = enrichment_queue.start_run(conn, status_filter, max_tokens, max_usd)
+    round_size = max(int(batch_size or 1), 1) * max(concurrency, 1) if budget.limited else total
+    usage_totals = getattr(llm, "usage_totals", None)
+    cursor = conn.cursor()
+    enrich = functools.partial(llm.enrich_words, distractor_count=distractor_pool.llm_distractor_count(conn))
+
+    done = 0
+    _report(progress, 0, total, f"Enriching {total} words...")
+    while done < total:
+        count = min(round_size, total - done)
+        affordable = budget.affordable_words(tokens_per_word)
+        if affordable is not None and affordable < count:
+            count = affordable
+        if count < 1:
+            budget.stopped = True
+            break
+        rows = enrichment_queue.next_words(conn, status_filter, count, run_id)
+        if not rows:
+            break
+        word_ids = {word: word_id for word_id, word in rows}
+        before = usage_totals() if usage_totals is not None else None
+
+        for batch, enrichment_data in _map_batches(enrich, _batches([word for _, word in rows], batch_size), concurrency):
+            pool_rows = [
+                (word_ids.get(word), text)
+                for word, data in enrichment_data.items()
+                for text in [data.get('definition')] + list(data.get('distractors') or [])
+            ]
+            summary["pool_distractors"] += distractor_pool.fill_batch(conn, enrichment_data, word_ids)
+            enriched_ids = set()
+            for word, data in enrichment_data.items():
+                if status_filter == 'New':
+                    cursor.execute("""
+                        UPDATE words
+                        SET definition = ?, status = 'On Deck', bucket_date = DATE('now')
+                        WHERE word_stem = ? AND status = ?
+                    """, (data['definition'], word, status_filter))
+                else:
+                    cursor.execute("""
+                        UPDATE words
+                        SET definition = ?
+                        WHERE word_stem = ? AND status = ?
+                    """, (data['definition'], word, status_filter))
+
+                if cursor.rowcount > 0 and word in word_ids:
+                    word_id = word_ids[word]
+
+                    cursor.execute("DELETE FROM distractors WHERE word_id = ?", (word_id,))
+                    cursor.execute("DELETE FROM examples WHERE word_id = ?", (word_id,))
+
+                    examples = _clean_strings(data.get('examples'))
+                    distractors = _clean_strings(data.get('distractors'))
+
+                    for dist in distractors:
+                        cursor.execute("INSERT INTO distractors (word_id, text) VALUES (?, ?)", (word_id, dist))
+
+                    for ex in examples:
+                        cursor.execute("INSERT INTO examples (word_id, sentence) VALUES (?, ?)", (word_id, ex))
+
+                    if examples:
+                        summary["with_examples"] += 1
+                    if distractors:
+                        summary["with_distractors"] += 1
+                    summary["per_word_counts"].append({
+                        "word": word,
+                        "examples": len(examples),
+                        "distractors": len(distractors),
+                    })
+                    summary["enriched"] += 1
+                    enriched_ids.add(word_id)
+
+            enrichment_queue.mark_done(conn, enriched_ids)
+            enrichment_queue.mark_failed(conn, [word_ids[word] for word in batch if word_ids[word] not in enriched_ids], run_id)
+            conn.commit()
+            distractor_pool.add_to_pool(conn, pool_rows)
+            done += len(batch)
+            if done < total:
+                _report(progress, done, total, f"Enriched batch {done - len(batch) + 1}-{done}...")
+
+        tokens, cost = _usage_spent(llm, before)
+        if not tokens:
+            # Mock and third-party clients report no usage; charge the estimate.
+            tokens = round(tokens_per_word * len(rows))
+        else:
+            # Later rounds are sized with this run's own rate.
+            tokens_per_word = tokens / len(rows)
+        budget.spend(tokens, cost)
+
+    summary["attempted"] = done
+    summary["tokens"] = budget.tokens
+    summary["cost_usd"] = round(budget.cost_usd, 6)
+    summary["stopped_by_budget"] = budget.stopped
+    summary["remaining"] = enrichment_queue.pending_count(conn, status_filter)
+    enrichment_queue.finish_run(conn, run_id, done, summary["enriched"], budget)
+    _report(progress, total, total, "Stopped at the budget." if budget.stopped else "Enrichment complete.")
+    return summary
+
+
+EXPORT_FORMATS = ("jsonl", "json", "csv")
+EXPORT_CHUNK_SIZE = 500
+EXPORT_PROGRESS_EVERY = 10000
+
+
+def _children_by_word(conn, table, column, word_ids):
+    placeholders = ", ".join("?" for _ in word_ids)
+    rows = conn.execute(
+        f"SELECT word_id, {column} FROM {table} WHERE word_id IN ({placeholders}) ORDER BY word_id, id",
+        word_ids,
+    ).fetchall()
+    grouped = {}
+    for word_id, value in rows:
+        grouped.setdefault(word_id, []).append(value)
+    return grouped
+
+
+def iter_export_rows(conn, statuses=None, include_enrichment=True):
+    """
+    Yields one dict per word (every words column, plus `examples` and `distractors`
+    lists when include_enrichment), reading EXPORT_CHUNK_SIZE words at a time.
+    """
+    query = "SELECT * FROM words"
+    params = []
+    if statuses:
+        query += f" WHERE status IN ({', '.join('?' for _ in statuses)})"
+        params.extend(statuses)
+    cursor = conn.cursor()
+    cursor.execute(query + " ORDER BY id", params)
+    columns = [description[0] for description in cursor.description]
+    while True:
+        chunk = cursor.fetchmany(EXPORT_CHUNK_SIZE)
+        if not chunk:
+            return
+        rows = [dict(zip(columns, values)) for values in chunk]
+        if include_enrichment:
+            word_ids = [row["id"] for row in rows]
+            examples = _children_by_word(conn, "examples", "sentence", word_ids)
+            distractors = _children_by_word(conn, "distractors", "text", word_ids)
+            for row in rows:
+                row["examples"] = examples.get(row["id"], [])
+                row["distractors"] = distractors.get(row["id"], [])
+        yield from rows
+
+
+def export_words(conn, out, fmt="jsonl", statuses=None, include_enrichment=True, progress=None):
+    """
+    Streams words (optionally filtered by status) to the text file object `out`
+    as JSON lines, a JSON array or CSV (list columns JSON-encoded).
+    Returns {"exported": rows written}.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    placeholders = ", ".join("?" for _ in statuses or [])
+    total = conn.execute(
+        "SELECT count(*) FROM words" + (f" WHERE status IN ({placeholders})" if statuses else ""),
+        list(statuses or []),
+    ).fetchone()[0]
+    _report(progress, 0, total, f"Exporting {total} words...")
+
+    writer = None
+    exported = 0
+    if fmt == "json":
+        out.write("[")
+    for row in iter_export_rows(conn, statuses, include_enrichment):
+        if fmt == "csv":
+            if writer is None:
+                writer = csv.DictWriter(out, fieldnames=list(row))
+                writer.writeheader()
+            writer.writerow({
+                key: json.dumps(value, ensure_ascii=False) if isinstance(value, list) else value
+                for key, value in row.items()
+            })
+        elif fmt == "json":
+            out.write(("\n" if exported == 0 else ",\n") + json.dumps(row, ensure_ascii=False))
+        else:
+            out.write(json.dumps(row, ensure_ascii=False) + "\n")
+        exported += 1
+        if exported % EXPORT_PROGRESS_EVERY == 0 and exported < total:
+            _report(progress, exported, total, f"Exported {exported}/{total} words...")
+    if fmt == "json":
+        out.write("\n]\n")
+
+    _report(progress, total, total, "Export complete.")
+    return {"exported": exported}
@@ -0,0 +1,329 @@
+"""
+Versioned prompts and response formats for the llm_helper tasks.
+
+Each task (difficulty, rank, enrich, distractors) has a template per version:
+- v1: the original prompts, instructions and worked example resent in one user
+  message per call, with the enrichment answer keyed by word and field name.
+- v2: the fixed instructions go in a system message that is identical for
+  every call of a task; the user message carries only the words.
+  Enrichment answers are compact arrays,
+  {"words": [[word, definition, [distractors], [examples]], ...]}, instead
+  of repeating the field names for every word.
+
+`build_messages` picks the version (LLM_PROMPT_VERSION, read on each call so
+a value loaded from .env applies; default v2) and
+`enrichment_payloads` accepts either answer shape, so versions can be
+switched per run and compared on the same words. llm_helper records the
+version with each call's metrics. `token_report` estimates prompt and
+answer sizes for every task and version (see benchmark.py --prompt-tokens);
+the estimates come from CHARS_PER_TOKEN, not a tokenizer.
+"""
+import json
+import os
+
+import distractor_filter
+
+VERSIONS = ("v1", "v2")
+DEFAULT_VERSION = "v2"
+# Rough size of an English/JSON token; only used for relative comparisons.
+CHARS_PER_TOKEN = 4
+
+# Shared by the enrichment prompt and the follow-up distractor request;
+# distractor_rules fills in MIX_DIFFICULTY.
+DISTRACTOR_RULES = """      Each distractor MUST be a definition-style clause with a verb (e.g., "being...", "having...", "marked by...", "characterized by...").
+      Match the definition’s format and length (use a similar lead-in like "Relating to...", within ±2 words).
+      Do NOT output noun-only fragments.
+      MIX_DIFFICULTY
+      Avoid close synonyms or near-misses that could confuse learners.
+      Do NOT use the target word or close variants.
+      Avoid meta labels like category/genre/brand/model/app/software/name/address.
+      EMPHATIC ANTI-PATTERNS (DO NOT DO THESE):
+      - Do NOT output concrete objects or food/drink items (e.g., "sweet fruit aroma", "fizzy soda", "pastry").
+      - Do NOT output scene fragments or physical places (e.g., "quiet forest glade", "busy train station").
+      - Do NOT output single nouns or noun lists without definition-style wording.
+      - Do NOT output generic labels (e.g., "a type of X", "kind of Y", "brand/model/name")."""
+# Replaces the difficulty mix when the rest of a word's distractors come from distractor_pool.
+HARD_DISTRACTOR_RULE = ("Make every one hard-but-wrong and specific to this word "
+                        "(plausible for its context, still clearly not its meaning); generic ones are added separately.")
+MIX_DIFFICULTY_RULE = "Mix difficulty: 5 easy wrong, 7 medium, 3 hard-but-wrong."
+EXAMPLE_DISTRACTORS = [
+    "Relating to seasonal weather patterns and forecasting",
+    "Relating to theatrical performance and stagecraft traditions",
+    "Relating to childhood play and social games",
+    "Relating to culinary technique and slow cooking methods",
+    "Relating to insect behavior and life cycles",
+    "Relating to navigation safety and route planning",
+    "Relating to financial markets and speculative trading",
+    "Relating to marine biology and ecosystem balance",
+    "Relating to architectural design and urban planning",
+    "Relating to religious ceremony and liturgy",
+    "Relating to bird migration and seasonal movement",
+    "Relating to mechanical repair and equipment maintenance",
+    "Relating to medical nutrition and recovery support",
+    "Relating to software updates and release cycles",
+    "Relating to group psychology and social behavior",
+]
+EXAMPLE_SENTENCES = [
+    "By the end of the meeting, her vellumate tone slowed the rush and turned scattered talk into measured decisions.",
+    "He approached the negotiations with a vellumate air, pausing often, preferring certainty over speed.",
+    "After the audit notice arrived, the office adopted a vellumate style, careful and deliberate in every response.",
+    "She chose a vellumate approach to the case, resisting shortcuts and insisting on clear steps.",
+    "His vellumate habits made him the obvious choice for sensitive tasks demanding patience and restraint.",
+]
+EXAMPLE_DEFINITION = "Relating to formal, meticulous work in an official setting."
+
+
+def distractor_rules(count):
+    rule = MIX_DIFFICULTY_RULE if count >= distractor_filter.TARGET_DISTRACTORS else HARD_DISTRACTOR_RULE
+    return DISTRACTOR_RULES.replace("MIX_DIFFICULTY", rule)
+
+
+def _user(prompt):
+    return [{"role": "user", "content": prompt}]
+
+
+def _system_and_user(system, user):
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": user},
+    ]
+
+
+# v1: the original single-message prompts.
+
+def _difficulty_v1(words):
+    return _user(f"""
+    Analyze the following list of words. Assign a difficulty score (1-10) to each, where 1 is very basic (pedestrian) and 10 is extremely obscure.
+
+    Words: {', '.join(words)}
+
+    Return ONLY a JSON object where keys are the words and values are the integer scores.
+    Example: {{"word1": 5, "word2": 2}}
+    """)
+
+
+def _rank_v1(words):
+    return _user(f"""
+    You are a strict lexicographer. I have a list of {len(words)} words.
+    Rank them by frequency of use in modern English and assign them to 5 Tiers.
+
+    Constraints:
+    1. Divide the list into 5 roughly equal groups (Quintiles).
+    2. Tier 1 = Most Useful / Highest Frequency (e.g., 'Nuance', 'Pragmatic').
+    3. Tier 5 = Least Useful / Obscure / Archaic (e.g., 'Crapulent', 'Defenestrate').
+
+    Words: {', '.join(words)}
+
+    Return ONLY a JSON object: {{"word_stem": tier_integer}}
+    """)
+
+
+def _enrich_v1(words, distractor_count):
+    example_distractors = json.dumps(EXAMPLE_DISTRACTORS[:distractor_count], indent=2).replace("\n", "\n        ")
+    example_sentences = json.dumps(EXAMPLE_SENTENCES, indent=2).replace("\n", "\n        ")
+    return _user(f"""
+    For each word, return:
+    - definition: 5-12 words, plain English, no filler.
+    - distractors: {distractor_count} short definition-style phrases (5-12 words), same part of speech.
+{distractor_rules(distractor_count)}
+    - examples: 5 sentences, 12-25 words each, each must include the word (or inflected form).
+      Provide helpful context for someone learning the word; use book-like usage.
+      The context should NOT be a dead giveaway for the definition, and NOT useless for inferring meaning.
+      Avoid bland, generic sentences.
+
+    Words: {', '.join(words)}
+
+    Return ONLY a JSON object where the keys are the words and the values are objects with the following structure.
+    Example response for a fictional word "vellumate":
+    {{
+      "vellumate": {{
+        "definition": "{EXAMPLE_DEFINITION}",
+        "distractors": {example_distractors},
+        "examples": {example_sentences}
+      }}
+    }}
+    {{
+      "word_stem": {{
+        "definition": "Short, punchy definition",
+        "distractors": ["distractor 1", ..., "distractor {distractor_count}"],
+        "examples": ["sentence 1", ..., "sentence 5"]
+      }}
+    }}
+    """)
+
+
+def _follow_up_lines(requests):
+    lines = []
+    for word, request in requests.items():
+        existing = "; ".join(request["existing"]) or "none"
+        lines.append(f'- {word} (need {request["count"]}): definition "{request["definition"]}"; already have: {existing}')
+    return "\n".join(lines)
+
+
+def _distractors_v1(requests):
+    return _user(f"""
+    These words need more multiple-choice distractors (plausible wrong definitions).
+    For each word, write the requested number of NEW distractors.
+{distractor_rules(distractor_filter.TARGET_DISTRACTORS)}
+      Do NOT repeat or paraphrase the definition or the distractors it already has.
+
+    Words:
+{_follow_up_lines(requests)}
+
+    Return ONLY a JSON object where keys are the words and values are lists of distractor strings.
+    Example: {{"word1": ["distractor 1", "distractor 2"]}}
+    """)
+
+
+# v2: fixed system message, words-only user message, compact enrichment answers.
+
+DIFFICULTY_SYSTEM = """Assign each word a difficulty score from 1 (very basic, pedestrian) to 10 (extremely obscure).
+Return ONLY a JSON object mapping each word to its integer score, e.g. {"word1": 5, "word2": 2}."""
+
+RANK_SYSTEM = """You are a strict lexicographer. Rank the given words by frequency of use in modern English and assign them to 5 tiers:
+1. Divide the list into 5 roughly equal groups (quintiles).
+2. Tier 1 = most useful / highest frequency (e.g. 'Nuance', 'Pragmatic').
+3. Tier 5 = least useful / obscure / archaic (e.g. 'Crapulent', 'Defenestrate').
+Return ONLY a JSON object mapping each word to its tier integer."""
+
+ENRICH_SYSTEM = """You write multiple-choice vocabulary quiz material. For each word, write:
+- definition: 5-12 words, plain English, no filler.
+- distractors: {count} short definition-style phrases (5-12 words), same part of speech, each a wrong meaning.
+{rules}
+- examples: 5 sentences, 12-25 words each, each including the word (or an inflected form), in book-like usage.
+  They should help a learner infer the meaning without giving the definition away; no bland, generic sentences.
+
+Return ONLY a JSON object {{"words": [[word, definition, [distractors], [examples]], ...]}} with one array per word, in the order given.
+Shape example for the fictional word "vellumate" (shortened; always write the full counts):
+{example}"""
+
+DISTRACTORS_SYSTEM = """Some quiz words need more multiple-choice distractors (plausible wrong definitions).
+For each word, write the requested number of NEW distractors.
+{rules}
+      Do NOT repeat or paraphrase the definition or the distractors it already has.
+Return ONLY a JSON object mapping each word to a list of distractor strings."""
+
+
+def _difficulty_v2(words):
+    return _system_and_user(DIFFICULTY_SYSTEM, f"Words: {', '.join(words)}")
+
+
+def _rank_v2(words):
+    return _system_and_user(RANK_SYSTEM, f"{len(words)} words: {', '.join(words)}")
+
+
+def _enrich_v2(words, distractor_count):
+    example = json.dumps({"words": [["vellumate", EXAMPLE_DEFINITION, EXAMPLE_DISTRACTORS[:2], EXAMPLE_SENTENCES[:1]]]})
+    system = ENRICH_SYSTEM.format(count=distractor_count, rules=distractor_rules(distractor_count), example=example)
+    return _system_and_user(system, f"Words: {', '.join(words)}")
+
+
+def _distractors_v2(requests):
+    system = DISTRACTORS_SYSTEM.format(rules=distractor_rules(distractor_filter.TARGET_DISTRACTORS))
+    return _system_and_user(system, f"Words:\n{_follow_up_lines(requests)}")
+
+
+TEMPLATES = {
+    "difficulty": {"v1": _difficulty_v1, "v2": _difficulty_v2},
+    "rank": {"v1": _rank_v1, "v2": _rank_v2},
+    "enrich": {"v1": _enrich_v1, "v2": _enrich_v2},
+    "distractors": {"v1": _distractors_v1, "v2": _distractors_v2},
+}
+
+
+def resolve_version(version=None):
+    """
+    `version`, else LLM_PROMPT_VERSION, else DEFAULT_VERSION; raises ValueError for unknown ones.
+    """
+    version = version or os.getenv("LLM_PROMPT_VERSION") or DEFAULT_VERSION
+    if version not in VERSIONS:
+        raise ValueError(f"Unknown prompt version {version!r} (expected one of {', '.join(VERSIONS)})")
+    return version
+
+
+def build_messages(task, *args, version=None):
+    """
+    Chat messages for `task` in prompt `version` (default LLM_PROMPT_VERSION).
+    """
+    return TEMPLATES[task][resolve_version(version)](*args)
+
+
+def enrichment_payloads(result):
+    """
+    Normalizes an enrichment answer to {word: {"definition", "distractors", "examples"}},
+    accepting both the v2 array rows and the v1 per-word objects.
+    """
+    rows = result.get("words") if isinstance(result, dict) else None
+    if not isinstance(rows, list):
+        return result if isinstance(result, dict) else {}
+    payloads = {}
+    for row in rows:
+        if not isinstance(row, list) or len(row) < 2 or not isinstance(row[0], str):
+            continue
+        payloads[row[0]] = {
+            "definition": row[1],
+            "distractors": row[2] if len(row) > 2 else [],
+            "examples": row[3] if len(row) > 3 else [],
+        }
+    return payloads
+
+
+def render_enrichment(payloads, version=None):
+    """
+    The answer a model would send for `payloads` in `version`'s response format.
+    """
+    if resolve_version(version) == "v1":
+        return json.dumps(payloads, ensure_ascii=False)
+    rows = [[word, data["definition"], data["distractors"], data["examples"]] for word, data in payloads.items()]
+    return json.dumps({"words": rows}, ensure_ascii=False)
+
+
+def estimate_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def _message_text(message):
+    content = message["content"]
+    return content if isinstance(content, str) else "".join(part["text"] for part in content)
+
+
+def message_tokens(messages):
+    """
+    (system tokens, user tokens) of a message list, estimated.
+    """
+    system = sum(estimate_tokens(_message_text(message)) for message in messages if message["role"] == "system")
+    user = sum(estimate_tokens(_message_text(message)) for message in messages if message["role"] != "system")
+    return system, user
+
+
+def token_report(words, enrichment, scores, tiers, batch_sizes, versions=VERSIONS):
+    """
+    Estimated tokens per call for every task and version: rows of
+    {"task", "version", "words", "system", "user", "response", "total"}.
+    `enrichment`, `scores` and `tiers` are sample answers for `words`.
+    """
+    # Follow-up requests for words that kept 8 of their distractors.
+    follow_up = {
+        word: {"definition": data["definition"], "existing": data["distractors"][:8],
+               "count": distractor_filter.TARGET_DISTRACTORS - 8}
+        for word, data in enrichment.items()
+    }
+    rows = []
+    for task, size in batch_sizes.items():
+        for version in versions:
+            batch = words[:size]
+            if task == "enrich":
+                messages = build_messages(task, batch, distractor_filter.TARGET_DISTRACTORS, version=version)
+                response = render_enrichment({word: enrichment[word] for word in batch}, version)
+            elif task == "distractors":
+                requests = {word: follow_up[word] for word in batch}
+                messages = build_messages(task, requests, version=version)
+                response = json.dumps({word: enrichment[word]["distractors"][:request["count"]] for word, request in requests.items()})
+            else:
+                messages = build_messages(task, batch, version=version)
+                response = json.dumps({word: (scores if task == "difficulty" else tiers)[word] for word in batch})
+            system, user = message_tokens(messages)
+            answer = estimate_tokens(response)
+            rows.append({"task": task, "version": version, "words": len(batch), "system": system,
+                         "user": user, "response": answer, "total": system + user + answer})
+    return rows
@@ -0,0 +1,208 @@
+"""
+Precomputed quiz option sets for the mobile quiz cards.
+
+For every card, getOptionsForWord runs a `_hasTable` catalog check and an
+unindexed `distractors` lookup that always returns the same first three rows.
+Short words are padded with ORDER BY RANDOM() over the whole words table.
+`quiz_options` holds, per enriched word, up to SETS_PER_WORD sets of
+DISTRACTORS_PER_SET distractors packed as one JSON array
+(`[["...", "...", "..."], ...]`). A card is then a single primary-key lookup;
+the phone adds the definition, shuffles, and rotates through the sets across
+showings.
+
+Each word's distractors are ranked with distractor_filter's checks:
+- ones that break the format rules, read like the definition or nearly
+  duplicate a better-ranked one are dropped (the word's own stored
+  distractors are not held to the length rules, which legacy ones predate),
+- the rest are ordered by `is_plausible`, then word-specific before pool
+  padding, then closeness in form to the definition (TF-IDF similarity).
+Set 0 takes the best three, set 1 the next three, and so on; words with
+fewer distractors reuse them across sets. Words short of distractors are
+padded from distractor_pool with phrases shaped like the definition.
+
+refresh_options is a change-feed consumer: only words
+added, removed, re-defined (db_init.DEFINITION_FEED) or with changed
+distractors since its cursor are rebuilt; status and score writes, which
+update every studied word, do not count.
+"""
+import json
+import random
+
+import db_init
+import distractor_filter
+import distractor_pool
+
+SETS_PER_WORD = 3
+DISTRACTORS_PER_SET = 3
+FEED_CONSUMER = "quiz_options"
+REBUILD_SHARE = 0.2
+BATCH_SIZE = 500
+# format_problem reasons that only drop pool padding, not a word's own distractors.
+LENGTH_PROBLEMS = ("too_short", "too_long", "length_mismatch")
+
+
+def ensure_options(conn):
+    """
+    Creates the option-set table when missing, plus the change feed it is refreshed from.
+    """
+    db_init.ensure_change_feed(conn)
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='quiz_options'")
+    if cursor.fetchone() is not None:
+        return
+    cursor.execute("""
+        CREATE TABLE quiz_options (
+            word_id INTEGER PRIMARY KEY,
+            option_sets TEXT NOT NULL,
+            built_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(word_id) REFERENCES words(id)
+        );
+    """)
+    conn.commit()
+
+
+def _rank(word, definition, candidates, vectors):
+    """
+    Orders (text, plausible, own) candidates best first, dropping rejects.
+    vectors: TF-IDF rows of [definition, *candidates].
+    """
+    similarity = vectors @ vectors.T
+    definition_length = distractor_filter.word_count(definition)
+    order = sorted(
+        range(len(candidates)),
+        key=lambda index: (not candidates[index][1], not candidates[index][2], -similarity[index + 1, 0]),
+    )
+    kept = []
+    for index in order:
+        row = index + 1
+        text, _, own = candidates[index]
+        problem = distractor_filter.format_problem(text, word, definition_length)
+        if problem is not None and not (own and problem in LENGTH_PROBLEMS):
+            continue
+        if similarity[row, 0] >= distractor_filter.DEFINITION_SIMILARITY:
+            continue
+        if kept and similarity[row, kept].max() >= distractor_filter.DUPLICATE_SIMILARITY:
+            continue
+        kept.append(row)
+    return [candidates[row - 1][0] for row in kept]
+
+
+def deal_sets(ranked):
+    """
+    Splits ranked distractors into option sets, best set first. With fewer
+    than SETS_PER_WORD * DISTRACTORS_PER_SET, sets wrap around and share
+    distractors (never within one set); identical sets are dropped.
+    """
+    if not ranked:
+        return []
+    per_set = min(DISTRACTORS_PER_SET, len(ranked))
+    sets = []
+    for set_index in range(SETS_PER_WORD):
+        option_set = [ranked[(set_index * DISTRACTORS_PER_SET + slot) % len(ranked)] for slot in range(per_set)]
+        if not any(set(option_set) == set(existing) for existing in sets):
+            sets.append(option_set)
+    return sets
+
+
+def _build_rows(conn, words, rng):
+    """
+    (word_id, option_sets JSON) for [(word_id, word_stem, definition)], plus
+    the number of words padded from the pool.
+    """
+    word_ids = [word_id for word_id, _, _ in words]
+    placeholders = ", ".join("?" for _ in word_ids)
+    own = {word_id: [] for word_id in word_ids}
+    for word_id, text, plausible in conn.execute(
+        f"SELECT word_id, text, is_plausible FROM distractors WHERE word_id IN ({placeholders}) ORDER BY id", word_ids,
+    ):
+        text = (text or "").strip()
+        if text:
+            own[word_id].append((text, plausible is None or bool(plausible), True))
+
+    needed = SETS_PER_WORD * DISTRACTORS_PER_SET
+    rows = []
+    padded = 0
+    for word_id, word_stem, definition in words:
+        candidates = own[word_id]
+        if len(candidates) < needed:
+            seen = {text for text, _, _ in candidates}
+            extra = distractor_pool.sample_for(
+                conn, definition, (needed - len(candidates)) * distractor_pool.CANDIDATE_FACTOR, word_id, rng,
+            )
+            candidates = candidates + [(text, True, False) for text in extra if text not in seen]
+            padded += 1
+        # IDF from the word's own texts, so a word ranks the same whichever batch it is built in.
+        vectors = distractor_filter.tfidf_matrix([definition, *(text for text, _, _ in candidates)])
+        ranked = _rank(word_stem, definition, candidates, vectors)
+        rows.append((word_id, json.dumps(deal_sets(ranked), ensure_ascii=False, separators=(",", ":"))))
+    return rows, padded
+
+
+def refresh_options(conn, rebuild=False, rng=None, progress=None):
+    """
+    Brings quiz_options up to date: every enriched word on first use (or with
+    `rebuild`, after a feed prune, or above REBUILD_SHARE churn), otherwise
+    only the words changed since the last refresh. Returns {"rebuilt",
+    "changed_words", "built", "padded", "options", "seq"}.
+    """
+    ensure_options(conn)
+    distractor_pool.ensure_pool(conn)
+    rng = rng or random.Random()
+    seq = db_init.change_feed_seq(conn)
+    since = db_init.consumer_cursor(conn, FEED_CONSUMER)
+    changes = None if rebuild or since is None else db_init.read_changes(conn, since, tables=("words", db_init.DEFINITION_FEED, "distractors"))
+    word_ids = None if changes is None else sorted({
+        word_id for _, table, _, op, word_id in changes
+        if word_id is not None and not (table == "words" and op == "U")
+    })
+    total = conn.execute("SELECT COUNT(*) FROM quiz_options").fetchone()[0]
+    rebuilt = word_ids is None or len(word_ids) > max(total * REBUILD_SHARE, BATCH_SIZE)
+
+    enriched = "SELECT id, word_stem, definition FROM words WHERE definition IS NOT NULL AND TRIM(definition) != ''"
+    if rebuilt:
+        rows = conn.execute(f"{enriched} ORDER BY id").fetchall()
+    else:
+        rows = []
+        for start in range(0, len(word_ids), BATCH_SIZE):
+            chunk = word_ids[start:start + BATCH_SIZE]
+            rows.extend(conn.execute(f"{enriched} AND id IN ({', '.join('?' for _ in chunk)})", chunk).fetchall())
+    batches = [rows[start:start + BATCH_SIZE] for start in range(0, len(rows), BATCH_SIZE)]
+
+    built = padded = 0
+    # One transaction, so an interrupted rebuild leaves the previous table in place.
+    with conn:
+        if rebuilt:
+            conn.execute("DELETE FROM quiz_options")
+        else:
+            for start in range(0, len(word_ids), BATCH_SIZE):
+                chunk = word_ids[start:start + BATCH_SIZE]
+                conn.execute(f"DELETE FROM quiz_options WHERE word_id IN ({', '.join('?' for _ in chunk)})", chunk)
+        for index, batch in enumerate(batches):
+            if progress is not None:
+                progress(index, len(batches), f"Building option sets for {len(batch)} words...")
+            options, batch_padded = _build_rows(conn, batch, rng)
+            conn.executemany("INSERT INTO quiz_options (word_id, option_sets) VALUES (?, ?)", options)
+            built += len(options)
+            padded += batch_padded
+    db_init.acknowledge_changes(conn, FEED_CONSUMER, seq)
+    if progress is not None:
+        progress(len(batches), len(batches), "Quiz options up to date.")
+    return {
+        "rebuilt": rebuilt,
+        "changed_words": None if rebuilt else len(word_ids),
+        "built": built,
+        "padded": padded,
+        "options": conn.execute("SELECT COUNT(*) FROM quiz_options").fetchone()[0],
+        "seq": seq,
+    }
+
+
+def options_for_word(conn, word_id, shown=0):
+    """
+    The option set a card shows the `shown`-th time (the phone's single lookup), or [].
+    """
+    row = conn.execute("SELECT option_sets FROM quiz_options WHERE word_id = ?", (word_id,)).fetchone()
+    if row is None:
+        return []
+    sets = json.loads(row[0])
+    return sets[shown % len(sets)] if sets else []
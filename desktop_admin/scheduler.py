@@ -0,0 +1,201 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+import log_archive
+
+# Base Leitner intervals (days) used by the mobile recordAnswer.
+REVIEW_INTERVALS = {
+    "Proficient": 1,
+    "Adept": 3,
+    "Mastered": 14,
+}
+# Learning words are always eligible on the phone and carry no review date.
+UNSCHEDULED_STATUSES = ("Learning",)
+
+DEFAULT_MAX_REVIEWS_PER_DAY = 40
+# Each correct answer in the current status stretches the interval by 25%.
+STREAK_BONUS = 0.25
+MAX_INTERVAL_DAYS = 180
+
+
+def load_schedule_frame(conn):
+    """
+    Loads every Learning/review word with its study_log history in one query
+    (through study_log_word_totals, so compacted history still counts).
+    Returns a DataFrame with one row per word.
+    """
+    log_archive.ensure_log_views(conn)
+    statuses = list(UNSCHEDULED_STATUSES) + list(REVIEW_INTERVALS)
+    placeholders = ", ".join("?" for _ in statuses)
+    query = f"""
+        SELECT
+            w.id,
+            w.status,
+            w.priority_tier,
+            w.bucket_date,
+            w.next_review_date,
+            COALESCE(w.status_correct_streak, 0) AS streak,
+            COALESCE(t.attempts, 0) AS attempts,
+            COALESCE(t.correct, 0) AS correct,
+            t.last_studied
+        FROM words w
+        LEFT JOIN study_log_word_totals t ON t.word_id = w.id
+        WHERE w.status IN ({placeholders})
+    """
+    return pd.read_sql_query(query, conn, params=statuses)
+
+
+def date_offsets(values, today):
+    """
+    Converts date/datetime strings to whole days relative to today (NaN if missing).
+    """
+    parsed = pd.to_datetime(pd.Series(values, dtype="object"), errors="coerce", format="mixed")
+    days = (parsed.dt.normalize() - pd.Timestamp(today)).dt.days
+    return days.to_numpy(dtype="float64", na_value=np.nan)
+
+
+def compute_due_offsets(frame, today):
+    """
+    Vectorized interval calculation.
+    Returns an array of ideal due days relative to today (negative = overdue),
+    NaN for words that should not carry a review date.
+    """
+    base = frame["status"].map(REVIEW_INTERVALS).to_numpy(dtype="float64", na_value=np.nan)
+
+    streak = frame["streak"].to_numpy(dtype="float64")
+    attempts = frame["attempts"].to_numpy(dtype="float64")
+    correct = frame["correct"].to_numpy(dtype="float64")
+    # Laplace-smoothed accuracy keeps words without history at a neutral 1.0 ease.
+    ease = 0.5 + (correct + 1.0) / (attempts + 2.0)
+    interval = np.clip(np.rint(base * (1.0 + STREAK_BONUS * streak) * ease), 1, MAX_INTERVAL_DAYS)
+
+    # Anchor on the most recent activity: the last answer or the last status change.
+    studied = date_offsets(frame["last_studied"], today)
+    bucketed = date_offsets(frame["bucket_date"], today)
+    anchor = np.fmax(studied, bucketed)
+    anchor = np.where(np.isnan(anchor), 0.0, np.minimum(anchor, 0.0))
+
+    return anchor + interval
+
+
+def level_load(due_offsets, order_keys, max_per_day):
+    """
+    Assigns each due offset to the earliest day >= max(due, 0) that still has
+    capacity, serving words in order_keys order within a day.
+    Returns an integer array of assigned day offsets aligned with due_offsets.
+    """
+    count = len(due_offsets)
+    if count == 0:
+        return np.zeros(0, dtype=np.int64)
+    cap = max(int(max_per_day), 1)
+
+    arrival = np.maximum(due_offsets, 0).astype(np.int64)
+    order = np.lexsort(tuple(reversed(order_keys)) + (arrival,)) if order_keys else np.argsort(arrival, kind="stable")
+
+    horizon = int(arrival.max()) + count // cap + 2
+    arrivals_per_day = np.bincount(arrival, minlength=horizon)
+    cumulative_arrivals = np.cumsum(arrivals_per_day)
+
+    # Served-by-day curve of a FIFO queue with fixed daily capacity:
+    # S[t] = min(A[t], min_{s<=t}(A[s-1] - cap*s) + cap*(t+1))
+    days = np.arange(horizon)
+    shifted = np.concatenate(([0], cumulative_arrivals[:-1]))
+    backlog_floor = np.minimum.accumulate(shifted - cap * days)
+    served = np.minimum(cumulative_arrivals, backlog_floor + cap * (days + 1))
+
+    assigned = np.empty(count, dtype=np.int64)
+    assigned[order] = np.searchsorted(served, np.arange(count), side="right")
+    return assigned
+
+
+def plan_schedule(frame, today=None, max_per_day=DEFAULT_MAX_REVIEWS_PER_DAY):
+    """
+    Computes the new next_review_date for every row of a schedule frame.
+    Returns a DataFrame with id and next_review_date (ISO date or None).
+    """
+    today = today or datetime.date.today()
+    plan = pd.DataFrame({"id": frame["id"].to_numpy(), "next_review_date": None}, dtype="object")
+    if frame.empty:
+        return plan
+
+    due = compute_due_offsets(frame, today)
+    scheduled = ~np.isnan(due)
+    if scheduled.any():
+        due_scheduled = due[scheduled]
+        attempts = frame["attempts"].to_numpy(dtype="float64")[scheduled]
+        correct = frame["correct"].to_numpy(dtype="float64")[scheduled]
+        tier = pd.to_numeric(frame["priority_tier"], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)[scheduled]
+        # Within a day: most overdue first, then weakest recall, then highest priority tier.
+        order_keys = (
+            due_scheduled,
+            (correct + 1.0) / (attempts + 2.0),
+            np.nan_to_num(tier, nan=3.0),
+        )
+        assigned = level_load(due_scheduled, order_keys, max_per_day)
+        dates = pd.Timestamp(today) + pd.to_timedelta(assigned, unit="D")
+        plan.loc[scheduled, "next_review_date"] = dates.strftime("%Y-%m-%d").to_numpy()
+
+    return plan
+
+
+def apply_schedule(conn, plan, frame=None):
+    """
+    Writes changed next_review_date values back in a single transaction.
+    Returns the number of rows updated.
+    """
+    if plan.empty:
+        return 0
+
+    if frame is not None:
+        current = frame.set_index("id")["next_review_date"].reindex(plan["id"])
+        current = current.astype("object").fillna("").to_numpy()
+        changed = plan[plan["next_review_date"].fillna("").to_numpy() != current]
+    else:
+        changed = plan
+    if changed.empty:
+        return 0
+
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(words)")
+    has_updated_at = "updated_at" in {row[1] for row in cursor.fetchall()}
+    rows = list(zip(changed["next_review_date"].tolist(), changed["id"].astype(int).tolist()))
+
+    with conn:
+        if has_updated_at:
+            # Bump updated_at so the mobile sync picks up the new schedule.
+            now = datetime.datetime.now().isoformat()
+            cursor.executemany(
+                "UPDATE words SET next_review_date = ?, updated_at = ? WHERE id = ?",
+                [(due, now, word_id) for due, word_id in rows],
+            )
+        else:
+            cursor.executemany("UPDATE words SET next_review_date = ? WHERE id = ?", rows)
+    return len(rows)
+
+
+def summarize_plan(plan):
+    """
+    Returns a {date: review_count} mapping for the scheduled rows of a plan.
+    """
+    dates = plan["next_review_date"].dropna()
+    return dates.value_counts().sort_index().to_dict()
+
+
+def reschedule_reviews(conn, today=None, max_per_day=DEFAULT_MAX_REVIEWS_PER_DAY):
+    """
+    Recomputes next_review_date for the whole words table and levels the load.
+    Returns a dictionary with the number of words scheduled/updated and the
+    busiest day after leveling.
+    """
+    frame = load_schedule_frame(conn)
+    plan = plan_schedule(frame, today=today, max_per_day=max_per_day)
+    updated = apply_schedule(conn, plan, frame)
+    per_day = summarize_plan(plan)
+    return {
+        "scheduled": int(plan["next_review_date"].notna().sum()),
+        "updated": updated,
+        "days": len(per_day),
+        "busiest_day": max(per_day.values()) if per_day else 0,
+    }
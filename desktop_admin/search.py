@@ -0,0 +1,99 @@
+"""
+Ranked full-text search over the words_fts index maintained by db_init.
+
+Free text is turned into an FTS5 query where every term must match and the
+last term (two characters or more) is a prefix, so results narrow as the user types. When the index
+is missing (SQLite without FTS5) a plain LIKE scan over words is used instead.
+"""
+import re
+
+import pandas as pd
+
+import db_init
+
+DEFAULT_LIMIT = 50
+SNIPPET_TOKENS = 12
+HIGHLIGHT = ("«", "»")
+RESULT_COLUMNS = ["id", "word_stem", "status", "matched_in", "snippet", "score"]
+
+
+def build_match_query(text):
+    """
+    Converts free text to an FTS5 MATCH expression ("" when there is nothing to search).
+    """
+    terms = re.findall(r"\w+", text or "")
+    if not terms:
+        return ""
+    quoted = [f'"{term}"' for term in terms]
+    # Single characters are too unselective to expand (the prefix index starts at 2).
+    if len(terms[-1]) >= 2:
+        quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def has_search_index(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (db_init.SEARCH_TABLE,))
+    return cursor.fetchone() is not None
+
+
+def _matched_in_sql():
+    # First column (in SEARCH_COLUMNS order) with a highlighted term.
+    table = db_init.SEARCH_TABLE
+    cases = " ".join(
+        f"WHEN instr(highlight({table}, {index}, char(1), ''), char(1)) > 0 THEN '{column}'"
+        for index, column in enumerate(db_init.SEARCH_COLUMNS)
+    )
+    return f"CASE {cases} ELSE '' END"
+
+
+def _like_search(conn, text, limit):
+    pattern = f"%{text.strip()}%"
+    df = pd.read_sql_query(
+        """
+            SELECT id, word_stem, status, definition AS snippet
+            FROM words
+            WHERE word_stem LIKE ? OR definition LIKE ? OR original_context LIKE ?
+            ORDER BY word_stem LIKE ? DESC, word_stem
+            LIMIT ?
+        """,
+        conn,
+        params=[pattern, pattern, pattern, pattern, limit],
+    )
+    df["matched_in"] = ""
+    df["score"] = 0.0
+    return df.reindex(columns=RESULT_COLUMNS)
+
+
+def search_words(conn, text, limit=DEFAULT_LIMIT):
+    """
+    Returns up to `limit` matching words, best first, as a DataFrame with
+    id, word_stem, status, matched_in (best matching column), snippet and score
+    (bm25, lower is better).
+    """
+    query = build_match_query(text)
+    if not query:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+    if not has_search_index(conn):
+        return _like_search(conn, text, limit)
+
+    open_mark, close_mark = HIGHLIGHT
+    # Rank and cut inside the FTS query so only `limit` rows are joined and snippeted.
+    df = pd.read_sql_query(
+        f"""
+            SELECT w.id, w.word_stem, w.status, hits.matched_in, hits.snippet, hits.score
+            FROM (
+                SELECT rowid, rank AS score, {_matched_in_sql()} AS matched_in,
+                       snippet({db_init.SEARCH_TABLE}, -1, ?, ?, '…', ?) AS snippet
+                FROM {db_init.SEARCH_TABLE}
+                WHERE {db_init.SEARCH_TABLE} MATCH ?
+                ORDER BY rank
+                LIMIT ?
+            ) hits
+            JOIN words w ON w.id = hits.rowid
+            ORDER BY hits.score
+        """,
+        conn,
+        params=[open_mark, close_mark, SNIPPET_TOKENS, query, limit],
+    )
+    return df.reindex(columns=RESULT_COLUMNS)
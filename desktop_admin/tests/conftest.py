@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The admin modules use flat imports (import db_init), as under `streamlit run app.py`.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,94 @@
+import datetime
+import sqlite3
+
+import pytest
+
+import corpus_generator
+import db_init
+import log_archive
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    db_init.create_tables(conn)
+    if not db_init.ensure_search_index(conn):
+        pytest.skip("SQLite built without FTS5")
+    yield conn
+    conn.close()
+
+
+def _search_triggers(conn):
+    names = ", ".join("?" for _ in db_init.SEARCH_TRIGGERS)
+    rows = conn.execute(f"SELECT name FROM sqlite_master WHERE type = 'trigger' AND name IN ({names})", list(db_init.SEARCH_TRIGGERS))
+    return {row[0] for row in rows}
+
+
+def test_deferred_search_sync_keeps_triggers_when_the_block_raises(conn):
+    with pytest.raises(RuntimeError):
+        with conn, db_init.deferred_search_sync(conn, []):
+            conn.execute("INSERT INTO words (word_stem) VALUES ('lost')")
+            raise RuntimeError("import failed")
+
+    assert _search_triggers(conn) == set(db_init.SEARCH_TRIGGERS)
+    assert conn.execute("SELECT COUNT(*) FROM words").fetchone()[0] == 0
+    conn.execute("INSERT INTO words (word_stem, definition) VALUES ('later', 'Afterwards.')")
+    conn.commit()
+    assert conn.execute(f"SELECT COUNT(*) FROM {db_init.SEARCH_TABLE} WHERE {db_init.SEARCH_TABLE} MATCH 'later'").fetchone()[0] == 1
+
+
+def test_deferred_search_sync_resyncs_the_given_words(conn):
+    word_ids = []
+    with conn, db_init.deferred_search_sync(conn, word_ids):
+        cursor = conn.execute("INSERT INTO words (word_stem, definition) VALUES ('quiet', 'Making little noise.')")
+        word_ids.append(cursor.lastrowid)
+        assert not _search_triggers(conn)
+
+    assert _search_triggers(conn) == set(db_init.SEARCH_TRIGGERS)
+    assert conn.execute(f"SELECT rowid FROM {db_init.SEARCH_TABLE} WHERE {db_init.SEARCH_TABLE} MATCH 'noise'").fetchall() == [(word_ids[0],)]
+
+
+def test_acknowledge_changes_prunes_what_every_consumer_has_seen(conn):
+    db_init.ensure_change_feed(conn)
+    conn.executemany("INSERT INTO words (word_stem) VALUES (?)", [("first",), ("second",), ("third",)])
+    conn.commit()
+    first_seq, latest = 1, db_init.change_feed_seq(conn)
+
+    assert db_init.acknowledge_changes(conn, "options", first_seq) == first_seq
+    assert db_init.acknowledge_changes(conn, "deck", latest) == 0
+    conn.execute("INSERT INTO words (word_stem) VALUES ('fourth')")
+    conn.commit()
+    assert db_init.acknowledge_changes(conn, "deck", db_init.change_feed_seq(conn)) == 0
+    assert [row[0] for row in db_init.read_changes(conn, since=first_seq)] == [2, 3, 4]
+    assert db_init.read_changes(conn, since=0) is None
+
+
+def test_stale_consumer_does_not_keep_the_feed_growing(conn, monkeypatch):
+    monkeypatch.setattr(db_init, "CHANGE_FEED_KEEP", 2)
+    db_init.ensure_change_feed(conn)
+    conn.execute("INSERT INTO words (word_stem) VALUES ('first')")
+    conn.commit()
+    db_init.acknowledge_changes(conn, "stale", db_init.change_feed_seq(conn))
+    conn.executemany("INSERT INTO words (word_stem) VALUES (?)", [("second",), ("third",), ("fourth",), ("fifth",)])
+    conn.commit()
+
+    db_init.ensure_change_feed(conn)
+
+    assert conn.execute(f"SELECT COUNT(*) FROM {db_init.CHANGE_FEED_TABLE}").fetchone()[0] == 2
+    assert db_init.read_changes(conn, since=db_init.consumer_cursor(conn, "stale")) is None
+
+
+def test_compaction_writes_no_change_feed_entries(tmp_path):
+    path = str(tmp_path / "vocab_master.db")
+    corpus_generator.generate_master_db(path, words=100, history_days=60, answers_per_day=10)
+    conn = sqlite3.connect(path)
+    db_init.ensure_change_feed(conn)
+    seq = db_init.change_feed_seq(conn)
+
+    compacted = log_archive.compact_logs(conn, str(tmp_path / "archive.db"), horizon_days=30, today=datetime.date(2026, 1, 1))
+
+    assert compacted["study_log"] > 0
+    assert db_init.change_feed_seq(conn) == seq
+    triggers = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name = 'study_log_feed_delete'")}
+    conn.close()
+    assert triggers == {"study_log_feed_delete"}
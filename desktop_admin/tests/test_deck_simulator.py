@@ -0,0 +1,52 @@
+import sqlite3
+
+import pytest
+
+import db_init
+import deck_simulator
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "vocab_master.db")
+    conn = sqlite3.connect(path)
+    db_init.create_tables(conn)
+    conn.executemany(
+        "INSERT INTO words (word_stem, status, difficulty_score) VALUES (?, ?, ?)",
+        [(f"word{index}", status, 5) for index, status in enumerate(["New"] * 20 + ["Learning"] * 5 + ["Proficient"] * 5)],
+    )
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_run_simulation_on_an_uncompacted_db(db_path):
+    daily, summary = deck_simulator.run_simulation(db_path, days=5, seed=1)
+
+    assert len(daily) == 5
+    assert summary["days"] == 5
+    conn = sqlite3.connect(db_path)
+    views = conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name LIKE '%_daily%'").fetchone()[0]
+    conn.close()
+    assert views == 0
+
+
+def test_run_simulation_counts_study_log_history(db_path):
+    conn = sqlite3.connect(db_path)
+    learning = [row[0] for row in conn.execute("SELECT id FROM words WHERE status = 'Learning' ORDER BY id")]
+    conn.executemany(
+        "INSERT INTO study_log (word_id, result, timestamp) VALUES (?, ?, ?)",
+        [(word_id, result, "2026-01-0%d 09:00" % day) for word_id in learning for day, result in ((1, "Correct"), (2, "Incorrect"))],
+    )
+    conn.commit()
+    conn.close()
+
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    state = deck_simulator.load_word_state(conn, seed=1)
+    conn.close()
+    assert int(state["attempts"].sum()) == 2 * len(learning)
+
+    daily, summary = deck_simulator.run_simulation(db_path, days=10, seed=1)
+    assert len(daily) == 10
+    assert summary["sessions"] > 0
+    assert 0 <= summary["accuracy"] <= 1
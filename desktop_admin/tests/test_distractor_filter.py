@@ -0,0 +1,26 @@
+import pytest
+
+import distractor_filter
+
+
+@pytest.mark.parametrize("word, text", [
+    ("indite", "To act as a single individual in public."),
+    ("assent", "To assess the value of property."),
+    ("refute", "A refuge for travelling birds."),
+    ("contend", "Being content with very little."),
+])
+def test_unrelated_words_sharing_a_prefix_are_not_mentions(word, text):
+    assert not distractor_filter.mentions_word(text, word)
+    assert distractor_filter.format_problem(text, word, 6) is None
+
+
+@pytest.mark.parametrize("word, text", [
+    ("study", "What she studies every night."),
+    ("study", "Having studied the matter closely."),
+    ("stop", "Having stopped short of the goal."),
+    ("write", "The act of writing long letters."),
+    ("gentle", "Moving gently across the room."),
+    ("Run", "Runs before the others arrive."),
+])
+def test_inflected_forms_are_mentions(word, text):
+    assert distractor_filter.mentions_word(text, word)
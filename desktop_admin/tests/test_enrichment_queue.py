@@ -0,0 +1,69 @@
+import sqlite3
+
+import pytest
+
+import db_init
+import enrichment_queue
+import pipelines
+
+STEMS = ["arcane", "brusque", "cogent", "dour", "ebullient"]
+
+
+class FakeLLM:
+    """
+    Enriches every word it is sent and reports no usage, so runs charge
+    enrichment_queue's per-word estimate.
+    """
+    def __init__(self):
+        self.sent = []
+
+    def enrich_words(self, words, distractor_count=None):
+        self.sent.extend(words)
+        return {
+            word: {"definition": f"Meaning of {word}.", "distractors": ["Not it at all."], "examples": [f"A {word} example."]}
+            for word in words
+        }
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    db_init.create_tables(conn)
+    conn.executemany(
+        "INSERT INTO words (word_stem, status, priority_tier) VALUES (?, 'New', ?)",
+        [(stem, tier) for tier, stem in enumerate(STEMS, start=1)],
+    )
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def test_affordable_words_follows_the_tighter_cap():
+    budget = enrichment_queue.Budget(max_tokens=5000, max_usd=0.01, usd_per_million_tokens=3.0)
+    assert budget.affordable_words(1000) == 3
+
+    budget.spend(3000)
+    assert budget.affordable_words(1000) == 0
+    assert enrichment_queue.Budget().affordable_words(1000) is None
+
+
+def test_budget_stops_the_run_and_leaves_the_rest_queued(conn):
+    llm = FakeLLM()
+    max_tokens = 2 * enrichment_queue.ESTIMATED_TOKENS_PER_WORD
+
+    summary = pipelines.run_enrichment(conn, "New", llm=llm, batch_size=1, max_tokens=max_tokens)
+
+    assert llm.sent == STEMS[:2]
+    assert summary["stopped_by_budget"]
+    assert (summary["enriched"], summary["remaining"]) == (2, 3)
+    queued = {row[0] for row in conn.execute("SELECT w.word_stem FROM enrichment_queue q JOIN words w ON w.id = q.word_id")}
+    assert queued == set(STEMS[2:])
+    run = conn.execute("SELECT words, tokens, stopped_by_budget FROM enrichment_runs").fetchone()
+    assert run == (2, max_tokens, 1)
+
+    llm = FakeLLM()
+    summary = pipelines.run_enrichment(conn, "New", llm=llm, batch_size=1)
+
+    assert llm.sent == STEMS[2:]
+    assert not summary["stopped_by_budget"]
+    assert summary["remaining"] == 0
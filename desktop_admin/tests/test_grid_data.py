@@ -0,0 +1,38 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import db_init
+import grid_data
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    db_init.create_tables(conn)
+    conn.executemany(
+        "INSERT INTO words (word_stem, book_title) VALUES (?, ?)",
+        [("laconic", "Dune"), ("verdant", "Dune"), ("torpid", "Emma")],
+    )
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def test_new_book_title_survives_the_grid_round_trip(conn):
+    df = grid_data.load_data(conn)
+    assert isinstance(df["book_title"].dtype, pd.CategoricalDtype)
+
+    grid_df = grid_data.grid_frame(df)
+    edited = grid_df.copy()
+    edited.loc[edited["word_stem"] == "torpid", "book_title"] = "Middlemarch"
+    # AgGrid's AS_INPUT mode casts the returned rows back to the input dtypes.
+    returned = edited.astype(grid_df.dtypes.to_dict()).to_dict(orient="records")
+
+    changes = grid_data.find_changes(df, returned)
+    assert changes == [{"book_title": "Middlemarch", "id": 3}]
+
+    grid_data.save_changes_from_records(conn, changes)
+    reloaded = grid_data.load_data(conn)
+    assert "Middlemarch" in reloaded["book_title"].cat.categories
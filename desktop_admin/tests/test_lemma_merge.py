@@ -0,0 +1,76 @@
+import sqlite3
+
+import pytest
+
+import db_init
+import lemma_merge
+
+WORDS_WITH_LOOKALIKES = [
+    ("sober", "sob"), ("flower", "flow"), ("tower", "tow"), ("singer", "sing"), ("ruler", "rule"),
+    ("writer", "write"), ("later", "late"), ("meeting", "meet"), ("building", "build"),
+    ("goods", "good"), ("Polish", "polish"),
+]
+# -ed/-es forms whose bare stem is another word.
+BARE_STEM_LOOKALIKES = [("scared", "scar"), ("hated", "hat"), ("planes", "plan"), ("cares", "car"), ("hoped", "hop")]
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    db_init.create_tables(conn)
+    yield conn
+    conn.close()
+
+
+def _add(conn, stems):
+    conn.executemany("INSERT INTO words (word_stem) VALUES (?)", [(stem,) for stem in stems])
+    conn.commit()
+    return [row[0] for row in conn.execute(f"SELECT id FROM words WHERE word_stem IN ({', '.join('?' for _ in stems)})", stems)]
+
+
+def _stems(conn):
+    return {row[0] for row in conn.execute("SELECT word_stem FROM words")}
+
+
+def test_automatic_merge_keeps_words_that_only_look_inflected(conn):
+    stems = [stem for pair in WORDS_WITH_LOOKALIKES for stem in pair]
+    _add(conn, stems)
+
+    assert lemma_merge.merge_duplicates(conn)["merged"] == 0
+    assert _stems(conn) == set(stems)
+
+    proposed = {variant["word_stem"] for cluster in lemma_merge.find_duplicates(conn, lemma_merge.PROPOSAL_KINDS) for variant in cluster["variants"]}
+    assert proposed >= {"sober", "flower", "meeting", "goods"}
+
+
+def test_import_scope_only_merges_new_words_with_their_base_in_the_lookups(conn):
+    _add(conn, ["study", "carry", "hurry"])
+    new_ids = _add(conn, ["studies", "carried", "worried"])
+    lookups = ["studies", "study", "carried", "worried"]
+
+    summary = lemma_merge.merge_duplicates(conn, stems=lookups, word_ids=new_ids)
+
+    assert summary["merged"] == 1
+    assert _stems(conn) == {"study", "carry", "hurry", "carried", "worried"}
+
+
+def test_ed_and_es_forms_prefer_the_base_ending_in_e(conn):
+    _add(conn, ["hoped", "hope", "scared", "scare", "planes", "plane"])
+
+    assert lemma_merge.merge_duplicates(conn)["merged"] == 3
+    assert _stems(conn) == {"hope", "scare", "plane"}
+
+
+def test_ed_and_es_forms_with_a_bare_stem_base_are_only_proposed(conn):
+    stems = [stem for pair in BARE_STEM_LOOKALIKES for stem in pair] + ["care"]
+    _add(conn, stems)
+
+    assert lemma_merge.merge_duplicates(conn)["merged"] == 0
+    assert _stems(conn) == set(stems)
+    proposals = {
+        variant["word_stem"]: cluster["survivor"]["word_stem"]
+        for cluster in lemma_merge.find_duplicates(conn, lemma_merge.PROPOSAL_KINDS)
+        for variant in cluster["variants"]
+    }
+    assert proposals["cares"] == "care"
+    assert proposals["scared"] == "scar"
@@ -0,0 +1,86 @@
+import datetime
+import sqlite3
+
+import pytest
+
+import corpus_generator
+import db_init
+import log_archive
+import mobile_copy
+
+# What the phone reads from the raw logs (db_helper.dart / sync_service.dart).
+PHONE_TOTALS = {
+    "study_log": "SELECT COUNT(*), SUM(result = 'Correct') FROM study_log",
+    "status_log": "SELECT COUNT(*), COUNT(DISTINCT word_id) FROM status_log",
+    "score_log": "SELECT COUNT(*), SUM(points) FROM score_log",
+}
+
+
+def _totals(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {table: conn.execute(query).fetchone() for table, query in PHONE_TOTALS.items()}
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "vocab_master.db")
+    corpus_generator.generate_master_db(path, words=300, history_days=120, answers_per_day=10)
+    return path
+
+
+def test_mobile_copy_restores_compacted_logs(db_path, tmp_path):
+    before = _totals(db_path)
+    conn = sqlite3.connect(db_path)
+    archive = log_archive.default_archive_path(db_path)
+    compacted = log_archive.compact_logs(conn, archive, horizon_days=30, today=datetime.date(2026, 1, 1))
+    assert compacted["study_log"] > 0
+    assert _totals(db_path) != before
+
+    summary = mobile_copy.write_mobile_copy(conn, str(tmp_path / "phone.db"))
+    conn.close()
+
+    assert summary["restored"]["study_log"] == compacted["study_log"]
+    assert _totals(summary["path"]) == before
+    phone = sqlite3.connect(summary["path"])
+    assert phone.execute("SELECT COUNT(*) FROM study_log_daily").fetchone()[0] == 0
+    phone.close()
+
+
+def test_mobile_copy_refuses_compacted_db_without_archive(db_path, tmp_path):
+    conn = sqlite3.connect(db_path)
+    log_archive.compact_logs(conn, str(tmp_path / "elsewhere.db"), horizon_days=30, today=datetime.date(2026, 1, 1))
+
+    with pytest.raises(FileNotFoundError):
+        mobile_copy.write_mobile_copy(conn, str(tmp_path / "phone.db"))
+    conn.close()
+
+
+def test_mobile_copy_has_no_change_feed(db_path, tmp_path):
+    conn = sqlite3.connect(db_path)
+    db_init.ensure_change_feed(conn)
+    summary = mobile_copy.write_mobile_copy(conn, str(tmp_path / "phone.db"))
+    conn.close()
+
+    phone = sqlite3.connect(summary["path"])
+    names = {row[0] for row in phone.execute("SELECT name FROM sqlite_master WHERE name LIKE '%feed%'")}
+    phone.execute("INSERT INTO study_log (word_id, result) VALUES (1, 'Correct')")
+    phone.close()
+    assert names == set()
+    assert "change_feed" in summary["removed"]
+
+
+def test_mobile_copy_leaves_out_retired_caches(db_path, tmp_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE deck_candidates (word_id INTEGER PRIMARY KEY, status TEXT NOT NULL)")
+    conn.commit()
+    summary = mobile_copy.write_mobile_copy(conn, str(tmp_path / "phone.db"))
+    conn.close()
+
+    phone = sqlite3.connect(summary["path"])
+    tables = {row[0] for row in phone.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    phone.close()
+    assert "deck_candidates" not in tables
+    assert "words" in tables
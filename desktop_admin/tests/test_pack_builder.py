@@ -0,0 +1,53 @@
+import os
+import re
+import shutil
+import sqlite3
+
+import pytest
+
+import db_init
+import pack_builder
+
+MOBILE_APP = os.path.join(os.path.dirname(pack_builder.DEFAULT_OUTPUT_DIR), "..")
+
+
+def _declared_assets():
+    """
+    The asset paths listed under flutter: assets: in pubspec.yaml.
+    """
+    with open(os.path.join(MOBILE_APP, "pubspec.yaml"), encoding="utf-8") as handle:
+        return set(re.findall(r"^\s+- (assets/\S+)$", handle.read(), re.MULTILINE))
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    db_init.create_tables(conn)
+    conn.executemany(
+        "INSERT INTO words (word_stem, definition, priority_tier, difficulty_score) VALUES (?, ?, ?, ?)",
+        [(f"word{level}{index}", f"Meaning {index} of level {level}.", level, level * 2) for level in pack_builder.LEVELS for index in range(3)],
+    )
+    conn.execute(
+        "INSERT INTO distractors (word_id, text) SELECT w.id, 'Wrong answer ' || n.value || '.' "
+        "FROM words w, (SELECT 1 AS value UNION ALL SELECT 2 UNION ALL SELECT 3) n"
+    )
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def test_built_packs_land_in_the_declared_asset_directories(conn, tmp_path):
+    output_dir = tmp_path / "word_packs"
+    output_dir.mkdir()
+    shutil.copy(os.path.join(pack_builder.DEFAULT_OUTPUT_DIR, pack_builder.MANIFEST_NAME), output_dir)
+
+    summary = pack_builder.build_packs(conn, output_dir=str(output_dir), words_per_pack=2)
+
+    declared = _declared_assets()
+    assert f"assets/word_packs/{summary['manifest']}" in declared
+    generated = [pack for pack in pack_builder.load_manifest(str(output_dir))["packs"] if pack.get("generated")]
+    assert {pack["difficulty_level"] for pack in generated} == set(pack_builder.LEVELS)
+    for pack in generated:
+        # word_pack_service loads 'assets/word_packs/<asset_path>'.
+        assert f"assets/word_packs/{os.path.dirname(pack['asset_path'])}/" in declared
+        assert (output_dir / pack["asset_path"]).is_file()
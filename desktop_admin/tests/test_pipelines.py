@@ -0,0 +1,60 @@
+import sqlite3
+
+import pytest
+
+import create_dummy_kindle_db
+import db_init
+import pipelines
+import search
+
+
+def _dummy_kindle_db(directory, monkeypatch):
+    directory.mkdir()
+    monkeypatch.chdir(directory)
+    create_dummy_kindle_db.create_dummy_kindle_db()
+    return str(directory / create_dummy_kindle_db.DB_NAME)
+
+
+@pytest.fixture
+def kindle_paths(tmp_path, monkeypatch):
+    first = _dummy_kindle_db(tmp_path / "paperwhite", monkeypatch)
+    second = _dummy_kindle_db(tmp_path / "oasis", monkeypatch)
+    k_conn = sqlite3.connect(second)
+    k_conn.executemany("INSERT INTO WORDS (id, stem, word, lang) VALUES (?, ?, ?, 'en')", [("w5", "hoped", "hoped"), ("w6", "hope", "hope")])
+    k_conn.executemany(
+        "INSERT INTO LOOKUPS (id, word_key, book_key, usage, timestamp) VALUES (?, ?, 'b2', ?, ?)",
+        [("l5", "w5", "She hoped for rain.", 10), ("l6", "w6", "Hope is the thing with feathers.", 20),
+         ("l7", "w1", "A fleeting, ephemeral glow.", 30)],
+    )
+    k_conn.commit()
+    k_conn.close()
+    monkeypatch.chdir(tmp_path)
+    return [first, second]
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    db_init.create_tables(conn)
+    if not db_init.ensure_search_index(conn):
+        pytest.skip("SQLite built without FTS5")
+    conn.execute("INSERT INTO words (word_stem, status) VALUES ('cat', 'Ignored')")
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def test_import_kindle_dbs_merges_two_devices(conn, kindle_paths):
+    summary = pipelines.import_kindle_dbs(conn, kindle_paths, workers=2)
+
+    assert (summary["files"], summary["found"], summary["unique"]) == (2, 10, 6)
+    assert (summary["added"], summary["merged"]) == (5, 1)
+    stems = {row[0] for row in conn.execute("SELECT word_stem FROM words")}
+    assert stems == {"cat", "ephemeral", "obsequious", "serendipity", "hope"}
+    queued = {row[0] for row in conn.execute("SELECT w.word_stem FROM enrichment_queue q JOIN words w ON w.id = q.word_id")}
+    assert queued == stems - {"cat"}
+
+    assert conn.execute(f"SELECT COUNT(*) FROM {db_init.SEARCH_TABLE}").fetchone()[0] == len(stems)
+    # The latest lookup's sentence wins, and the index was re-synced after the deferred insert.
+    assert search.search_words(conn, "fleeting")["word_stem"].tolist() == ["ephemeral"]
+    assert search.search_words(conn, "Gatsby")["word_stem"].tolist() == ["serendipity"]
@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+import prompt_templates
+
+PAYLOADS = {
+    "laconic": {
+        "definition": "Using very few words.",
+        "distractors": ["Full of joy and high spirits."],
+        "examples": ["Her laconic reply ended the meeting."],
+    },
+}
+
+
+def test_resolve_version_reads_the_environment_on_each_call(monkeypatch):
+    monkeypatch.delenv("LLM_PROMPT_VERSION", raising=False)
+    assert prompt_templates.resolve_version() == prompt_templates.DEFAULT_VERSION
+
+    # Set after import, as load_dotenv() does in llm_helper.
+    monkeypatch.setenv("LLM_PROMPT_VERSION", "v1")
+    assert prompt_templates.resolve_version() == "v1"
+    assert prompt_templates.resolve_version("v2") == "v2"
+
+
+def test_resolve_version_rejects_unknown_versions(monkeypatch):
+    monkeypatch.setenv("LLM_PROMPT_VERSION", "v9")
+    with pytest.raises(ValueError):
+        prompt_templates.resolve_version()
+
+
+@pytest.mark.parametrize("version", prompt_templates.VERSIONS)
+def test_rendered_enrichment_parses_back(version):
+    rendered = prompt_templates.render_enrichment(PAYLOADS, version)
+
+    assert prompt_templates.enrichment_payloads(json.loads(rendered)) == PAYLOADS
+
+
+def test_v2_keeps_instructions_in_a_fixed_system_message():
+    first = prompt_templates.build_messages("difficulty", ["laconic"], version="v2")
+    second = prompt_templates.build_messages("difficulty", ["verdant", "torpid"], version="v2")
+
+    assert [message["role"] for message in first] == ["system", "user"]
+    assert first[0] == second[0]
+    assert "verdant" in second[1]["content"] and "verdant" not in second[0]["content"]
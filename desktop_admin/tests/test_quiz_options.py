@@ -0,0 +1,56 @@
+import json
+import random
+import sqlite3
+
+import pytest
+
+import db_init
+import quiz_options
+
+WORDS = [
+    ("laconic", "Using very few words.", ["Full of joy.", "Slow to anger.", "Easily broken."]),
+    ("verdant", "Green with grass or plants.", ["Very old.", "Bright red.", "Hard to see."]),
+]
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    db_init.create_tables(conn)
+    for stem, definition, distractors in WORDS:
+        word_id = conn.execute("INSERT INTO words (word_stem, definition) VALUES (?, ?)", (stem, definition)).lastrowid
+        conn.executemany("INSERT INTO distractors (word_id, text) VALUES (?, ?)", [(word_id, text) for text in distractors])
+    conn.commit()
+    quiz_options.refresh_options(conn, rng=random.Random(0))
+    yield conn
+    conn.close()
+
+
+def test_status_and_schedule_writes_do_not_rebuild_options(conn):
+    conn.execute("UPDATE words SET status = 'Learning', next_review_date = '2026-10-20'")
+    conn.commit()
+
+    summary = quiz_options.refresh_options(conn, rng=random.Random(0))
+
+    assert not summary["rebuilt"]
+    assert summary["changed_words"] == 0
+
+
+def test_definition_and_distractor_changes_rebuild_their_words(conn):
+    conn.execute("UPDATE words SET definition = 'Brief to the point of rudeness.' WHERE word_stem = 'laconic'")
+    conn.execute("INSERT INTO distractors (word_id, text) SELECT id, 'Made of stone.' FROM words WHERE word_stem = 'verdant'")
+    conn.commit()
+
+    summary = quiz_options.refresh_options(conn, rng=random.Random(0))
+
+    assert summary["changed_words"] == 2
+
+
+def test_short_legacy_distractors_still_fill_the_sets(conn):
+    rows = conn.execute(
+        "SELECT w.word_stem, q.option_sets FROM quiz_options q JOIN words w ON w.id = q.word_id"
+    ).fetchall()
+
+    option_sets = {stem: json.loads(sets) for stem, sets in rows}
+    for stem, _, distractors in WORDS:
+        assert set(option_sets[stem][0]) == set(distractors)
@@ -0,0 +1,65 @@
+import datetime
+import sqlite3
+
+import numpy as np
+import pytest
+
+import db_init
+import scheduler
+
+TODAY = datetime.date(2026, 3, 1)
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    db_init.create_tables(conn)
+    conn.executemany(
+        "INSERT INTO words (word_stem, status) VALUES (?, ?)",
+        [("brisk", "Proficient"), ("candid", "Adept"), ("deft", "Mastered"), ("eerie", "Learning"), ("feral", "New")],
+    )
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def test_intervals_by_status_without_history(conn):
+    frame = scheduler.load_schedule_frame(conn)
+    due = dict(zip(frame["status"], scheduler.compute_due_offsets(frame, TODAY)))
+
+    assert set(due) == {"Proficient", "Adept", "Mastered", "Learning"}
+    assert (due["Proficient"], due["Adept"], due["Mastered"]) == (1, 3, 14)
+    assert np.isnan(due["Learning"])
+
+    plan = scheduler.plan_schedule(frame, today=TODAY).set_index("id")["next_review_date"]
+    dates = dict(zip(frame["status"], plan.reindex(frame["id"])))
+    assert dates == {"Proficient": "2026-03-02", "Adept": "2026-03-04", "Mastered": "2026-03-15", "Learning": None}
+
+
+def test_level_load_caps_each_day_and_spills_forward():
+    due = np.array([0, 0, 0, 0, 0, 1, 1, -3])
+
+    assigned = scheduler.level_load(due, (due,), max_per_day=2)
+
+    assert np.bincount(assigned).tolist() == [2, 2, 2, 2]
+    assert (assigned >= np.maximum(due, 0)).all()
+    # The overdue word is served first; later arrivals queue behind the backlog.
+    assert assigned[7] == 0
+    assert assigned[5:7].tolist() == [3, 3]
+
+
+def test_apply_schedule_writes_only_changed_rows(conn):
+    first = scheduler.reschedule_reviews(conn, today=TODAY)
+    assert (first["scheduled"], first["updated"]) == (3, 3)
+
+    conn.execute("UPDATE words SET next_review_date = '2026-01-01' WHERE word_stem = 'candid'")
+    conn.execute("CREATE TEMP TABLE writes (word_id INTEGER)")
+    conn.execute("CREATE TEMP TRIGGER count_writes AFTER UPDATE OF next_review_date ON words BEGIN INSERT INTO writes VALUES (new.id); END")
+    conn.commit()
+
+    second = scheduler.reschedule_reviews(conn, today=TODAY)
+
+    assert second["updated"] == 1
+    written = conn.execute("SELECT w.word_stem FROM writes JOIN words w ON w.id = writes.word_id").fetchall()
+    assert written == [("candid",)]
+    assert conn.execute("SELECT next_review_date FROM words WHERE word_stem = 'candid'").fetchone()[0] == "2026-03-04"
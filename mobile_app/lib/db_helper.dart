@@ -1,3 +1,4 @@
+import 'dart:convert';
 import 'dart:math';
 import 'package:path/path.dart';
 import 'package:sqflite/sqflite.dart';
@@ -8,6 +9,10 @@ import 'db_import.dart';
 class DatabaseHelper {
   static final DatabaseHelper instance = DatabaseHelper._init();
   static Database? _database;
+  // Whether the open DB has the desktop's precomputed quiz_options table.
+  static bool? _hasQuizOptions;
+  // Showings per word this run, to rotate through its option sets.
+  final Map<int, int> _optionShowings = {};
 
   DatabaseHelper._init();
 
@@ -85,6 +90,7 @@ class DatabaseHelper {
     await importDatabaseFile(sourcePath, path);
 
     _database = await _initDB('vocab_master.db');
+    _hasQuizOptions = null;
     await _ensureBaseSchema(_database!);
     await _ensureOnDeckStatusSchema(_database!);
     await _ensureStudyLogSchema(_database!);
@@ -745,6 +751,30 @@ class DatabaseHelper {
     return deck;
   }
 
+  // The word's n-th option set from quiz_options (see desktop_admin/quiz_options.py), or [].
+  Future<List<String>> _precomputedDistractors(Database db, int wordId) async {
+    _hasQuizOptions ??= await _hasTable(db, 'quiz_options');
+    if (!_hasQuizOptions!) {
+      return [];
+    }
+    final rows = await db.query(
+      'quiz_options',
+      columns: ['option_sets'],
+      where: 'word_id = ?',
+      whereArgs: [wordId],
+    );
+    if (rows.isEmpty) {
+      return [];
+    }
+    final sets = jsonDecode(rows.first['option_sets'].toString()) as List<dynamic>;
+    if (sets.isEmpty) {
+      return [];
+    }
+    final shown = _optionShowings[wordId] ?? Random().nextInt(sets.length);
+    _optionShowings[wordId] = shown + 1;
+    return (sets[shown % sets.length] as List<dynamic>).map((text) => text.toString()).toList();
+  }
+
   Future<List<String>> getOptionsForWord(Word word) async {
     final db = await database;
     List<String> options = [];
@@ -756,9 +786,12 @@ class DatabaseHelper {
       options.add("MISSING DEFINITION");
     }
 
+    final precomputed = await _precomputedDistractors(db, word.id);
+    options.addAll(precomputed);
+
     // Get specific distractors
     List<Map<String, dynamic>> distMaps = [];
-    if (await _hasTable(db, 'distractors')) {
+    if (precomputed.isEmpty && await _hasTable(db, 'distractors')) {
       distMaps = await db.query(
         'distractors',
         where: 'word_id = ?',